@@ -1,64 +1,183 @@
 import sqlite3
 import csv
 import argparse
+import time
 
-def update_definitions(tsv_file, db_file):
+# Rows loaded between progress reports and cancellation checks
+PROGRESS_INTERVAL = 10000
+# SQLite virtual machine instructions between cancellation checks during a statement
+CANCEL_CHECK_INSTRUCTIONS = 100000
+
+class UpdateCancelled(Exception):
+    """Raised inside update_definitions when the update is cancelled."""
+
+# Pragmas applied for the duration of the update. The temp table lives in memory and
+# WAL with synchronous=NORMAL only syncs once, at the commit.
+WRITE_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": "-65536",
+}
+
+def read_definitions(tsv_file):
+    """Yields (WORD, definition) rows from a TSV file of words and definitions."""
+    with open(tsv_file, 'r', encoding='utf-8') as file:
+        for row in csv.reader(file, delimiter='\t'):
+            yield row[0].upper(), row[1]
+
+def update_definitions(tsv_file, db_file, output=print, progress=None, cancel=None):
+    """
+    Replaces the definition of every word in a Zyzzyva database with the one
+    from a TSV file. Nothing is changed unless the TSV file has a definition
+    for every word in the database and no words that are not in it.
+
+    The TSV file is loaded into a temporary table and applied with a single
+    UPDATE joined against it, all in one transaction, so a full lexicon takes
+    seconds rather than one statement per word.
+
+    Args:
+        tsv_file (str): TSV file of words and their definitions.
+        db_file (str): Zyzzyva SQLite database with a 'words' table.
+        output (callable): Called with each line of output.
+        progress (callable): Called as progress(phase, rows, rows_per_sec) as
+            the update goes through the 'loading', 'validating', 'updating' and
+            'committing' phases.
+        cancel (threading.Event): Set from another thread to cancel the update,
+            rolling back any changes.
+
+    Returns:
+        bool: Whether the definitions were updated.
+    """
+    conn = None
     try:
-        # Read TSV file
-        with open(tsv_file, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file, delimiter='\t')
-            tsv_data = {row[0].upper(): row[1] for row in reader}
-
-        # Connect to SQLite database
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-
-        # Retrieve all words from the 'words' table
-        cursor.execute("SELECT word, definition FROM words")
-        db_words = {row[0]: row[1] for row in cursor.fetchall()}
-
-        # Check if all TSV words exist in the SQLite 'words' table
-        tsv_words = set(tsv_data.keys())
-        db_word_keys = set(db_words.keys())
-        missing_words = tsv_words - db_word_keys
-        if missing_words:
-            print("Error: The following words in the TSV file are not in the SQLite 'words' table:")
-            for word in missing_words:
-                print(f"{word}")
-            return
-
-        # Prepare to track updated words
-        updated_words = set()
-
-        # Update definitions in the SQLite database
-        for word, new_definition in tsv_data.items():
-            db_word_keys.remove(word)
-            cursor.execute("""
-                UPDATE words
-                SET definition = ?
-                WHERE word = ?
-            """, (new_definition, word))
-
-        if db_word_keys:
-            print("Error: The following words were not updated with new definitions:")
-            for word in db_word_keys:
-                print(f"{word}")
-            conn.rollback()
-            return
-
-        # Commit the changes
-        conn.commit()
-        print("Update successful. All words were updated with new definitions.")
+        start = time.perf_counter()
+
+        def report(phase, rows):
+            if progress:
+                progress(phase, rows, rows / max(time.perf_counter() - start, 1e-9))
+
+        # Transactions are managed explicitly, as journal_mode cannot change inside one
+        conn = sqlite3.connect(db_file, isolation_level=None)
+        if cancel is not None:
+            # A nonzero return interrupts the running statement
+            conn.set_progress_handler(cancel.is_set, CANCEL_CHECK_INSTRUCTIONS)
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.execute("PRAGMA journal_mode = WAL")
+        for pragma, value in WRITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                updated = apply_definitions(conn, read_definitions(tsv_file), output, report, cancel)
+                if cancel is not None and cancel.is_set():
+                    raise UpdateCancelled()
+            except BaseException:
+                # Otherwise a cancelled update would interrupt its own rollback
+                conn.set_progress_handler(None, 0)
+                conn.execute("ROLLBACK")
+                raise
+            if updated is None:
+                conn.execute("ROLLBACK")
+                return False
+            report("committing", updated)
+            conn.execute("COMMIT")
+        finally:
+            conn.set_progress_handler(None, 0)
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}")
 
+        elapsed = time.perf_counter() - start
+        output(f"Updated {updated} definitions in {elapsed:.2f}s ({updated / max(elapsed, 1e-9):.0f} rows/sec).")
+        output("Update successful. All words were updated with new definitions.")
+        return True
+
+    except UpdateCancelled:
+        output("Update cancelled. No definitions were changed.")
     except sqlite3.Error as e:
-        print(f"SQLite error: {e}")
+        if cancel is not None and cancel.is_set():
+            output("Update cancelled. No definitions were changed.")
+        else:
+            output(f"SQLite error: {e}")
     except FileNotFoundError:
-        print("Error: TSV file not found.")
+        output("Error: TSV file not found.")
     except Exception as e:
-        print(f"Unexpected error: {e}")
+        output(f"Unexpected error: {e}")
     finally:
-        if 'conn' in locals():
+        if conn is not None:
             conn.close()
+    return False
+
+def apply_definitions(conn, definitions, output=print, report=None, cancel=None):
+    """
+    Loads (word, definition) rows into a temporary table, checks them against
+    the 'words' table and updates the definitions, within the caller's transaction.
+    A word given more than once keeps its last definition.
+
+    Args:
+        conn (sqlite3.Connection): Connection with a transaction open.
+        definitions (iterable): (word, definition) rows.
+        output (callable): Called with each line of output.
+        report (callable): Called as report(phase, rows) at the start of each
+            phase and every PROGRESS_INTERVAL rows loaded.
+        cancel (threading.Event): Checked while loading rows, raising UpdateCancelled once set.
+
+    Returns:
+        int: The number of words updated, or None if the rows did not match the
+        words in the database, in which case nothing was updated.
+    """
+    report = report or (lambda phase, rows: None)
+
+    def tracked(rows):
+        for count, row in enumerate(rows, 1):
+            yield row
+            if count % PROGRESS_INTERVAL == 0:
+                if cancel is not None and cancel.is_set():
+                    raise UpdateCancelled()
+                report("loading", count)
+
+    report("loading", 0)
+    conn.execute("DROP TABLE IF EXISTS temp.new_defs")
+    conn.execute("CREATE TEMP TABLE new_defs (word TEXT PRIMARY KEY, definition TEXT)")
+    conn.executemany("INSERT OR REPLACE INTO temp.new_defs (word, definition) VALUES (?, ?)", tracked(definitions))
+    loaded = conn.execute("SELECT COUNT(*) FROM temp.new_defs").fetchone()[0]
+    report("validating", loaded)
+
+    # Check if all TSV words exist in the SQLite 'words' table
+    missing_words = conn.execute("""
+        SELECT word FROM temp.new_defs
+        WHERE word NOT IN (SELECT word FROM words)
+    """).fetchall()
+    if missing_words:
+        output("Error: The following words in the TSV file are not in the SQLite 'words' table:")
+        for (word,) in missing_words:
+            output(word)
+        return None
+
+    not_updated_words = conn.execute("""
+        SELECT word FROM words
+        WHERE word NOT IN (SELECT word FROM temp.new_defs)
+    """).fetchall()
+    if not_updated_words:
+        output("Error: The following words were not updated with new definitions:")
+        for (word,) in not_updated_words:
+            output(word)
+        return None
+
+    report("updating", loaded)
+    if sqlite3.sqlite_version_info >= (3, 33, 0):
+        cursor = conn.execute("""
+            UPDATE words
+            SET definition = new_defs.definition
+            FROM temp.new_defs AS new_defs
+            WHERE words.word = new_defs.word
+        """)
+    else:
+        # UPDATE ... FROM is not supported before SQLite 3.33
+        cursor = conn.execute("""
+            UPDATE words
+            SET definition = (SELECT definition FROM temp.new_defs WHERE new_defs.word = words.word)
+        """)
+    conn.execute("DROP TABLE temp.new_defs")
+    return cursor.rowcount
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Update definitions in a SQLite database using a TSV file.")
@@ -1,65 +1,17 @@
-import sqlite3
-import csv
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
-def update_definitions(tsv_file, db_file, output_text):
-    try:
-        # Read TSV file
-        with open(tsv_file, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file, delimiter='\t')
-            tsv_data = {row[0].upper(): row[1] for row in reader}
-
-        # Connect to SQLite database
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-
-        # Retrieve all words from the 'words' table
-        cursor.execute("SELECT word, definition FROM words")
-        db_words = {row[0]: row[1] for row in cursor.fetchall()}
-
-        # Check if all TSV words exist in the SQLite 'words' table
-        tsv_words = set(tsv_data.keys())
-        db_word_keys = set(db_words.keys())
-        missing_words = tsv_words - db_word_keys
-        if missing_words:
-            output_text.insert(tk.END, "Error: The following words in the TSV file are not in the SQLite 'words' table:\n")
-            for word in missing_words:
-                output_text.insert(tk.END, f"{word}\n")
-            return
-
-        # Prepare to track updated words
-        updated_words = set()
-
-        # Update definitions in the SQLite database
-        for word, new_definition in tsv_data.items():
-            db_word_keys.remove(word)
-            cursor.execute("""
-                UPDATE words
-                SET definition = ?
-                WHERE word = ?
-            """, (new_definition, word))
-
-        if db_word_keys:
-            output_text.insert(tk.END, "Error: The following words were not updated with new definitions:\n")
-            for word in db_word_keys:
-                output_text.insert(tk.END, f"{word}\n")
-            conn.rollback()
-            return
-
-        # Commit the changes
-        conn.commit()
-        output_text.insert(tk.END, "Update successful. All words were updated with new definitions. You must restart Zyzzyva for the changes to take effect. You can now close the application.\n")
-
-    except sqlite3.Error as e:
-        output_text.insert(tk.END, f"SQLite error: {e}\n")
-    except FileNotFoundError:
-        output_text.insert(tk.END, "Error: TSV file not found.\n")
-    except Exception as e:
-        output_text.insert(tk.END, f"Unexpected error: {e}\n")
-    finally:
-        if 'conn' in locals():
-            conn.close()
+from add_defs import update_definitions
+
+# How often, in milliseconds, the window picks up output and progress from the update thread
+POLL_INTERVAL_MS = 100
+
+# Messages from the update thread: ("output", line), ("progress", (phase, rows, rows_per_sec)) or ("done", success)
+update_queue = queue.Queue()
+cancel_event = threading.Event()
+update_thread = None
 
 def browse_tsv_file():
     file_path = filedialog.askopenfilename(
@@ -73,14 +25,71 @@ def browse_db_file():
     db_entry.delete(0, tk.END)
     db_entry.insert(0, db_path)
 
+def update_worker(tsv_file, db_file):
+    success = update_definitions(
+        tsv_file, db_file,
+        output=lambda line: update_queue.put(("output", line)),
+        progress=lambda phase, rows, rate: update_queue.put(("progress", (phase, rows, rate))),
+        cancel=cancel_event,
+    )
+    update_queue.put(("done", success))
+
 def run_update():
+    global update_thread
     tsv_file = tsv_entry.get()
     db_file = db_entry.get()
     if not tsv_file or not db_file:
         messagebox.showerror("Error", "Both TSV and database files are required.")
         return
     output_text.delete(1.0, tk.END)  # Clear previous output
-    update_definitions(tsv_file, db_file, output_text)
+    cancel_event.clear()
+    run_button.config(state=tk.DISABLED)
+    cancel_button.config(state=tk.NORMAL)
+    status_label.config(text="Starting...")
+    update_thread = threading.Thread(target=update_worker, args=(tsv_file, db_file), daemon=True)
+    update_thread.start()
+    root.after(POLL_INTERVAL_MS, poll_update)
+
+def cancel_update():
+    cancel_event.set()
+    cancel_button.config(state=tk.DISABLED)
+    status_label.config(text="Cancelling...")
+
+def poll_update():
+    # Drain everything queued since the last poll, so a long list of missing words is one insert
+    lines = []
+    done = None
+    while True:
+        try:
+            kind, value = update_queue.get_nowait()
+        except queue.Empty:
+            break
+        if kind == "output":
+            lines.append(value)
+        elif kind == "progress" and not cancel_event.is_set():
+            phase, rows, rate = value
+            status_label.config(text=f"{phase.capitalize()}: {rows} rows ({rate:.0f} rows/sec)")
+        elif kind == "done":
+            done = value
+    if lines:
+        output_text.insert(tk.END, "".join(f"{line}\n" for line in lines))
+        output_text.see(tk.END)
+
+    if done is None:
+        root.after(POLL_INTERVAL_MS, poll_update)
+        return
+    if done:
+        output_text.insert(tk.END, "You must restart Zyzzyva for the changes to take effect. You can now close the application.\n")
+    status_label.config(text="Done." if done else "Stopped.")
+    run_button.config(state=tk.NORMAL)
+    cancel_button.config(state=tk.DISABLED)
+
+def on_close():
+    # Roll back rather than leave an update half done when the window is closed
+    if update_thread is not None and update_thread.is_alive():
+        cancel_event.set()
+        update_thread.join()
+    root.destroy()
 
 # Set up the GUI
 root = tk.Tk()
@@ -112,8 +121,17 @@ output_label.grid(row=4, column=0, padx=10, pady=10)
 output_text = tk.Text(root, height=15, width=60)
 output_text.grid(row=5, column=0, columnspan=3, padx=10, pady=10)
 
-# Run button
-run_button = tk.Button(root, text="Update Definitions", command=run_update)
-run_button.grid(row=6, column=0, columnspan=3, padx=10, pady=10)
+# Run and cancel buttons
+button_frame = tk.Frame(root)
+button_frame.grid(row=6, column=0, columnspan=3, padx=10, pady=10)
+run_button = tk.Button(button_frame, text="Update Definitions", command=run_update)
+run_button.pack(side=tk.LEFT, padx=5)
+cancel_button = tk.Button(button_frame, text="Cancel", command=cancel_update, state=tk.DISABLED)
+cancel_button.pack(side=tk.LEFT, padx=5)
+
+# Progress of the running update
+status_label = tk.Label(root, text="", fg="gray")
+status_label.grid(row=7, column=0, columnspan=3, padx=10, pady=(0, 10), sticky="w")
 
+root.protocol("WM_DELETE_WINDOW", on_close)
 root.mainloop()
@@ -1,30 +1,21 @@
 import sys
 
+from lexicon import load_lexicon
+from quiz_format import JQZ, QuizWriter, iter_quiz_lines
+
 def load_dictionary(file_path):
-    dictionary = {}
-    with open(file_path, 'r') as file:
-        for line in file:
-            word, definition = line.strip().split('\t')
-            dictionary[word.strip()] = definition
-    return dictionary
+    return load_lexicon(file_path)
 
 def add_definitions(dictionary, input_file_path, output_file_path):
-    at_first = True
-    with open(input_file_path, 'r') as input_file, open(output_file_path, 'w') as output_file:
-        for line in input_file:
-            if at_first:
-                output_file.write("0\n")
-                at_first = False
-                continue
-            word1, word2, value = line.strip().split(';')
+    with QuizWriter(output_file_path, JQZ) as writer:
+        for line_number, line in iter_quiz_lines(input_file_path):
+            word1, word2, value = JQZ.parse_line(line, line_number)
             if word1 in dictionary and word2 in dictionary:
-                definition1 = dictionary[word1].replace(';', '')
-                definition2 = dictionary[word2].replace(';', '')
-                line = f"{word1}<br>{definition1};{word2}<br>{definition2};{value}"
+                writer.write(f"{word1}<br>{dictionary[word1]}", f"{word2}<br>{dictionary[word2]}", value)
             else:
                 print("word(s) not in dict:\n")
                 print(f"{word1},{word2}")
-            output_file.write(line + '\n')
+                writer.write_line(line.strip())
 
 if __name__ == '__main__':
     dictionary_file_path = sys.argv[1]
@@ -0,0 +1,132 @@
+"""
+Integer alphagram keys and anagram grouping.
+
+A word's alphagram key packs its letter counts into one integer, 4 bits per
+letter from A (lowest bits) to Z, so two words are anagrams exactly when their
+keys are equal. Keys hash and compare much faster than sorted-letter strings.
+"""
+import array
+from collections import defaultdict
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+BITS_PER_LETTER = 4
+LETTER_MASK = (1 << BITS_PER_LETTER) - 1
+
+_LETTER_WEIGHTS = {letter: 1 << (BITS_PER_LETTER * i) for i, letter in enumerate(LETTERS)}
+_LOW_MASK = (1 << 64) - 1
+
+
+def alphagram_key(word):
+    """
+    Returns the alphagram key of an uppercase word. Words may repeat a letter at
+    most 15 times, which always holds for words of up to 15 letters.
+    """
+    try:
+        return sum(map(_LETTER_WEIGHTS.__getitem__, word))
+    except KeyError as e:
+        raise ValueError(f"Cannot compute the alphagram key of '{word}': invalid letter {e}")
+
+
+def letter_counts(key):
+    """Returns a list of the 26 letter counts, A to Z, encoded in an alphagram key."""
+    return [(key >> (BITS_PER_LETTER * i)) & LETTER_MASK for i in range(len(LETTERS))]
+
+
+def key_to_alphagram(key):
+    """Returns the alphabetized letters encoded in an alphagram key."""
+    return ''.join(letter * count for letter, count in zip(LETTERS, letter_counts(key)))
+
+
+def get_anagram_groups(words):
+    """
+    Groups words by their alphagram key.
+
+    Args:
+        words (iterable): Collection of uppercase words to group.
+
+    Returns:
+        dict: Dictionary mapping alphagram keys to lists of words, in input order.
+    """
+    anagram_groups = defaultdict(list)
+    for word in words:
+        anagram_groups[alphagram_key(word)].append(word)
+    return anagram_groups
+
+
+def compute_group_arrays(words):
+    """
+    Assigns every word an anagram group number, numbering groups in order of
+    first appearance, for storage alongside a compiled lexicon.
+
+    Returns:
+        tuple: An array('I') of group numbers parallel to words and an
+        array('Q') holding the low and high 64 bits of each group's key.
+    """
+    group_ids = array.array('I')
+    group_keys = array.array('Q')
+    key_group_ids = {}
+    for word in words:
+        key = alphagram_key(word)
+        group_id = key_group_ids.get(key)
+        if group_id is None:
+            group_id = len(key_group_ids)
+            key_group_ids[key] = group_id
+            group_keys.append(key & _LOW_MASK)
+            group_keys.append(key >> 64)
+        group_ids.append(group_id)
+    return group_ids, group_keys
+
+
+class AlphagramIndex:
+    """
+    Anagram groups of a sorted word list, built from precomputed group arrays
+    (see compute_group_arrays) so that loading it does no per-word key work.
+    """
+
+    def __init__(self, words, group_ids, group_keys):
+        self.words = words
+        self.group_ids = group_ids
+        self._group_keys = group_keys
+        self._groups = None
+        self._key_group_ids = None
+
+    def __len__(self):
+        return len(self._group_keys) // 2
+
+    def group_key(self, group_id):
+        """Returns the alphagram key of a group."""
+        return self._group_keys[2 * group_id] | (self._group_keys[2 * group_id + 1] << 64)
+
+    @property
+    def group_members(self):
+        """A list, indexed by group number, of the word positions in each group."""
+        if self._groups is None:
+            groups = [[] for _ in range(len(self))]
+            for word_index, group_id in enumerate(self.group_ids):
+                groups[group_id].append(word_index)
+            self._groups = groups
+        return self._groups
+
+    @property
+    def keys(self):
+        """A list of the alphagram keys of all groups, indexed by group number."""
+        return [low | (high << 64) for low, high in zip(self._group_keys[0::2], self._group_keys[1::2])]
+
+    @property
+    def groups(self):
+        """A dictionary mapping alphagram keys to lists of words, like get_anagram_groups."""
+        words = self.words
+        return dict(zip(self.keys, ([words[i] for i in members] for members in self.group_members)))
+
+    def num_anagrams(self, word_index):
+        """Returns the number of words, itself included, that are anagrams of the word at word_index."""
+        return len(self.group_members[self.group_ids[word_index]])
+
+    def anagrams(self, letters):
+        """Returns the words that use exactly the given letters."""
+        if self._key_group_ids is None:
+            self._key_group_ids = {key: group_id for group_id, key in enumerate(self.keys)}
+        group_id = self._key_group_ids.get(alphagram_key(letters.upper()))
+        if group_id is None:
+            return []
+        return [self.words[i] for i in self.group_members[group_id]]
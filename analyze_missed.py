@@ -1,11 +1,13 @@
 import argparse
 import statistics
 
+from probability import DEFAULT_DISTRIBUTION
+
 # Create an argument parser
 parser = argparse.ArgumentParser(description='Read a text file with word probabilities.')
 
 # Add an argument for the input lexicon file
-parser.add_argument('lexicon', help='the input lexicon file')
+parser.add_argument('lexicon', help='the input lexicon file, with or without a probability column')
 
 # Add an argument for the file containing the words to check
 parser.add_argument('words_file', help='the file containing the words')
@@ -22,15 +24,28 @@ words_file = args.words_file
 # Create an empty dictionary to store the word probabilities
 word_probabilities = {}
 
+# Words listed without a probability
+unranked_words = []
+
 # Open the lexicon file and read its contents
 with open(lexicon, 'r') as file:
     for line in file:
         # Split the line into word and probability
-        word, probability = line.strip().split()
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) == 1:
+            unranked_words.append(parts[0].upper())
+            continue
+        word, probability = parts
 
         # Store the word and probability in the dictionary
         word_probabilities[word.upper()] = int(probability)
 
+# Rank any words without a probability by their probability order in the lexicon
+if unranked_words:
+    word_probabilities.update(DEFAULT_DISTRIBUTION.probability_orders(unranked_words))
+
 # Read the file containing the words to check
 with open(words_file, 'r') as file:
     words_to_check = [word.strip().upper() for word in file]
@@ -0,0 +1,260 @@
+"""
+Builds or refreshes the 'words' table of a Zyzzyva lexicon database from a
+lexicon file, e.g. the output of create_csw24_tsv.py.
+
+Every column Zyzzyva derives from the word list is computed here: lengths,
+alphagrams, anagram counts, letter statistics, hooks, probability orders for
+zero, one and two blanks, and the definitions. Columns that cannot be derived
+from the lexicon, like playability, keep their values for words that were
+already in the database. The table is rewritten with executemany in a single
+transaction and its indexes are recreated after the load, so a full lexicon
+takes seconds and study machines can pick up new definitions without a
+rebuild in Zyzzyva.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+from math import comb
+
+from add_defs import WRITE_PRAGMAS
+from lexicon import FILE_FORMATS, load_lexicon
+from probability import TILE_COUNTS, TileDistribution
+
+LETTER_VALUES = {
+    'A': 1, 'B': 3, 'C': 3, 'D': 2, 'E': 1, 'F': 4, 'G': 2, 'H': 4, 'I': 1,
+    'J': 8, 'K': 5, 'L': 1, 'M': 3, 'N': 1, 'O': 1, 'P': 3, 'Q': 10, 'R': 1,
+    'S': 1, 'T': 1, 'U': 1, 'V': 4, 'W': 4, 'X': 8, 'Y': 4, 'Z': 10
+}
+VOWELS = frozenset('AEIOU')
+
+# Blanks in the bag for each set of probability columns, e.g. probability_order2
+PROBABILITY_BLANKS = (0, 1, 2)
+
+# Used when creating the table. An existing table keeps its own columns.
+WORDS_TABLE_SQL = """
+    CREATE TABLE words (
+        word varchar(16), length integer,
+        playability integer, playability_order integer,
+        min_playability_order integer, max_playability_order integer,
+        combinations0 integer, probability_order0 integer,
+        min_probability_order0 integer, max_probability_order0 integer,
+        combinations1 integer, probability_order1 integer,
+        min_probability_order1 integer, max_probability_order1 integer,
+        combinations2 integer, probability_order2 integer,
+        min_probability_order2 integer, max_probability_order2 integer,
+        alphagram varchar(16), num_anagrams integer, num_unique_letters integer,
+        num_vowels integer, point_value integer, front_hooks varchar(32),
+        back_hooks varchar(32), is_front_hook integer, is_back_hook integer,
+        lexicon_symbols varchar(16), definition text
+    )
+"""
+# Columns computed by word_rows, in the order of its rows
+DERIVED_COLUMNS = (
+    'word', 'length', 'alphagram', 'num_anagrams', 'num_unique_letters', 'num_vowels', 'point_value',
+    'front_hooks', 'back_hooks', 'is_front_hook', 'is_back_hook', 'definition',
+) + tuple(f'{column}{blanks}' for blanks in PROBABILITY_BLANKS
+          for column in ('combinations', 'probability_order', 'min_probability_order', 'max_probability_order'))
+DEFAULT_INDEXES = (
+    "CREATE UNIQUE INDEX word_index ON words (word)",
+    "CREATE INDEX length_index ON words (length)",
+    "CREATE INDEX alphagram_index ON words (alphagram)",
+)
+
+
+def probability_columns(alphagrams, blank_counts=PROBABILITY_BLANKS):
+    """
+    Computes Zyzzyva's probability columns for bags with each number of blanks.
+    Alphagrams are ranked by decreasing number of combinations within each
+    length, ties broken alphabetically, and min/max orders span the alphagrams
+    with the same number of combinations.
+
+    Args:
+        alphagrams (iterable): The alphagrams to rank.
+        blank_counts (tuple): The numbers of blanks in the bag to rank for.
+
+    Returns:
+        dict: Maps each number of blanks to a dictionary mapping each alphagram
+        to its (combinations, order, min order, max order).
+    """
+    # One pass over the letters serves every bag: a bag with n blanks has
+    # comb(n, b) ways to pick the blanks standing in for b of the letters
+    distribution = TileDistribution(TILE_COUNTS, max(blank_counts))
+    unique_alphagrams = sorted(set(alphagrams))
+    substitution_ways = [distribution.blank_substitution_ways(alphagram) for alphagram in unique_alphagrams]
+
+    columns = {}
+    for blanks in blank_counts:
+        weights = [comb(blanks, b) for b in range(blanks + 1)]
+        combinations = {
+            alphagram: sum(weight * count for weight, count in zip(weights, ways))
+            for alphagram, ways in zip(unique_alphagrams, substitution_ways)
+        }
+        ranked = sorted(unique_alphagrams, key=lambda alphagram: (len(alphagram), -combinations[alphagram]))
+
+        # Walk each run of alphagrams with the same length and number of combinations
+        ranks = {}
+        length_start = run_start = 0
+        for i in range(1, len(ranked) + 1):
+            if i < len(ranked):
+                alphagram, previous = ranked[i], ranked[i - 1]
+                if len(alphagram) == len(previous) and combinations[alphagram] == combinations[previous]:
+                    continue
+            min_order, max_order = run_start - length_start + 1, i - length_start
+            for order, tied in enumerate(ranked[run_start:i], min_order):
+                ranks[tied] = (combinations[tied], order, min_order, max_order)
+            if i < len(ranked) and len(alphagram) != len(previous):
+                length_start = i
+            run_start = i
+        columns[blanks] = ranks
+    return columns
+
+
+def word_rows(lexicon):
+    """
+    Yields a tuple of the DERIVED_COLUMNS for each word of a lexicon, in
+    alphabetical order.
+    """
+    alphagrams = list(lexicon.alphagrams)
+    probabilities = probability_columns(alphagrams)
+    # Everything but the hooks and definition is the same for all anagrams
+    alphagram_columns = {}
+    for alphagram in set(alphagrams):
+        columns = (len(set(alphagram)), sum(map(alphagram.count, VOWELS)),
+                   sum(map(LETTER_VALUES.__getitem__, alphagram)))
+        for blanks in PROBABILITY_BLANKS:
+            columns += probabilities[blanks][alphagram]
+        alphagram_columns[alphagram] = columns
+
+    num_anagrams = lexicon.alphagram_index.num_anagrams
+    word_indexes = lexicon.word_indexes
+    for i, word in enumerate(lexicon.words):
+        alphagram = alphagrams[i]
+        num_unique_letters, num_vowels, point_value, *probability = alphagram_columns[alphagram]
+        yield (
+            word, lexicon.lengths[i], alphagram, num_anagrams(i), num_unique_letters, num_vowels, point_value,
+            lexicon.front_hooks(word), lexicon.back_hooks(word),
+            int(len(word) > 1 and word[1:] in word_indexes), int(len(word) > 1 and word[:-1] in word_indexes),
+            lexicon.definition_at(i), *probability,
+        )
+
+
+def table_columns(conn, table):
+    """Returns the column names of a table, in order, or an empty list if it does not exist."""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def build_words_table(lexicon, db_file, output=print):
+    """
+    Creates or refreshes the 'words' table of a Zyzzyva database from a lexicon.
+
+    The new rows are loaded into a fresh table with the same columns as the
+    existing one. Columns that are not derived from the lexicon are copied
+    over from the old rows of the same words. The old table is then replaced
+    and its indexes recreated, all in one transaction.
+
+    Args:
+        lexicon (Lexicon): The lexicon to build the table from.
+        db_file (str): Zyzzyva SQLite database, created if it does not exist.
+        output (callable): Called with each line of output.
+
+    Returns:
+        int: The number of words written.
+    """
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.execute("PRAGMA journal_mode = WAL")
+        for pragma, value in WRITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = _replace_words_table(conn, lexicon, output)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+    output(f"Wrote {count} words to {db_file} in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} rows/sec).")
+    return count
+
+
+def _replace_words_table(conn, lexicon, output):
+    columns = table_columns(conn, 'words')
+    refreshing = bool(columns)
+    if refreshing:
+        table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'words'").fetchone()[0]
+        index_sql = [sql for (sql,) in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'words' AND sql IS NOT NULL")]
+        output(f"Refreshing the existing words table ({len(columns)} columns, {len(index_sql)} indexes).")
+    else:
+        table_sql = WORDS_TABLE_SQL
+        index_sql = list(DEFAULT_INDEXES)
+        conn.execute(table_sql)
+        columns = table_columns(conn, 'words')
+        output("Creating the words table.")
+    if 'word' not in columns:
+        raise ValueError("The words table has no 'word' column.")
+    derived = [column for column in columns if column in DERIVED_COLUMNS]
+    kept = [column for column in columns if column not in DERIVED_COLUMNS]
+
+    conn.execute("DROP TABLE IF EXISTS temp.derived_words")
+    conn.execute(f"CREATE TEMP TABLE derived_words ({', '.join(derived)})")
+    rows = word_rows(lexicon)
+    if derived != list(DERIVED_COLUMNS):
+        positions = [DERIVED_COLUMNS.index(column) for column in derived]
+        rows = (tuple(row[position] for position in positions) for row in rows)
+    conn.executemany(f"INSERT INTO temp.derived_words VALUES ({', '.join('?' for _ in derived)})", rows)
+
+    # Recreate the table from its own definition, with the old rows set aside so
+    # that what cannot be derived, like playability, is kept for existing words
+    conn.execute("DROP TABLE IF EXISTS old_words")
+    conn.execute("ALTER TABLE words RENAME TO old_words")
+    conn.execute(table_sql)
+    selected = ', '.join(f"new.{column}" if column in DERIVED_COLUMNS else f"old.{column}" for column in columns)
+    conn.execute(f"""
+        INSERT INTO words ({', '.join(columns)})
+        SELECT {selected}
+        FROM temp.derived_words AS new
+        LEFT JOIN old_words AS old ON old.word = new.word
+        ORDER BY new.rowid
+    """)
+    conn.execute("DROP TABLE temp.derived_words")
+    # Dropping the old table drops its indexes, freeing their names
+    conn.execute("DROP TABLE old_words")
+    if refreshing and kept:
+        output(f"Kept {', '.join(kept)} from the existing rows.")
+
+    # Indexes are built once, after the load, instead of being updated row by row
+    for sql in index_sql:
+        conn.execute(sql)
+    return conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or refresh the words table of a Zyzzyva lexicon database.")
+    parser.add_argument("lexicon", help="Lexicon file with words and definitions, e.g. csw24_crowdsourced.txt")
+    parser.add_argument("db", help="Zyzzyva database file, e.g. CSW24.db, created if it does not exist")
+    parser.add_argument("--format", choices=FILE_FORMATS, default='tsv', help="Format of the lexicon file")
+    args = parser.parse_args()
+
+    try:
+        lexicon = load_lexicon(args.lexicon, args.format)
+    except (FileNotFoundError, ValueError) as e:
+        sys.exit(f"Error loading {args.lexicon}: {e}")
+    try:
+        build_words_table(lexicon, args.db)
+    except sqlite3.Error as e:
+        sys.exit(f"SQLite error: {e}")
+    except ValueError as e:
+        sys.exit(f"Error building the words table: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Compiled binary caches of source files, memory-mapped instead of re-parsed.
+
+A source file's cache sits next to it as '<file><suffix>'. It holds a header,
+a section table and the sections themselves, each 8-byte aligned so they can
+be cast to arrays in place. The header records the source file's size,
+modification time and SHA-1 hash, and a cache is used for as long as they
+show the source is unchanged. lexicon.py and playability.py both keep their
+caches this way, each with its own CacheLayout.
+"""
+import hashlib
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+# magic, version, variant, source size, source mtime (ns), source sha1, then the layout's own fields
+_HEADER_FORMAT = '=6sHB7xQq20s4x'
+_ALIGNMENT = 8
+
+CacheHeader = namedtuple('CacheHeader', ['magic', 'version', 'variant', 'source_size', 'source_mtime_ns',
+                                         'source_digest', 'fields'])
+
+
+class CacheLayout:
+    """
+    The layout of one kind of compiled cache.
+
+    Args:
+        suffix (str): Appended to the source file's path to name its cache.
+        magic (bytes): Six bytes identifying the kind of cache.
+        version (int): The layout version. Caches of any other version are recompiled.
+        sections (tuple): The names of the sections, in file order.
+        fields (str): struct format of the layout's own header fields, e.g. 'Q' for a count.
+        description (str): What the cache holds, for warnings, e.g. 'lexicon cache'.
+    """
+
+    def __init__(self, suffix, magic, version, sections, fields='', description='cache'):
+        self.suffix = suffix
+        self.magic = magic
+        self.version = version
+        self.sections = sections
+        self.description = description
+        self.header = struct.Struct(_HEADER_FORMAT + fields)
+        self.section_table = struct.Struct('=' + 'QQ' * len(sections))
+
+    def compile(self, sections, fields=(), variant=0, source_size=0, source_mtime_ns=0, source_digest=b''):
+        """
+        Lays out a header, the section table and the sections.
+
+        Args:
+            sections (dict): Maps each section name to its bytes.
+            fields (tuple): Values of the layout's own header fields.
+            variant (int): Distinguishes caches of the same source compiled differently,
+                e.g. from different file formats.
+
+        Returns:
+            bytes: The compiled cache.
+        """
+        header = self.header.pack(self.magic, self.version, variant, source_size, source_mtime_ns,
+                                  source_digest, *fields)
+        position = _aligned(len(header) + self.section_table.size)
+        table = []
+        for name in self.sections:
+            table.extend((position, len(sections[name])))
+            position = _aligned(position + len(sections[name]))
+
+        output = bytearray(header)
+        output += self.section_table.pack(*table)
+        for name in self.sections:
+            output += bytes(_aligned(len(output)) - len(output))
+            output += sections[name]
+        return bytes(output)
+
+    def read(self, buffer):
+        """
+        Reads a compiled cache.
+
+        Returns:
+            tuple: The CacheHeader and a dict of a memoryview of each section.
+
+        Raises:
+            ValueError: If the buffer is not a cache of this layout and version.
+        """
+        view = memoryview(buffer)
+        header = self.unpack_header(view)
+        if header is None:
+            raise ValueError(f"Not a compiled {self.description}.")
+        sections = {name: view[start:start + length] for name, (start, length) in self.spans(view).items()}
+        return header, sections
+
+    def spans(self, buffer):
+        """Returns a dict of the (start, length) of each section of a compiled cache."""
+        table = self.section_table.unpack_from(buffer, self.header.size)
+        return {name: (table[2 * i], table[2 * i + 1]) for i, name in enumerate(self.sections)}
+
+    def unpack_header(self, buffer):
+        """Returns the CacheHeader of a buffer, or None if it is not a cache of this layout and version."""
+        if len(buffer) < self.header.size + self.section_table.size:
+            return None
+        values = self.header.unpack_from(buffer)
+        header = CacheHeader(*values[:6], values[6:])
+        if header.magic != self.magic or header.version != self.version:
+            return None
+        return header
+
+    def load(self, file_path, compile_source, variant=0):
+        """
+        Returns the compiled cache of a source file, compiling it into
+        '<file><suffix>' if the cache is missing or stale. The cache is
+        considered fresh if the source file's size and modification time are
+        unchanged, or failing that, if its SHA-1 hash is. In that case the new
+        size and modification time are recorded, so later loads skip the hash.
+
+        Args:
+            file_path (str): Path to the source file.
+            compile_source (callable): Called with the source's os.stat_result and
+                SHA-1 digest to compile it, returning the bytes of the cache.
+            variant (int): The variant to load, see compile.
+
+        Returns:
+            mmap.mmap | bytes: The mapped cache file, or the newly compiled cache.
+
+        Raises:
+            FileNotFoundError: If the source file does not exist.
+        """
+        stat = os.stat(file_path)
+        cache_path = file_path + self.suffix
+
+        digest = None
+        cache = _map_file(cache_path)
+        if cache is not None:
+            header = self.unpack_header(cache)
+            if header is not None and header.variant == variant:
+                if header.source_size == stat.st_size and header.source_mtime_ns == stat.st_mtime_ns:
+                    return cache
+                digest = file_digest(file_path)
+                if digest == header.source_digest:
+                    refreshed = self.header.pack(header.magic, header.version, header.variant, stat.st_size,
+                                                 stat.st_mtime_ns, header.source_digest, *header.fields)
+                    self._write(cache_path, refreshed + cache[self.header.size:])
+                    return cache
+            cache.close()
+
+        if digest is None:
+            digest = file_digest(file_path)
+        compiled = compile_source(stat, digest)
+        self._write(cache_path, compiled)
+        return compiled
+
+    def _write(self, cache_path, compiled):
+        # Write to a temporary file first so a concurrent reader never maps a partial cache
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(compiled)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f"Warning: could not write {self.description} {cache_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def file_digest(file_path):
+    """Returns the SHA-1 digest of a file's contents."""
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.digest()
+
+
+def _aligned(position):
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _map_file(path):
+    try:
+        with open(path, 'rb') as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
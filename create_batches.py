@@ -1,23 +1,18 @@
 import argparse
 import os
 import random
-from collections import defaultdict
 
-def get_alphagram(word):
-    return ''.join(sorted(word))
+from lexicon import load_lexicon
 
-def create_anagram_groups(words, min_length, max_length):
-    anagram_groups = defaultdict(list)
-    for word in words:
-        if min_length <= len(word) <= max_length:
-            alphagram = get_alphagram(word)
-            anagram_groups[alphagram].append(word)
+def create_anagram_groups(lexicon, min_length, max_length):
+    # The anagram groups are precomputed in the lexicon cache, so only the length filter runs here
+    index = lexicon.alphagram_index
+    anagram_groups = {}
+    for group_id, members in enumerate(index.group_members):
+        if min_length <= lexicon.lengths[members[0]] <= max_length:
+            anagram_groups[index.group_key(group_id)] = [lexicon.words[i] for i in members]
     return anagram_groups
 
-def read_words_from_file(file_path):
-    with open(file_path, 'r') as file:
-        return [line.strip() for line in file]
-
 def generate_batches(anagram_groups, batch_size, batch_inc):
     ordered_groups = list(anagram_groups.items())
     random.shuffle(ordered_groups)
@@ -57,8 +52,8 @@ def main():
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
-    words = read_words_from_file(file_path)
-    anagram_groups = create_anagram_groups(words, min_length, max_length)
+    lexicon = load_lexicon(file_path)
+    anagram_groups = create_anagram_groups(lexicon, min_length, max_length)
     batches = generate_batches(anagram_groups, batch_size, batch_inc)
 
     for start_index, end_index, batch in batches:
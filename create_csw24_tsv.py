@@ -2,6 +2,8 @@ import requests
 import csv
 import sys
 
+from lexicon import load_lexicon
+
 # Paths to input files
 csw24_path = "csw24.txt"
 csw21_with_defs_path = "csw21_with_defs.txt"
@@ -31,14 +33,7 @@ def load_csw24_words(file_path):
 
 def load_csw21_definitions(file_path):
     """Load word definitions from csw21_with_defs.txt into a dictionary."""
-    definitions = {}
-    with open(file_path, "r") as file:
-        reader = csv.reader(file, delimiter='\t')
-        for row in reader:
-            if row:
-                word, definition = row[0], row[1]
-                definitions[word] = definition
-    return definitions
+    return load_lexicon(file_path)
 
 def load_updated_definitions(tsv_file):
     """Load updated definitions from the downloaded TSV file into a dictionary."""
@@ -1,16 +1,27 @@
-def get_words(filename):
-    words = []
+import sys
+
+from quiz_format import QuizWriter
+
+def iter_words(filename):
     with open(filename) as f:
-        words = f.read().splitlines()
-    return words
+        for line in f:
+            yield line.rstrip('\n')
+
+def convert_file_to_jqz(filename, output=sys.stdout):
+    """
+    Writes an order memorization quiz for a word list, where each question is
+    a word and its answer the word that follows it, streaming the list.
 
-def convert_file_to_jqz(filename):
-    words = get_words(filename)
-    fs = "0\n*;{};0\n".format(words[0])
-    for i in range(len(words) - 1):
-        fs += "{};{};0\n".format(words[i], words[i+1])
-    fs += "{};-;0\n".format(words[len(words) - 1])
-    return fs
+    Args:
+        filename (str): The word list, one word per line.
+        output: A path or open text file to write the quiz to.
+    """
+    with QuizWriter(output) as writer:
+        previous = '*'
+        for word in iter_words(filename):
+            writer.write(previous, word)
+            previous = word
+        writer.write(previous, '-')
 
 if __name__ == '__main__':
-    print(convert_file_to_jqz('csw21_fives.txt'));
\ No newline at end of file
+    convert_file_to_jqz('csw21_fives.txt')
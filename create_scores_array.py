@@ -1,21 +1,33 @@
-import pandas as pd
 import argparse
 import shutil
 import os
+import struct
 
-def generate_score_difference_array(input_df, min_rating, start_date, scaling_factor):
+from game_score_analysis import group_moments, update_partials
+from game_store import STORE_DIR
+
+OUTPUT_FORMATS = ('array', 'table', 'cdf', 'embed')
+LIWORDS_DIR = '$HOME/liwords/pkg/pair/standings/'
+BINARY_FILENAME = 'score_differences.bin'
+BINARY_PAIR = struct.Struct('<QQ')
+# Counts of earlier runs, so each run only reads the games added since
+STATE_FILE = 'score_differences.json'
+
+GO_HEADER = """package standings
+
+"""
+
+def score_difference_moments(input_df, min_rating, start_date):
     """
-    Generate a sorted array of score differences with proportional frequency based on a scaling factor.
+    Count the games won by each score difference, as partial results that can
+    be merged with those of other games by merge_partials.
+
+    Returns:
+        dict: Moments of the score differences grouped by score difference,
+        whose 'count' column is the number of games.
     """
-    # Create a copy of the dataframe
-    df = input_df.copy()
-    
-    # Ensure date and numeric columns are converted correctly
-    df['date'] = pd.to_datetime(df['date'])
-    numeric_columns = ['winnerscore', 'loserscore', 'winneroldrating', 'loseroldrating']
-    for col in numeric_columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
+    df = input_df
+
     # Filter games based on the start date and minimum rating
     df_filtered = df[
         (df['date'] >= start_date) & 
@@ -25,10 +37,30 @@ def generate_score_difference_array(input_df, min_rating, start_date, scaling_fa
     
     # Calculate score difference
     df_filtered.loc[:, 'score_difference'] = df_filtered['winnerscore'] - df_filtered['loserscore']
-    
+    return {'differences': group_moments(df_filtered, df_filtered['score_difference'], by='score_difference')}
+
+def generate_score_difference_array(moments, min_rating, scaling_factor):
+    """
+    Generate the distribution of score differences, with each difference
+    appearing in proportion to its frequency divided by the scaling factor.
+
+    Args:
+        moments (dict): The partial results of score_difference_moments.
+
+    Returns:
+        tuple: A sorted list of (score difference, instances) pairs, the number
+        of games and the frequency of each score difference. Negative score
+        differences are skipped.
+    """
     # Count frequency of score differences
-    score_diff_counts = df_filtered['score_difference'].value_counts()
-    total_games = len(df_filtered)
+    score_diff_counts = moments['differences']['count']
+    score_diff_counts = score_diff_counts[score_diff_counts > 0]
+    # The Go tables hold uint64s, so games the winner lost on points, like bad rows, are left out
+    negative = score_diff_counts.index < 0
+    if negative.any():
+        print(f"Skipping {int(score_diff_counts[negative].sum())} games with a negative score difference.")
+        score_diff_counts = score_diff_counts[~negative]
+    total_games = int(score_diff_counts.sum())
     
     # Print out all score difference frequencies sorted by score difference
     print("Score Difference Frequencies:")
@@ -44,46 +76,140 @@ def generate_score_difference_array(input_df, min_rating, start_date, scaling_fa
     
     print(f"\nTotal games (min rating {min_rating}): {total_games}")
 
-    # Calculate the number of instances for each score difference in the Go array based on scaling factor
-    score_diff_instances = {}
-    for diff, count in score_diff_counts.items():
-        instances = round(count / scaling_factor)  # Number of times score diff should appear in Go array
-        score_diff_instances[diff] = instances
-    
-    # Create the final array based on calculated instances
-    result_array = []
-    
-    for score_diff, instances in sorted(score_diff_instances.items()):
-        # Add instances to the result array
-        result_array.extend([score_diff] * instances)
+    # Calculate the number of instances for each score difference in the Go array based on scaling factor,
+    # as a sorted (score difference, instances) table rather than the expanded array
+    score_diff_instances = []
+    for diff in sorted(score_diff_counts.index):
+        instances = round(score_diff_counts[diff] / scaling_factor)  # Number of times score diff should appear in Go array
+        if instances > 0:
+            score_diff_instances.append((int(diff), instances))
     
-    print(f"\n Final array length: {len(result_array)}")
+    print(f"\n Final array length: {sum(instances for _, instances in score_diff_instances)}")
 
-    # Ensure the array is sorted
-    result_array.sort()
-    
-    return result_array, total_games, score_diff_counts
+    return score_diff_instances, total_games, score_diff_counts
 
-def generate_go_array_literal(score_diff_array):
+def write_go_array_literal(file, score_diff_instances):
+    """
+    Write a Go file with a function that returns the expanded array literal,
+    10 elements per line, streaming it one line at a time.
     """
-    Generate a Go file with a function that returns an array literal
-    from the score difference array.
+    file.write(GO_HEADER + "func GetScoreDifferences() []uint64 {\n    return []uint64{\n")
+    line = []
+    for diff, instances in score_diff_instances:
+        for _ in range(instances):
+            line.append(f" {diff}")
+            if len(line) == 10:
+                file.write(', '.join(line) + ',\n')
+                line = []
+    if line:
+        file.write(', '.join(line) + ', ')
+    file.write("    }\n}\n")
+
+def write_go_table(file, score_diff_instances):
     """
-    go_literal = """package standings
+    Write a Go file with the distribution as a compact (value, count) table and
+    a GetScoreDifferences function that expands it.
+    """
+    file.write(GO_HEADER + """type ScoreDifferenceCount struct {
+    Value uint64
+    Count uint64
+}
+
+func GetScoreDifferenceCounts() []ScoreDifferenceCount {
+    return []ScoreDifferenceCount{
+""")
+    for diff, instances in score_diff_instances:
+        file.write(f"        {{{diff}, {instances}}},\n")
+    file.write("""    }
+}
 
 func GetScoreDifferences() []uint64 {
+    diffs := []uint64{}
+    for _, c := range GetScoreDifferenceCounts() {
+        for i := uint64(0); i < c.Count; i++ {
+            diffs = append(diffs, c.Value)
+        }
+    }
+    return diffs
+}
+""")
+
+def write_go_cdf(file, score_diff_instances):
+    """
+    Write a Go file with the distribution as a cumulative table: the sorted
+    score differences and, for each, the number of array entries up to and
+    including it. Sampling a difference is then a binary search.
+    """
+    file.write(GO_HEADER + """import "sort"
+
+func GetScoreDifferenceCDF() ([]uint64, []uint64) {
     return []uint64{
-"""
-    
-    # Write array elements, 10 per line for readability
-    for i, diff in enumerate(score_diff_array):
-        # Add a comma and newline every 10 elements
-        line_end = ',\n' if (i + 1) % 10 == 0 else ', '
-        go_literal += f" {diff}{line_end}"
-    
-    go_literal += "    }\n}\n"
-    
-    return go_literal
+""")
+    for diff, _ in score_diff_instances:
+        file.write(f"        {diff},\n")
+    file.write("    }, []uint64{\n")
+    total = 0
+    for _, instances in score_diff_instances:
+        total += instances
+        file.write(f"        {total},\n")
+    file.write("""    }
+}
+
+// GetScoreDifference returns the score difference at position i of the expanded array.
+func GetScoreDifference(i uint64) uint64 {
+    values, cumulative := GetScoreDifferenceCDF()
+    return values[sort.Search(len(cumulative), func(j int) bool { return cumulative[j] > i })]
+}
+
+func GetScoreDifferences() []uint64 {
+    values, cumulative := GetScoreDifferenceCDF()
+    diffs := []uint64{}
+    for j, value := range values {
+        for uint64(len(diffs)) < cumulative[j] {
+            diffs = append(diffs, value)
+        }
+    }
+    return diffs
+}
+""")
+
+def write_go_embed(file, binary_filename):
+    """
+    Write a Go file that embeds the binary (value, count) table written by
+    write_binary_table and expands it in GetScoreDifferences.
+    """
+    file.write(GO_HEADER + f"""import (
+    _ "embed"
+    "encoding/binary"
+)
+
+//go:embed {binary_filename}
+var scoreDifferenceCounts []byte
+
+func GetScoreDifferences() []uint64 {{
+    diffs := []uint64{{}}
+    for i := 0; i+16 <= len(scoreDifferenceCounts); i += 16 {{
+        value := binary.LittleEndian.Uint64(scoreDifferenceCounts[i:])
+        count := binary.LittleEndian.Uint64(scoreDifferenceCounts[i+8:])
+        for j := uint64(0); j < count; j++ {{
+            diffs = append(diffs, value)
+        }}
+    }}
+    return diffs
+}}
+""")
+
+def write_binary_table(file, score_diff_instances):
+    """
+    Write the (value, count) table as pairs of little-endian uint64s.
+
+    Raises:
+        ValueError: If a score difference is negative.
+    """
+    for diff, instances in score_diff_instances:
+        if diff < 0:
+            raise ValueError(f"Score difference {diff} is negative and cannot be written as a uint64.")
+        file.write(BINARY_PAIR.pack(diff, instances))
 
 # Main execution
 if __name__ == "__main__":
@@ -92,24 +218,45 @@ if __name__ == "__main__":
     parser.add_argument("min_rating", type=int, help="Minimum rating to filter games.")
     parser.add_argument("start_date", help="Start date to filter games (YYYY-MM-DD).")
     parser.add_argument("scaling_factor", type=float, help="Scaling factor for determining score diff occurrences.")
+    parser.add_argument("--store", default=STORE_DIR, help="Game store directory (see game_store.py).")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default='array',
+                        help="'array' writes the expanded Go slice literal, 'table' a (value, count) table, "
+                             "'cdf' a cumulative distribution table and 'embed' a binary table embedded by a small Go file.")
+    parser.add_argument("--state-file", default=STATE_FILE, help="File keeping the counts of earlier runs.")
+    parser.add_argument("--full", action='store_true', help="Ignore earlier runs and read every game.")
+    parser.add_argument("--liwords-dir", default=os.path.expandvars(LIWORDS_DIR),
+                        help="Directory to copy the generated files to, empty to skip copying.")
     args = parser.parse_args()
     
-    # Hard-coded CSV file
-    input_csv = 'all_xt_games.csv'
+    # Count the games in range added since the last run, reading only the needed columns
+    key = {'min_rating': args.min_rating, 'start_date': args.start_date}
+    moments, new_games = update_partials(
+        lambda df: score_difference_moments(df, args.min_rating, args.start_date),
+        ['date', 'winnerscore', 'loserscore', 'winneroldrating', 'loseroldrating'], key, args.state_file,
+        args.full, args.store, start_date=args.start_date, min_rating=args.min_rating)
+    print(f"Read {new_games} new games.")
     
-    # Read the CSV file
-    df = pd.read_csv(input_csv, low_memory=False)
-    
-    # Generate score difference array
-    score_diff_array, total_games, score_diff_counts = generate_score_difference_array(
-        df, args.min_rating, args.start_date, args.scaling_factor
+    # Generate the score difference distribution
+    score_diff_instances, total_games, score_diff_counts = generate_score_difference_array(
+        moments, args.min_rating, args.scaling_factor
     )
     
-    # Generate Go array literal
-    go_array_literal = generate_go_array_literal(score_diff_array)
-    
-    # Write to the Go file
+    # Write the Go file, and for 'embed' the binary table next to it
     filename = 'score_differences.go'
+    filenames = [filename]
     with open(filename, 'w') as f:
-        f.write(go_array_literal)
-    shutil.copy(filename, os.path.expandvars('$HOME/liwords/pkg/pair/standings/' + filename))
+        if args.format == 'array':
+            write_go_array_literal(f, score_diff_instances)
+        elif args.format == 'table':
+            write_go_table(f, score_diff_instances)
+        elif args.format == 'cdf':
+            write_go_cdf(f, score_diff_instances)
+        else:
+            write_go_embed(f, BINARY_FILENAME)
+    if args.format == 'embed':
+        with open(BINARY_FILENAME, 'wb') as f:
+            write_binary_table(f, score_diff_instances)
+        filenames.append(BINARY_FILENAME)
+    if args.liwords_dir:
+        for name in filenames:
+            shutil.copy(name, os.path.join(args.liwords_dir, name))
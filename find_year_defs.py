@@ -1,16 +1,10 @@
 import argparse
 import re
 
+from lexicon import load_lexicon
+
 def read_definitions(file_path):
-    definitions = []
-    with open(file_path, 'r') as file:
-        for line in file:
-            parts = line.split('\t')
-            if len(parts) > 1:
-                word = parts[0]
-                definition = parts[1].strip()
-                definitions.append((word, definition))
-    return definitions
+    return list(load_lexicon(file_path).items())
 
 def filter_definitions_by_word_length(definitions, min_length, max_length):
     filtered_definitions = [
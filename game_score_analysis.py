@@ -1,83 +1,215 @@
-import pandas as pd
+import argparse
+import json
+
 import numpy as np
+import pandas as pd
+
+from game_store import STORE_DIR, load_scan_state, read_games, save_scan_state
+
+SCORE_COLUMNS = ['date', 'lexicon', 'winnerscore', 'loserscore', 'winneroldrating', 'loseroldrating']
+START_DATE = '2015-01-01'
+RATING_THRESHOLDS = range(0, 2100, 100)
+MOMENT_COLUMNS = ['count', 'sum', 'sum_sq']
+# Moments of earlier runs, so each run only reads the games added since
+STATE_FILE = 'game_score_analysis.json'
+
+def score_moments(input_df):
+    """
+    Calculates the partial results behind calculate_score_stats, which can be
+    merged with those of other games by merge_partials.
+
+    Returns:
+        dict: Moments of the score differences of the games on or after
+        START_DATE, overall, by lexicon, by minimum rating threshold and by
+        lexicon and threshold.
+    """
+    # Filter games on or after 2015-01-01
+    df = input_df[input_df['date'] >= START_DATE]
+
+    # Calculate score difference
+    score_difference = df['winnerscore'] - df['loserscore']
+
+    return {
+        'overall': group_moments(df, score_difference),
+        'lexicon': group_moments(df, score_difference, by='lexicon'),
+        'thresholds': threshold_moments(df, RATING_THRESHOLDS, score_difference),
+        'lexicon_thresholds': threshold_moments(df, RATING_THRESHOLDS, score_difference, by='lexicon'),
+    }
 
 def calculate_score_stats(input_df):
     """
     Calculate score difference statistics across various dimensions
     """
-    # Create a copy of the dataframe to avoid SettingWithCopyWarning
-    df = input_df.copy()
-    
-    # Ensure date is parsed correctly and filter games on or after 2015-01-01
-    df['date'] = pd.to_datetime(df['date'])
-    df = df[df['date'] >= '2015-01-01']
-    
-    # Ensure numeric columns are converted correctly
-    numeric_columns = ['winnerscore', 'loserscore', 'winneroldrating', 'loseroldrating']
-    for col in numeric_columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # Calculate score difference
-    df['score_difference'] = df['winnerscore'] - df['loserscore']
-    
+    return score_stats_from_moments(score_moments(input_df))
+
+def score_stats_from_moments(moments):
+    """
+    Calculate score difference statistics from the partial results of score_moments
+    """
     # Initialize results dictionary
     results = {}
     
     # Overall stats
-    overall_stats = calculate_stats(df['score_difference'])
-    results['Overall'] = {**overall_stats, 'total_games': len(df)}
+    overall = moments['overall']
+    results['Overall'] = moments_to_stats(overall.loc['all']) if 'all' in overall.index else moments_to_stats(None)
     
     # Stats by lexicon
     lexicon_stats = {}
-    for lexicon in df['lexicon'].unique():
-        lexicon_df = df[df['lexicon'] == lexicon]
-        lexicon_stats[lexicon] = calculate_stats(lexicon_df['score_difference'])
-        lexicon_stats[lexicon]['total_games'] = len(lexicon_df)
+    for lexicon, lexicon_moments in moments['lexicon'].iterrows():
+        lexicon_stats[lexicon] = moments_to_stats(lexicon_moments)
     results['Lexicon'] = lexicon_stats
     
-    # Stats by minimum rating thresholds
-    rating_thresholds = range(0, 2100, 100)
+    # Stats by minimum rating thresholds, from one aggregation over rating bins
+    threshold_stats = moments['thresholds']
+    lexicon_threshold_stats = moments['lexicon_thresholds']
     rating_stats = {}
     
-    for threshold in rating_thresholds:
+    for threshold in RATING_THRESHOLDS:
         # Combined lexicon stats for the threshold
-        threshold_df = df[
-            (df['winneroldrating'] >= threshold) & 
-            (df['loseroldrating'] >= threshold)
-        ]
-        
-        # Create a key for the threshold
-        key = f'Min Rating {threshold}'
-        
-        if len(threshold_df) > 0:
-            rating_stats[key] = {
-                **calculate_stats(threshold_df['score_difference']),
-                'total_games': len(threshold_df)
-            }
+        if threshold in threshold_stats.index:
+            stats = moments_to_stats(threshold_stats.loc[threshold])
+            if stats['total_games'] > 0:
+                rating_stats[f'Min Rating {threshold}'] = stats
         
         # Lexicon-specific stats for the threshold
         for lexicon in [0, 1]:
-            lexicon_threshold_df = threshold_df[threshold_df['lexicon'] == lexicon]
-            
-            if len(lexicon_threshold_df) > 0:
-                lexicon_key = f'Lexicon {lexicon}, Min Rating {threshold}'
-                rating_stats[lexicon_key] = {
-                    **calculate_stats(lexicon_threshold_df['score_difference']),
-                    'total_games': len(lexicon_threshold_df)
-                }
+            if (lexicon, threshold) in lexicon_threshold_stats.index:
+                stats = moments_to_stats(lexicon_threshold_stats.loc[(lexicon, threshold)])
+                if stats['total_games'] > 0:
+                    rating_stats[f'Lexicon {lexicon}, Min Rating {threshold}'] = stats
     
     results['Rating Thresholds'] = rating_stats
     
     return results
 
-def calculate_stats(data):
+def group_moments(df, values, by=None):
     """
-    Calculate mean, standard deviation for a series
+    Aggregates values overall, as the group 'all', or by a column of df.
+
+    Returns:
+        DataFrame: 'count', 'sum' and 'sum_sq' columns indexed by group.
+        Missing values are left out.
     """
-    return {
-        'average': np.mean(data),
-        'std_deviation': np.std(data)
-    }
+    valid = values.notna().to_numpy()
+    values = values.to_numpy()[valid].astype(np.int64)
+    groups = df[by].to_numpy()[valid] if by is not None else np.full(len(values), 'all')
+    name = by or 'group'
+    grouped = pd.DataFrame({name: groups, 'value': values, 'value_sq': values * values})
+    return grouped.groupby(name, observed=True).agg(count=('value', 'size'), sum=('value', 'sum'),
+                                                    sum_sq=('value_sq', 'sum'))
+
+def threshold_moments(df, thresholds, values, by=None):
+    """
+    Aggregates values over the games where both players were rated at least
+    each threshold, in a single pass. Games are binned once by the lower of the
+    two old ratings, the count, sum and sum of squares are computed per bin
+    (and group) and every threshold's totals are reverse cumulative sums of
+    the bins at or above it.
+
+    Args:
+        df (DataFrame): Games with 'winneroldrating' and 'loseroldrating' columns.
+        thresholds (sequence): Increasing minimum ratings.
+        values (Series): The value to aggregate for each game, aligned with df.
+        by (str): Optional column to aggregate each group of separately.
+
+    Returns:
+        DataFrame: 'count', 'sum' and 'sum_sq' columns indexed by 'threshold',
+        or by (group, 'threshold') if by is given. Games with a missing value or
+        rating are left out.
+    """
+    thresholds = list(thresholds)
+    min_rating = np.minimum(df['winneroldrating'], df['loseroldrating'])
+    valid = (min_rating.notna() & values.notna()).to_numpy()
+    bins = np.searchsorted(thresholds, min_rating.to_numpy()[valid], side='right') - 1
+    rated = bins >= 0
+    values = values.to_numpy()[valid][rated].astype(np.int64)
+    binned = pd.DataFrame({'bin': bins[rated], 'value': values, 'value_sq': values * values})
+    keys = ['bin']
+    if by is not None:
+        binned[by] = df[by].to_numpy()[valid][rated]
+        keys = [by, 'bin']
+    moments = binned.groupby(keys, observed=True).agg(count=('value', 'size'), sum=('value', 'sum'),
+                                                      sum_sq=('value_sq', 'sum'))
+
+    # Every bin of every group, so the cumulative sums line up with the thresholds
+    if by is None:
+        moments = moments.reindex(range(len(thresholds)), fill_value=0)
+        cumulative = moments.iloc[::-1].cumsum().iloc[::-1]
+        cumulative.index = pd.Index(thresholds, name='threshold')
+    else:
+        groups = moments.index.get_level_values(by).unique()
+        moments = moments.reindex(pd.MultiIndex.from_product([groups, range(len(thresholds))], names=keys),
+                                  fill_value=0)
+        cumulative = moments.iloc[::-1].groupby(level=by, sort=False).cumsum().iloc[::-1]
+        cumulative.index = cumulative.index.set_levels(thresholds, level='bin').rename('threshold', level='bin')
+    return cumulative
+
+
+def moments_to_stats(moments, ddof=0):
+    """
+    Calculate mean, standard deviation and game count from a row of moments, or None for no games.
+    The standard deviation is NaN when there are too few games, like pandas'.
+    """
+    count = 0 if moments is None else int(moments['count'])
+    if count == 0:
+        return {'average': None, 'std_deviation': None, 'total_games': 0}
+    average = moments['sum'] / count
+    std_deviation = np.nan
+    if count > ddof:
+        variance = (moments['sum_sq'] - moments['sum'] * average) / (count - ddof)
+        std_deviation = np.sqrt(max(variance, 0))
+    return {'average': average, 'std_deviation': std_deviation, 'total_games': count}
+
+def merge_moments(moments, other):
+    """Adds up two moments tables, e.g. of the games read by different runs."""
+    merged = pd.concat([moments, other])
+    return merged.groupby(level=list(range(merged.index.nlevels))).sum()
+
+def merge_partials(partials, other):
+    """Merges two dictionaries of moments tables with the same keys, either of which may be None."""
+    if partials is None or other is None:
+        return other if partials is None else partials
+    return {name: merge_moments(partials[name], other[name]) for name in partials}
+
+def partials_state(partials):
+    """Returns a dictionary of moments tables in a JSON-compatible form."""
+    return {name: {'index': list(moments.index.names),
+                   'records': json.loads(moments.reset_index().to_json(orient='records'))}
+            for name, moments in partials.items()}
+
+def partials_from_state(state):
+    """Rebuilds a dictionary of moments tables saved by partials_state."""
+    return {name: pd.DataFrame.from_records(table['records'], columns=table['index'] + MOMENT_COLUMNS)
+                    .set_index(table['index'])
+            for name, table in state.items()}
+
+def update_partials(compute, columns, key, state_file, full=False, store_dir=STORE_DIR, **filters):
+    """
+    Brings partial results up to date with the game store. The results saved
+    by an earlier run with the same key are merged with compute(df) for the
+    games added since, which are the only ones read, and saved again.
+
+    Args:
+        compute (callable): Returns a dictionary of moments tables for a DataFrame of games.
+        columns (list): The columns compute needs.
+        key (dict): The parameters the results depend on. Saved results for other parameters are ignored.
+        state_file (str): JSON file keeping the results between runs.
+        full (bool): Ignore saved results and read every game.
+        store_dir (str): The game store directory.
+        **filters: Filters for read_games, e.g. start_date.
+
+    Returns:
+        tuple: The merged partial results and the number of games read.
+    """
+    last_gameid, state = (0, None) if full else load_scan_state(state_file, key)
+    partials = partials_from_state(state) if state is not None else None
+    df = read_games(list(columns) + ['gameid'], min_game_id=last_gameid + 1, store_dir=store_dir, **filters)
+    if len(df) or partials is None:
+        partials = merge_partials(partials, compute(df))
+    if len(df):
+        last_gameid = max(last_gameid, int(df['gameid'].max()))
+    save_scan_state(state_file, key, last_gameid, partials_state(partials))
+    return partials, len(df)
 
 def print_results(results):
     """
@@ -107,9 +239,18 @@ def print_results(results):
 
 # Main execution
 if __name__ == "__main__":
-    # Read the CSV file with low_memory=False to suppress dtype warning
-    df = pd.read_csv('all_xt_games.csv', low_memory=False)
+    parser = argparse.ArgumentParser(description="Score difference statistics of the games since 2015, "
+                                                 "reading only the games added since the last run.")
+    parser.add_argument("--store", default=STORE_DIR, help="Game store directory (see game_store.py).")
+    parser.add_argument("--state-file", default=STATE_FILE, help="File keeping the statistics of earlier runs.")
+    parser.add_argument("--full", action='store_true', help="Ignore earlier runs and read every game.")
+    args = parser.parse_args()
+
+    # Read only the needed columns of the games since the cutoff added since the last run
+    key = {'start_date': START_DATE, 'thresholds': list(RATING_THRESHOLDS)}
+    moments, new_games = update_partials(score_moments, SCORE_COLUMNS, key, args.state_file, args.full, args.store, start_date=START_DATE)
+    print(f"Read {new_games} new games.\n")
     
     # Calculate and print statistics
-    results = calculate_score_stats(df)
-    print_results(results)
\ No newline at end of file
+    results = score_stats_from_moments(moments)
+    print_results(results)
@@ -0,0 +1,268 @@
+"""
+Streaming statistics over batches of cross-tables games.
+
+A batch is a dictionary of equal-length NumPy masked arrays, one per column,
+with missing values masked. Each reducer only skips the games missing one of
+its own columns, so a game without ratings still counts in a score or lexicon
+statistic. Batches come from the API (api_batches) or the local game store
+(store_batches) and are fed once to any number of reducers, which update
+their state with vectorized operations. Reducers of the same kind can be
+merged, e.g. to combine the results of scanning different ID ranges, and
+saved to and loaded from JSON-compatible dictionaries, so a later run only
+has to scan new games.
+"""
+import numpy as np
+import pandas as pd
+
+from get_xt_games import WINDOW_SIZE
+from game_store import STORE_DIR, games_filter, open_store
+from xt_client import XtClient
+
+RATING_BAND_WIDTH = 100
+
+
+class MaxRatingGap:
+    """The game with the largest difference between the players' old ratings. Ties go to the lowest game ID."""
+
+    name = 'max_rating_gap'
+    columns = ('gameid', 'winneroldrating', 'loseroldrating')
+
+    def __init__(self, max_gap=-1, gameid=None):
+        self.max_gap = max_gap
+        self.gameid = gameid
+
+    def update(self, batch):
+        gameids, winner, loser = valid_columns(batch, self.columns)
+        if not len(gameids):
+            return
+        gaps = np.abs(winner - loser)
+        max_gap = gaps.max()
+        gameid = gameids[gaps == max_gap].min()
+        self._add(int(max_gap), int(gameid))
+
+    def merge(self, other):
+        if other.gameid is not None:
+            self._add(other.max_gap, other.gameid)
+
+    def _add(self, max_gap, gameid):
+        if max_gap > self.max_gap or (max_gap == self.max_gap and gameid < self.gameid):
+            self.max_gap, self.gameid = max_gap, gameid
+
+    def state(self):
+        return {'max_gap': self.max_gap, 'gameid': self.gameid}
+
+    def report(self):
+        return f"Game with max rating difference: {self.gameid} ({self.max_gap} points)"
+
+
+class ScoreDiffHistogram:
+    """The number of games won by each margin."""
+
+    name = 'score_diff_histogram'
+    columns = ('winnerscore', 'loserscore')
+
+    def __init__(self, offset=0, counts=()):
+        # counts[i] is the number of games won by offset + i points
+        self.offset = offset
+        self.counts = np.array(counts, dtype=np.int64)
+
+    def update(self, batch):
+        winner, loser = valid_columns(batch, self.columns)
+        diffs = winner - loser
+        if len(diffs):
+            low = int(diffs.min())
+            self._add(low, np.bincount(diffs - low))
+
+    def merge(self, other):
+        self._add(other.offset, other.counts)
+
+    def _add(self, offset, counts):
+        if not len(counts):
+            return
+        if not len(self.counts):
+            self.offset, self.counts = offset, np.array(counts, dtype=np.int64)
+            return
+        low = min(self.offset, offset)
+        high = max(self.offset + len(self.counts), offset + len(counts))
+        merged = np.zeros(high - low, dtype=np.int64)
+        merged[self.offset - low:self.offset - low + len(self.counts)] += self.counts
+        merged[offset - low:offset - low + len(counts)] += counts
+        self.offset, self.counts = low, merged
+
+    def histogram(self):
+        """Returns a dictionary mapping each score difference to its number of games."""
+        return {self.offset + i: int(count) for i, count in enumerate(self.counts) if count}
+
+    def state(self):
+        return {'offset': self.offset, 'counts': self.counts.tolist()}
+
+    def report(self):
+        total = int(self.counts.sum())
+        if not total:
+            return "Score differences: no games"
+        mean = (np.arange(self.offset, self.offset + len(self.counts)) * self.counts).sum() / total
+        return f"Score differences: {total} games, average {mean:.2f}"
+
+
+class UpsetRate:
+    """
+    How often the lower rated player wins, by the rating band of the higher
+    rated player. Games between equally rated players are not counted.
+    """
+
+    name = 'upset_rate'
+    columns = ('winneroldrating', 'loseroldrating')
+
+    def __init__(self, band_width=RATING_BAND_WIDTH, games=(), upsets=()):
+        self.band_width = band_width
+        self.games = np.array(games, dtype=np.int64)
+        self.upsets = np.array(upsets, dtype=np.int64)
+
+    def update(self, batch):
+        winner, loser = valid_columns(batch, self.columns)
+        favored = winner != loser
+        bands = np.maximum(winner[favored], loser[favored]) // self.band_width
+        if len(bands):
+            upsets = winner[favored] < loser[favored]
+            self._add(np.bincount(bands), np.bincount(bands, weights=upsets).astype(np.int64))
+
+    def merge(self, other):
+        if other.band_width != self.band_width:
+            raise ValueError("Cannot merge upset rates with different rating bands.")
+        self._add(other.games, other.upsets)
+
+    def _add(self, games, upsets):
+        size = max(len(self.games), len(games))
+        self.games = np.pad(self.games, (0, size - len(self.games)))
+        self.upsets = np.pad(self.upsets, (0, size - len(self.upsets)))
+        self.games[:len(games)] += games
+        self.upsets[:len(upsets)] += upsets
+
+    def rates(self):
+        """Returns a dictionary mapping the lowest rating of each band to its (games, upsets, rate)."""
+        return {
+            band * self.band_width: (int(games), int(upsets), upsets / games)
+            for band, (games, upsets) in enumerate(zip(self.games, self.upsets)) if games
+        }
+
+    def state(self):
+        return {'band_width': self.band_width, 'games': self.games.tolist(), 'upsets': self.upsets.tolist()}
+
+    def report(self):
+        lines = ["Upset rate by rating of the higher rated player:"]
+        for rating, (games, upsets, rate) in self.rates().items():
+            lines.append(f"  {rating}-{rating + self.band_width - 1}: {rate:6.2%} of {games} games")
+        return '\n'.join(lines)
+
+
+class LexiconCounts:
+    """The number of games played in each lexicon."""
+
+    name = 'lexicon_counts'
+    columns = ('lexicon',)
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+
+    def update(self, batch):
+        lexicons, counts = np.unique(valid_columns(batch, self.columns)[0], return_counts=True)
+        self.merge(LexiconCounts(zip(lexicons.tolist(), counts.tolist())))
+
+    def merge(self, other):
+        for lexicon, count in other.counts.items():
+            self.counts[lexicon] = self.counts.get(lexicon, 0) + count
+
+    def state(self):
+        # JSON object keys are strings, so the counts are saved as pairs
+        return {'counts': sorted(self.counts.items())}
+
+    def report(self):
+        return "Games by lexicon: " + ', '.join(f"{lexicon}: {count}" for lexicon, count in sorted(self.counts.items()))
+
+
+REDUCERS = {reducer.name: reducer for reducer in (MaxRatingGap, ScoreDiffHistogram, UpsetRate, LexiconCounts)}
+
+
+def default_reducers():
+    """Returns a fresh instance of every reducer."""
+    return [reducer() for reducer in REDUCERS.values()]
+
+
+def reducers_from_state(states):
+    """Rebuilds reducers from a dictionary mapping reducer names to saved states."""
+    return [REDUCERS[name](**state) for name, state in states.items()]
+
+
+def reducers_state(reducers):
+    """Returns a JSON-compatible dictionary mapping reducer names to their states."""
+    return {reducer.name: reducer.state() for reducer in reducers}
+
+
+def required_columns(reducers):
+    columns = []
+    for reducer in reducers:
+        columns.extend(column for column in reducer.columns if column not in columns)
+    return columns
+
+
+def valid_columns(batch, columns):
+    """Returns the columns of a batch as plain arrays, keeping only the games with none of them missing."""
+    valid = ~np.logical_or.reduce([np.ma.getmaskarray(batch[column]) for column in columns])
+    return [np.ma.getdata(batch[column])[valid] for column in columns]
+
+
+def games_to_batch(games, columns):
+    """
+    Converts a list of games from the API, with string values, to a batch.
+    Missing or non-numeric values are masked.
+    """
+    df = pd.DataFrame(games, columns=columns).apply(pd.to_numeric, errors='coerce')
+    batch = {}
+    for column in columns:
+        values = df[column].to_numpy(np.float64)
+        missing = np.isnan(values)
+        batch[column] = np.ma.array(np.where(missing, 0, values).astype(np.int64), mask=missing)
+    return batch
+
+
+def record_batch_to_batch(record_batch, columns):
+    """Converts a pyarrow record batch from the game store to a batch, masking nulls."""
+    batch = {}
+    for column in columns:
+        array = record_batch.column(column)
+        batch[column] = np.ma.array(array.fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64),
+                                    mask=array.is_null().to_numpy(zero_copy_only=False))
+    return batch
+
+
+def api_batches(columns, min_id, max_id, client=None, chunk_size=WINDOW_SIZE):
+    """Yields batches of the games from min_id to max_id in the API, in ascending ID windows."""
+    client = client or XtClient()
+    for window_min_id in range(min_id, max_id + 1, chunk_size):
+        window_max_id = min(window_min_id + chunk_size - 1, max_id)
+        yield games_to_batch(client.games(window_min_id, window_max_id), columns)
+
+
+def store_batches(columns, store_dir=STORE_DIR, **filters):
+    """Yields batches of the games in the game store. filters are passed to games_filter."""
+    dataset = open_store(store_dir)
+    for record_batch in dataset.to_batches(columns=columns, filter=games_filter(**filters)):
+        yield record_batch_to_batch(record_batch, columns)
+
+
+def run_reducers(batches, reducers):
+    """
+    Feeds every batch to every reducer in a single pass.
+
+    Returns:
+        int: The highest game ID seen, or 0 if there were no games or no 'gameid' column.
+    """
+    last_gameid = 0
+    for batch in batches:
+        for reducer in reducers:
+            reducer.update(batch)
+        if 'gameid' in batch:
+            gameids = valid_columns(batch, ('gameid',))[0]
+            if len(gameids):
+                last_gameid = max(last_gameid, int(gameids.max()))
+    return last_gameid
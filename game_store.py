@@ -0,0 +1,341 @@
+"""
+A typed, columnar local store of cross-tables games.
+
+Harvested games (see get_xt_games.py) are ingested once into a Parquet dataset
+partitioned by year, with compact column types: int16 scores and ratings, an
+int32 game ID and a date32 date. Analyses then read only the columns and date
+range they need, and the year partitions and Parquet row group statistics let
+pyarrow skip everything else.
+
+The sync command then keeps the store up to date by fetching only the games
+newer than the newest stored one. New games are staged under '_sync' in the
+store, which dataset discovery ignores, and only moved into the partitions
+once completely written.
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import get_xt_games
+from xt_client import XtClient, add_client_arguments, client_from_args
+
+GAMES_CSV = 'all_xt_games.csv'
+STORE_DIR = 'xt_games'
+
+# Types of the columns used by the analysis scripts. Other columns are stored as strings.
+COLUMN_TYPES = {
+    'gameid': pa.int32(),
+    'date': pa.date32(),
+    'winnerscore': pa.int16(),
+    'loserscore': pa.int16(),
+    'winneroldrating': pa.int16(),
+    'loseroldrating': pa.int16(),
+    'winnernewrating': pa.int16(),
+    'losernewrating': pa.int16(),
+    'lexicon': pa.int8(),
+}
+# Returned as pandas categoricals
+CATEGORY_COLUMNS = ('lexicon',)
+
+PARTITIONING = ds.partitioning(pa.schema([('year', pa.int16())]), flavor='hive')
+
+INGEST_CHUNK_SIZE = 200_000
+
+SYNC_DIR = '_sync'
+SYNC_CSV = 'games.csv'
+SYNC_BATCH_DIR = 'batch'
+SYNC_COMPLETE_MARKER = 'COMPLETE'
+
+
+def games_schema(columns):
+    """Returns the store schema for a games CSV with the given header, plus the 'year' partition column."""
+    return pa.schema([(column, COLUMN_TYPES.get(column, pa.string())) for column in columns] +
+                     [('year', pa.int16())])
+
+
+def games_to_table(df, schema):
+    """
+    Converts a DataFrame of games as read from the CSV (all strings) to a table
+    of the store schema. Values that do not parse become nulls.
+    """
+    arrays = []
+    for field in schema:
+        if field.name == 'year':
+            arrays.append(pa.array(pd.to_datetime(df['date'], errors='coerce').dt.year, type=pa.int16(),
+                                   from_pandas=True))
+        elif field.type == pa.date32():
+            dates = pd.to_datetime(df[field.name], errors='coerce')
+            arrays.append(pa.array(dates.dt.date, type=pa.date32(), from_pandas=True))
+        elif field.type == pa.string():
+            arrays.append(pa.array(df[field.name], type=pa.string(), from_pandas=True))
+        else:
+            values = pd.to_numeric(df[field.name], errors='coerce')
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_games(batches, schema, store_dir=STORE_DIR, existing_data_behavior='error', basename_template=None):
+    """Writes record batches of games into the year partitions of the store."""
+    ds.write_dataset(batches, store_dir, schema=schema, format='parquet', partitioning=PARTITIONING,
+                     existing_data_behavior=existing_data_behavior,
+                     basename_template=basename_template or 'part-{i}.parquet')
+
+
+def ingest_csv(csv_path=GAMES_CSV, store_dir=STORE_DIR, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Converts a games CSV into the store, replacing whatever the store held. The
+    CSV is read in chunks and the new store is built next to the old one, then
+    swapped in, so an interrupted ingest leaves the old store intact.
+
+    Returns:
+        int: The number of games ingested.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    schema = games_schema(header)
+    total = 0
+
+    def batches():
+        nonlocal total
+        for chunk in pd.read_csv(csv_path, dtype=str, chunksize=chunk_size, keep_default_na=False,
+                                 na_values=['']):
+            total += len(chunk)
+            yield from games_to_table(chunk, schema).to_batches()
+
+    temp_dir = f"{store_dir}.{os.getpid()}.tmp"
+    write_games(batches(), schema, temp_dir)
+    old_dir = f"{store_dir}.{os.getpid()}.old"
+    if os.path.exists(store_dir):
+        os.rename(store_dir, old_dir)
+    os.rename(temp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return total
+
+
+def open_store(store_dir=STORE_DIR):
+    """Opens the store as a pyarrow dataset."""
+    if not os.path.isdir(store_dir):
+        raise FileNotFoundError(f"Game store {store_dir} not found. Run 'python game_store.py ingest' first.")
+    return ds.dataset(store_dir, format='parquet', partitioning=PARTITIONING)
+
+
+def games_filter(start_date=None, end_date=None, min_rating=None, min_game_id=None):
+    """
+    Builds a dataset filter expression. Date bounds are also applied to the
+    year partition column so whole years are skipped without being opened.
+
+    Args:
+        start_date (str or date): Only games on or after this date.
+        end_date (str or date): Only games before this date.
+        min_rating (int): Only games where both players were rated at least this.
+        min_game_id (int): Only games with at least this ID.
+
+    Returns:
+        pyarrow.dataset.Expression: The filter, or None for no filter.
+    """
+    conditions = []
+    if start_date is not None:
+        start_date = pd.Timestamp(start_date).date()
+        conditions.append(ds.field('year') >= start_date.year)
+        conditions.append(ds.field('date') >= pa.scalar(start_date, pa.date32()))
+    if end_date is not None:
+        end_date = pd.Timestamp(end_date).date()
+        conditions.append(ds.field('year') <= end_date.year)
+        conditions.append(ds.field('date') < pa.scalar(end_date, pa.date32()))
+    if min_rating is not None:
+        conditions.append(ds.field('winneroldrating') >= min_rating)
+        conditions.append(ds.field('loseroldrating') >= min_rating)
+    if min_game_id is not None:
+        conditions.append(ds.field('gameid') >= min_game_id)
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_games(columns=None, start_date=None, end_date=None, min_rating=None, min_game_id=None,
+               store_dir=STORE_DIR):
+    """
+    Reads games from the store into a DataFrame.
+
+    Args:
+        columns (list): The columns to read, defaults to all of them.
+        start_date (str or date): Only games on or after this date.
+        end_date (str or date): Only games before this date.
+        min_rating (int): Only games where both players were rated at least this.
+        min_game_id (int): Only games with at least this ID, e.g. the ones added since an earlier run.
+        store_dir (str): The store directory.
+
+    Returns:
+        DataFrame: The games, with datetime64 dates and categorical lexicons.
+    """
+    dataset = open_store(store_dir)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != 'year']
+    table = dataset.to_table(columns=columns, filter=games_filter(start_date, end_date, min_rating, min_game_id))
+    df = table.to_pandas(date_as_object=False)
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def max_game_id(store_dir=STORE_DIR):
+    """Returns the highest game ID in the store, or 0 if it has no games."""
+    table = open_store(store_dir).to_table(columns=['gameid'])
+    return pc.max(table.column('gameid')).as_py() or 0
+
+
+def load_scan_state(state_file, key):
+    """
+    Returns the last game ID read by an earlier run with the same key, e.g. the
+    same filters, and the partial results it saved, or 0 and None.
+    """
+    if state_file and os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('key') == key:
+            return state['last_gameid'], state['partials']
+    return 0, None
+
+
+def save_scan_state(state_file, key, last_gameid, partials):
+    """Saves the last game ID read and JSON-compatible partial results for load_scan_state."""
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as file:
+        json.dump({'key': key, 'last_gameid': last_gameid, 'partials': partials}, file)
+    os.replace(temp_file, state_file)
+
+
+def append_games(df, store_dir=STORE_DIR):
+    """
+    Appends games read from a harvested CSV (all strings) to the store,
+    skipping games whose IDs are already stored or repeated.
+
+    The new files are written to a staging directory first and marked
+    complete before any of them is moved into place; an append interrupted
+    after that point is finished by the next call to publish_staged_games.
+
+    Returns:
+        int: The number of games appended.
+    """
+    schema = open_store(store_dir).schema
+    df = df.assign(gameid=pd.to_numeric(df['gameid'], errors='coerce')).dropna(subset=['gameid'])
+    df = df.drop_duplicates('gameid')
+    if not df.empty:
+        stored = read_games(['gameid'], min_game_id=int(df['gameid'].min()), store_dir=store_dir)['gameid']
+        df = df[~df['gameid'].isin(stored)]
+    if df.empty:
+        return 0
+
+    columns = [field.name for field in schema if field.name != 'year']
+    table = games_to_table(df.reindex(columns=columns), schema)
+    batch_dir = os.path.join(store_dir, SYNC_DIR, SYNC_BATCH_DIR)
+    shutil.rmtree(batch_dir, ignore_errors=True)
+    basename = f"sync-{int(datetime.datetime.now().timestamp())}-{{i}}.parquet"
+    write_games(table.to_batches(), schema, batch_dir, basename_template=basename)
+    open(os.path.join(batch_dir, SYNC_COMPLETE_MARKER), 'w').close()
+    publish_staged_games(store_dir)
+    return len(df)
+
+
+def publish_staged_games(store_dir=STORE_DIR):
+    """Moves completely staged games into the store's partitions and discards incomplete ones."""
+    batch_dir = os.path.join(store_dir, SYNC_DIR, SYNC_BATCH_DIR)
+    if not os.path.isdir(batch_dir):
+        return
+    if os.path.exists(os.path.join(batch_dir, SYNC_COMPLETE_MARKER)):
+        for directory, _, filenames in os.walk(batch_dir):
+            partition_dir = os.path.join(store_dir, os.path.relpath(directory, batch_dir))
+            for filename in filenames:
+                if filename != SYNC_COMPLETE_MARKER:
+                    os.makedirs(partition_dir, exist_ok=True)
+                    os.replace(os.path.join(directory, filename), os.path.join(partition_dir, filename))
+    shutil.rmtree(batch_dir)
+
+
+def sync(store_dir=STORE_DIR, client=None, workers=4):
+    """
+    Fetches the games newer than the newest stored game and appends them to
+    the store. The download is checkpointed like get_xt_games, so an
+    interrupted sync resumes where it stopped.
+
+    Args:
+        store_dir (str): Store directory.
+        client (XtClient): Client to fetch with, created with default settings if not given.
+        workers (int): The number of ID windows fetched in parallel.
+
+    Returns:
+        int: The ID of the first game that was not stored before, for reading
+        just the new games with read_games(min_game_id=...).
+
+    Raises:
+        RuntimeError: If the download failed or stopped before the newest
+            stored game. Nothing is appended and the next sync resumes it.
+    """
+    publish_staged_games(store_dir)
+    first_new_id = max_game_id(store_dir) + 1
+    client = client or XtClient(pool_size=workers)
+    highest_game_id = client.max_game_id()
+    print(f"Stored games end at ID {first_new_id - 1}, highest existing game ID is {highest_game_id}")
+    if highest_game_id < first_new_id:
+        return first_new_id
+
+    sync_dir = os.path.join(store_dir, SYNC_DIR)
+    os.makedirs(sync_dir, exist_ok=True)
+    sync_csv = os.path.join(sync_dir, SYNC_CSV)
+    checkpoint = get_xt_games.load_checkpoint(sync_csv + get_xt_games.CHECKPOINT_SUFFIX)
+    starting_id = checkpoint["next_max_id"] if checkpoint else highest_game_id
+    num_games = get_xt_games.collect_games(starting_id, sys.maxsize, sync_csv, client, workers,
+                                           min_id=first_new_id)
+    # Keep the download and its checkpoint until every new ID has been fetched, so a rerun resumes
+    checkpoint = get_xt_games.load_checkpoint(sync_csv + get_xt_games.CHECKPOINT_SUFFIX)
+    if checkpoint["next_max_id"] >= first_new_id:
+        raise RuntimeError(f"Sync stopped at game ID {checkpoint['next_max_id']} "
+                           f"before reaching game ID {first_new_id}.")
+    if num_games:
+        appended = append_games(pd.read_csv(sync_csv, dtype=str, keep_default_na=False, na_values=['']),
+                                store_dir)
+        print(f"Appended {appended} new games to {store_dir}")
+    os.remove(sync_csv)
+    os.remove(sync_csv + get_xt_games.CHECKPOINT_SUFFIX)
+    return first_new_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local store of cross-tables games.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help="Convert a harvested games CSV into the store")
+    ingest_parser.add_argument('csv_file', nargs='?', default=GAMES_CSV, help="Games CSV to ingest")
+    ingest_parser.add_argument('--store', default=STORE_DIR, help="Store directory")
+    sync_parser = subparsers.add_parser('sync', help="Append the games newer than the newest stored game")
+    sync_parser.add_argument('--store', default=STORE_DIR, help="Store directory")
+    sync_parser.add_argument('--workers', type=int, default=4, help="Number of ID windows to fetch in parallel")
+    add_client_arguments(sync_parser)
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        start = datetime.datetime.now()
+        total = ingest_csv(args.csv_file, args.store)
+        print(f"Ingested {total} games from {args.csv_file} into {args.store} "
+              f"in {(datetime.datetime.now() - start).total_seconds():.1f}s")
+    elif args.command == 'sync':
+        client = client_from_args(args, args.workers)
+        try:
+            sync(args.store, client, args.workers)
+        except RuntimeError as e:
+            sys.exit(f"{e} Rerun sync to resume.")
+        finally:
+            if args.metrics:
+                print(client.metrics.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,131 +1,151 @@
-import time
-import requests
 import argparse
 import csv
+import json
 import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-# Define headers to be used for all API calls
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (compatible; Script/1.0; +http://example.com/bot)",
-    "Accept": "application/json"
-}
+from xt_client import XtClient, add_client_arguments, client_from_args
 
-def get_highest_game_id():
-    """Retrieve the highest existing game ID using the info API."""
-    url = "https://cross-tables.com/rest/info.php"
-    print(f"Querying: {url}")  # Print querying message
+WINDOW_SIZE = 1000
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+
+def load_checkpoint(checkpoint_file):
+    """Returns the saved harvest state, or None if there is none."""
     try:
-        response = requests.get(url, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json()
-        return int(data["maxgameid"])
-    except requests.exceptions.RequestException as e:
-        print(f"Request error: {e}")
-    except ValueError:
-        print("Error decoding JSON response.")
-    return None  # Return None if there's an error
-
-def query_games(min_id, max_id):
-    """Query cross-tables.com for games in the given ID range, retrying up to 3 times on failure."""
-    url = f"https://cross-tables.com/rest/games.php?minid={min_id}&maxid={max_id}"
-    print(f"Querying: {url}")  # Print querying message
-    max_retries = 10  # Maximum number of retries
-    attempt = 0  # Current attempt count
-
-    while attempt < max_retries:
+        with open(checkpoint_file, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(checkpoint_file, state):
+    """Atomically replaces the saved harvest state."""
+    temp_file = f"{checkpoint_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(temp_file, checkpoint_file)
+
+
+def collect_games(starting_id, num_games, output_file, client=None, workers=4, window_size=WINDOW_SIZE,
+                  restart=False, min_id=1):
+    """
+    Collect games from cross-tables.com, from starting_id downwards, until
+    num_games are written or min_id is reached.
+
+    Windows of window_size IDs are fetched by a pool of worker threads but
+    written strictly in descending ID order, so the output does not depend on
+    which request finishes first. After each window the output is flushed and
+    a checkpoint '<output_file>.checkpoint' records the progress, so a rerun
+    picks up after the last written window instead of starting over.
+
+    Args:
+        starting_id (int): The highest game ID to collect.
+        num_games (int): The number of games to collect.
+        output_file (str): The CSV file to write.
+        client (XtClient): Client to fetch with, created with default settings if not given.
+        workers (int): The number of windows fetched in parallel.
+        window_size (int): The number of game IDs queried per request.
+        restart (bool): Whether to ignore an existing checkpoint and overwrite the output.
+        min_id (int): The lowest game ID to collect.
+
+    Returns:
+        int: The total number of games in the output file.
+    """
+    checkpoint_file = output_file + CHECKPOINT_SUFFIX
+    state = None if restart else load_checkpoint(checkpoint_file)
+    if state is not None and os.path.isfile(output_file):
+        print(f"Resuming from checkpoint {checkpoint_file}: {state['games_written']} games already written.")
+        # Drop anything written after the last checkpoint
+        with open(output_file, "r+b") as file:
+            file.truncate(state["output_size"])
+    else:
+        if os.path.isfile(output_file):
+            print(f"Overwriting existing file: {output_file}")
+        open(output_file, "w").close()
+        state = {"next_max_id": starting_id, "games_written": 0, "output_size": 0, "fieldnames": None}
+        save_checkpoint(checkpoint_file, state)
+
+    client = client or XtClient(pool_size=workers)
+    next_max_id = state["next_max_id"]
+
+    def next_window():
+        nonlocal next_max_id
+        if next_max_id < min_id:
+            return None
+        window = (max(next_max_id - window_size + 1, min_id), next_max_id)
+        next_max_id = window[0] - 1
+        return window
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            open(output_file, "a", newline="", encoding="utf-8") as file:
+        pending = deque()
+
+        def submit_windows():
+            # Keep a few windows queued per worker so no thread sits idle
+            while len(pending) < 2 * workers:
+                window = next_window()
+                if window is None:
+                    return
+                pending.append((window, executor.submit(client.games, *window)))
+
+        submit_windows()
         try:
-            response = requests.get(url, headers=HEADERS)
-            response.raise_for_status()  # Raise an error for HTTP error responses
-            
-            # Check if the response content is empty
-            if response.content.strip() == b"":  # Checking for empty response
-                print("Received an empty response.")
-                return []  # Return an empty list for no games
-            
-            data = response.json()  # Attempt to decode JSON
-            return data["games"]
-
-        except requests.exceptions.RequestException as e:
-            attempt += 1
-            print(f"Request error: {e}. Attempt {attempt}/{max_retries}")
-            
-            if attempt == max_retries:
-                print("Max retries reached. Exiting query.")
-                return []  # Return an empty list after max retries
-            else:
-                # Optionally wait before retrying (e.g., 1 second)
-                time.sleep(5)
-        
-        except ValueError:
-            print("Error decoding JSON response.")
-            return []  # Return an empty list if there's an error
-
-
-def write_games_to_csv(games, filename):
-    """Append the collected games to a CSV file."""
-    # Define CSV headers based on the keys of the first game entry
-    headers = games[0].keys()
-
-    # Append mode for writing to CSV file
-    with open(filename, mode="a", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=headers)
-        
-        # Write headers only if the file is new
-        if file.tell() == 0:  # If file is empty, write headers
-            writer.writeheader()
-        
-        writer.writerows(games)  # Write all games
-
-    print(f"Wrote {len(games)} games to {filename}")
-
-def collect_games(starting_id, num_games, output_file):
-    """Collect games from cross-tables.com, starting from starting_id, until num_games is reached."""
-    current_id = starting_id
-
-    # Overwrite the existing CSV file if it exists
-    if os.path.isfile(output_file):
-        print(f"Overwriting existing file: {output_file}")
-
-    # Create a new file by opening it in write mode
-    with open(output_file, mode="w", newline="", encoding="utf-8") as file:
-        pass  # Just create/overwrite the file
-
-    while num_games > 0:
-        max_id = current_id - 1
-        min_id = max(max_id - 999, 1)  # Query at most 1000 games at a time, ensuring min_id is at least 1
-        if max_id > min_id:
-            break
-        batch = query_games(min_id, max_id)
-
-        # Check if the batch is empty
-        if not batch:
-            print(f"No games found in range {min_id} to {max_id}. Continuing to next range.")
-            current_id = min_id  # Move current_id down to continue querying lower IDs
-            continue  # Skip to the next iteration if batch is empty
-
-        # Update remaining number of games to collect
-        num_to_write = min(len(batch), num_games)
-        write_games_to_csv(batch[:num_to_write], output_file)
-        num_games -= num_to_write
-        current_id = min_id  # Move to the next range
-
-    print(f"Finished collecting games. Total games requested: {num_games}.")
+            while pending and state["games_written"] < num_games:
+                (window_min, window_max), future = pending.popleft()
+                batch = future.result()[:num_games - state["games_written"]]
+                if batch:
+                    if state["fieldnames"] is None:
+                        state["fieldnames"] = list(batch[0].keys())
+                    writer = csv.DictWriter(file, fieldnames=state["fieldnames"])
+                    if state["output_size"] == 0:
+                        writer.writeheader()
+                    writer.writerows(batch)
+                    file.flush()
+                    os.fsync(file.fileno())
+                    print(f"Wrote {len(batch)} games from {window_min} to {window_max} to {output_file}")
+                else:
+                    print(f"No games found in range {window_min} to {window_max}. Continuing to next range.")
+                state["next_max_id"] = window_min - 1
+                state["games_written"] += len(batch)
+                state["output_size"] = file.tell()
+                save_checkpoint(checkpoint_file, state)
+                submit_windows()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    print(f"Finished collecting games. Total games written: {state['games_written']}.")
+    return state["games_written"]
 
 
 def main():
     parser = argparse.ArgumentParser(description="Retrieve games from cross-tables.com and save to CSV.")
     parser.add_argument("num_games", type=int, help="Number of games to retrieve")
     parser.add_argument("output_file", type=str, help="Output CSV filename")
+    parser.add_argument("--workers", type=int, default=4, help="Number of ID windows to fetch in parallel")
+    parser.add_argument("--window-size", type=int, default=WINDOW_SIZE, help="Number of game IDs per request")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    add_client_arguments(parser)
     args = parser.parse_args()
 
-    highest_game_id = get_highest_game_id()
-    if highest_game_id is None:
-        print("Could not retrieve the highest game ID.")
-        return
-
-    print(f"Highest existing game ID: {highest_game_id}")
-
-    collect_games(highest_game_id, args.num_games, args.output_file)
+    client = client_from_args(args, args.workers)
+    try:
+        checkpoint = None if args.restart else load_checkpoint(args.output_file + CHECKPOINT_SUFFIX)
+        if checkpoint is not None:
+            highest_game_id = checkpoint["next_max_id"]
+        else:
+            highest_game_id = client.max_game_id()
+            print(f"Highest existing game ID: {highest_game_id}")
+        collect_games(highest_game_id, args.num_games, args.output_file, client, args.workers, args.window_size,
+                      args.restart)
+    except RuntimeError as e:
+        sys.exit(f"{e} Rerun the same command to resume.")
+    finally:
+        if args.metrics:
+            print(client.metrics.summary())
 
 if __name__ == "__main__":
     main()
@@ -1,44 +1,42 @@
 import requests
 import os
-import json
 import re
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-import csv
-from io import StringIO
-
-BASE_URL = "https://cross-tables.com/rest/"
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (compatible; Script/1.0; +http://example.com/bot)",
-    "Accept": "application/json"
-}
-
-def make_api_request(endpoint, params=None):
-    headers = {
-        "Accept": "*/*"  # Allow any response content type
-    }
-    try:
-        response = requests.get(BASE_URL + endpoint, params=params, headers=HEADERS, timeout=30)
-        response.raise_for_status()
+import json
+
+from http_cache import CACHE_DIR, DEFAULT_TTL, HttpCache
+from xt_client import XtApiError, XtClient, add_client_arguments, client_from_args
 
-        # Handle CSV for allanno.php
-        if endpoint == "allanno.php":
-            decoded = response.content.decode('utf-8')
-            reader = csv.DictReader(StringIO(decoded))
-            return {"results": list(reader)}
+# Records the ETag of each downloaded file, relative to the player's root folder
+MANIFEST_FILE = ".annos_manifest.json"
 
-        # Otherwise, assume JSON
-        return response.json()
+_client = None
+# Caches player.php and allanno.php responses, see set_cache; None disables caching
+_cache = None
 
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"Fatal error making API request to {endpoint}: {e}")
-    except json.JSONDecodeError:
-        raise RuntimeError(f"Fatal error: Could not decode JSON response from {endpoint}.")
+def get_client():
+    """Returns the client shared by all API requests of this module."""
+    global _client
+    if _client is None:
+        _client = XtClient()
+    return _client
 
+def set_client(client):
+    """Makes all API requests of this module go through client from now on."""
+    global _client
+    _client = client
+
+def set_cache(cache_dir=CACHE_DIR, ttl=DEFAULT_TTL):
+    """Caches API responses in cache_dir from now on, or stops caching if cache_dir is None."""
+    global _cache
+    _cache = HttpCache(cache_dir, ttl) if cache_dir else None
 
 def get_player_tournaments_in_range(player_id, start_date, end_date):
     print(f"Fetching tournament history for player ID: {player_id}...")
-    data = make_api_request("player.php", params={"player": player_id, "results": 1})["player"]
+    data = get_client().player(player_id, cache=_cache)
 
     if "results" not in data:
         raise RuntimeError("Fatal error: 'results' field not in player data. Player ID may be invalid.")
@@ -66,36 +64,36 @@ def sanitize_filename(name):
     s = name.replace(' ', '')
     return re.sub(r'(?u)[^-\w.]', '', s)
 
-def download_annotated_games(player_id, start_date, end_date, tournaments):
+def iter_annotated_games(client=None):
     """
-    Downloads all annotated games for a player from a given list of tournaments.
-
-    Args:
-        player_id (int): The player's unique ID.
-        tournaments (dict): A dictionary of relevant tournament IDs and their info.
+    Streams allanno.php, yielding one game at a time with its keys stripped of
+    whitespace, so the whole index never has to be held in memory. With caching
+    enabled the index is read from the cache file once it has been revalidated.
     """
-    print("Fetching all annotated games from the server... (This may take a moment)")
-    data = make_api_request("allanno.php")
-    if not data or "results" not in data:
-        raise RuntimeError("Fatal error: Could not fetch annotated games.")
+    return (client or get_client()).allanno(_cache)
 
-    all_games = data["results"]
-    print(f"Processing {len(all_games)} total annotated games...")
-
-    downloaded_count = 0
-    tourney_ids = set(tournaments.keys())
+def find_annotated_games(players, games):
+    """
+    Matches annotated games against the tournaments of several players.
 
-    # Define root folder path using player ID and date range
-    root_folder = f"{player_id}_annos_{start_date}_to_{end_date}"
+    Args:
+        players (dict): Maps each player ID to (root folder, tournaments), where
+            tournaments is a dictionary of tournament IDs and their info.
+        games (iterable): Games from iter_annotated_games.
 
-    for raw_game in all_games:
-        # Normalize all keys by stripping whitespace
-        game = {k.strip(): v for k, v in raw_game.items()}
+    Returns:
+        list: (game ID, url, file path) tuples of the files to download.
+    """
+    tourney_ids = set()
+    for _, tournaments in players.values():
+        tourney_ids.update(tournaments)
 
+    downloads = []
+    for game in games:
         try:
             game_tourney_id = game["tourneyID"]
             if game_tourney_id not in tourney_ids:
-                # player did not player in this tourney or it is outside the date range
+                # none of the players played in this tourney or it is outside the date range
                 continue
 
             url = game["url"].strip()
@@ -103,49 +101,138 @@ def download_annotated_games(player_id, start_date, end_date, tournaments):
                 # this game was not annotated
                 continue
 
-            player1_id = int(game["player1ID"])
-            player2_id = int(game["player2ID"])
+            player_ids = (int(game["player1ID"]), int(game["player2ID"]))
+            opp_names = (game["player2Name"].strip(), game["player1Name"].strip())
+            round_num = game["round"].strip()
+        except (KeyError, ValueError) as e:
+            raise RuntimeError(f"Fatal error processing game: {e}")
 
-            if player_id not in (player1_id, player2_id):
+        for player_id, opp_name in zip(player_ids, opp_names):
+            if player_id not in players:
+                continue
+            root_folder, tournaments = players[player_id]
+            tourney_info = tournaments.get(game_tourney_id)
+            if tourney_info is None:
                 continue
-
-            # Determine opponent's name
-            if player_id == player1_id:
-                opp_name = game["player2Name"].strip()
-            else:
-                opp_name = game["player1Name"].strip()
-
-            tourney_info = tournaments[game_tourney_id]
-            round_num = game["round"].strip()
 
             # Format folder name: YYYY-MM-DD-Tournament-Name
             folder_name = os.path.join(
                 root_folder,
                 f"{tourney_info['date']}-{sanitize_filename(tourney_info['name'])}"
             )
-            os.makedirs(folder_name, exist_ok=True)
-
             # Format file name: r<round>_<opp_name>.gcg
             file_name = f"r{round_num}_{sanitize_filename(opp_name)}.gcg"
-            file_path = os.path.join(folder_name, file_name)
+            downloads.append((game.get('ID'), url, os.path.join(folder_name, file_name)))
+    return downloads
 
-            # Download and save the .gcg file
-            response = requests.get(url, headers=HEADERS, timeout=30)
-            response.raise_for_status()
-
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(response.text)
+def download_file(client, url, file_path, etag=None):
+    """
+    Downloads a file atomically, unless the copy already on disk is current:
+    either the server answers a conditional request with the known ETag with
+    304, or, with no ETag known, a HEAD request reports the same size. Failed
+    requests are retried by the client.
 
-            downloaded_count += 1
-            print(f"  -> Saved game {game.get('ID')} to '{file_path}'")
+    Returns:
+        tuple: Whether the file was downloaded and the file's ETag, if any.
 
-        except (KeyError, ValueError, requests.RequestException) as e:
-            raise RuntimeError(f"Fatal error processing game: {e}")
+    Raises:
+        XtApiError: If every attempt failed.
+        requests.HTTPError: If the server refused the request.
+    """
+    exists = os.path.exists(file_path)
+    if exists and not etag:
+        head = client.head(url)
+        if head.ok and head.headers.get("Content-Length") == str(os.path.getsize(file_path)):
+            return False, head.headers.get("ETag")
+
+    headers = {"If-None-Match": etag} if exists and etag else {}
+    response = client.get(url, headers=headers)
+    if response.status_code == 304:
+        return False, etag
+    response.raise_for_status()
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(response.content)
+    os.replace(temp_path, file_path)
+    return True, response.headers.get("ETag")
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest_path, manifest):
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+def download_annotated_games(players, client=None, workers=8):
+    """
+    Downloads all annotated games for several players from their lists of
+    tournaments. The annotation index is fetched once and filtered as it
+    streams in, then the games are downloaded in parallel. Files that are
+    already up to date on disk are skipped, using the ETags recorded in a
+    manifest in each player's root folder.
 
-    if downloaded_count == 0:
-        raise RuntimeError("No annotated games found for this player in the specified date range.")
-    else:
-        print(f"\nFinished. Downloaded {downloaded_count} annotated games.")
+    Args:
+        players (dict): Maps each player ID to (root folder, tournaments), where
+            tournaments is a dictionary of relevant tournament IDs and their info.
+        client (XtClient): Client to download with, the module's client if not given.
+        workers (int): The number of files downloaded in parallel.
+    """
+    client = client or get_client()
+    print("Fetching all annotated games from the server... (This may take a moment)")
+    downloads = find_annotated_games(players, iter_annotated_games(client))
+    print(f"Found {len(downloads)} annotated games to fetch.")
+
+    manifests = {}
+    for root_folder, _ in players.values():
+        manifests[root_folder] = load_manifest(os.path.join(root_folder, MANIFEST_FILE))
+
+    def manifest_entry(file_path):
+        for root_folder, manifest in manifests.items():
+            if file_path.startswith(root_folder + os.sep):
+                return manifest, os.path.relpath(file_path, root_folder)
+
+    downloaded_count = skipped_count = 0
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for game_id, url, file_path in downloads:
+            manifest, key = manifest_entry(file_path)
+            futures[executor.submit(download_file, client, url, file_path, manifest.get(key))] = (game_id, file_path)
+        try:
+            for future in as_completed(futures):
+                game_id, file_path = futures[future]
+                try:
+                    downloaded, etag = future.result()
+                except (XtApiError, requests.RequestException) as e:
+                    failures.append((file_path, e))
+                    print(f"  -> Failed to download game {game_id} to '{file_path}': {e}")
+                    continue
+                manifest, key = manifest_entry(file_path)
+                if etag:
+                    manifest[key] = etag
+                if downloaded:
+                    downloaded_count += 1
+                    print(f"  -> Saved game {game_id} to '{file_path}'")
+                else:
+                    skipped_count += 1
+        finally:
+            for root_folder, manifest in manifests.items():
+                if manifest:
+                    save_manifest(os.path.join(root_folder, MANIFEST_FILE), manifest)
+
+    if downloaded_count + skipped_count == 0 and not failures:
+        raise RuntimeError("No annotated games found for these players in the specified date range.")
+    print(f"\nFinished. Downloaded {downloaded_count} annotated games, {skipped_count} already up to date.")
+    if failures:
+        raise RuntimeError(f"Failed to download {len(failures)} annotated games. Rerun to retry them.")
 
 def valid_date(s):
     try:
@@ -158,9 +245,15 @@ def main():
         description="Download annotated Scrabble games for a player from cross-tables.com.",
         formatter_class=argparse.RawTextHelpFormatter
     )
-    parser.add_argument("player_id", help="The unique numeric ID of the player.", type=int)
+    parser.add_argument("player_ids", help="The unique numeric IDs of one or more players.", type=int, nargs="+")
     parser.add_argument("start_date", help="The start date in YYYY-MM-DD format.", type=valid_date)
     parser.add_argument("end_date", help="The end date in YYYY-MM-DD format.", type=valid_date)
+    parser.add_argument("--workers", help="Number of games to download in parallel.", type=int, default=8)
+    parser.add_argument("--cache-dir", help="Directory caching player and annotation index responses.", default=CACHE_DIR)
+    parser.add_argument("--cache-ttl", help="Days after which an unused cached response is deleted.", type=float,
+                        default=DEFAULT_TTL / 86400)
+    parser.add_argument("--no-cache", help="Always download player and annotation index responses.", action="store_true")
+    add_client_arguments(parser, rate=0)
 
     args = parser.parse_args()
 
@@ -169,9 +262,20 @@ def main():
     if args.start_date > args.end_date:
         raise RuntimeError("Fatal error: The start date cannot be after the end date.")
 
-    player_id = args.player_id
-    relevant_tournaments = get_player_tournaments_in_range(player_id, args.start_date, args.end_date)
-    download_annotated_games(player_id, args.start_date, args.end_date,relevant_tournaments)
+    set_client(client_from_args(args, args.workers))
+    set_cache(None if args.no_cache else args.cache_dir, args.cache_ttl * 86400)
+
+    try:
+        players = {}
+        for player_id in args.player_ids:
+            relevant_tournaments = get_player_tournaments_in_range(player_id, args.start_date, args.end_date)
+            # Define root folder path using player ID and date range
+            root_folder = f"{player_id}_annos_{args.start_date}_to_{args.end_date}"
+            players[player_id] = (root_folder, relevant_tournaments)
+        download_annotated_games(players, get_client(), args.workers)
+    finally:
+        if args.metrics:
+            print(get_client().metrics.summary())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,130 @@
+"""
+An on-disk HTTP cache for slow, rarely changing API responses.
+
+Each response body is stored in its own file next to a small JSON file with
+the response's ETag and Last-Modified headers. A cached URL is always
+revalidated with a conditional request, so an unchanged resource costs one
+304 round trip and no transfer. Entries that have not been used for longer
+than the time to live are evicted.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+
+CACHE_DIR = '.xt_http_cache'
+DEFAULT_TTL = 30 * 24 * 3600
+
+CachedResponse = namedtuple('CachedResponse', ['path', 'status_code', 'from_cache'])
+
+
+class HttpCache:
+    """
+    Caches response bodies in cache_dir.
+
+    Args:
+        cache_dir (str): Directory holding the cached responses.
+        ttl (float): Seconds after which an entry that has not been used is evicted.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(cache_dir, exist_ok=True)
+        self.evict()
+
+    def _paths(self, url, params):
+        if params:
+            url = f"{url}?{urlencode(sorted(params.items()))}"
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return url, f"{base}.body", f"{base}.json"
+
+    def fetch(self, session, url, params=None, timeout=30):
+        """
+        Fetches a URL, revalidating any cached copy, and stores the body on disk.
+
+        Args:
+            session: A requests.Session, or an object with the same get method
+                such as an XtClient, to make the request with.
+            url (str): The URL, without query string.
+            params (dict): Query parameters.
+            timeout (float): Request timeout in seconds.
+
+        Returns:
+            CachedResponse: The path of the file holding the response body, the
+            HTTP status of the request and whether the cached copy was current.
+
+        Raises:
+            requests.HTTPError: If the server returns an error status. Other
+            failures are raised by session.get.
+        """
+        full_url, body_path, meta_path = self._paths(url, params)
+        meta = self._load_meta(meta_path) if os.path.exists(body_path) else None
+
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        response = session.get(full_url, headers=headers, timeout=timeout, stream=True)
+        with response:
+            if response.status_code == 304 and meta:
+                meta['used_at'] = time.time()
+                self._save_meta(meta_path, meta)
+                return CachedResponse(body_path, 304, True)
+            response.raise_for_status()
+
+            # The body is replaced before its metadata, so a crash in between only costs a full download
+            temp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as file:
+                for chunk in response.iter_content(1 << 16):
+                    file.write(chunk)
+            os.replace(temp_path, body_path)
+            self._save_meta(meta_path, {
+                'url': full_url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'used_at': time.time(),
+            })
+        return CachedResponse(body_path, response.status_code, False)
+
+    def evict(self):
+        """Deletes the entries that have not been used within the time to live."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(self.cache_dir, name)
+            meta = self._load_meta(meta_path)
+            if meta is None or meta.get('used_at', 0) < cutoff:
+                for path in (meta_path, meta_path[:-len('.json')] + '.body'):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def clear(self):
+        """Deletes every entry."""
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _load_meta(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_meta(meta_path, meta):
+        temp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(temp_path, meta_path)
+
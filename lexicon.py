@@ -0,0 +1,411 @@
+"""
+Loads word/definition lexicon files through a compiled binary cache.
+
+The first load of a lexicon file parses it and writes '<file>.lexcache' next to
+it. Later loads memory-map that cache for as long as the source file is
+unchanged, so scripts no longer re-split the whole text file on every run.
+"""
+import array
+import re
+from collections.abc import ItemsView, Mapping, ValuesView
+
+from alphagram import AlphagramIndex, compute_group_arrays
+from compiled_cache import CacheLayout
+
+CACHE_SUFFIX = '.lexcache'
+CACHE_MAGIC = b'WGMLEX'
+CACHE_VERSION = 4
+
+INNER_HOOK = '·'
+
+# Compiled with the file format as the variant and the word count as the only header field
+_LAYOUT = CacheLayout(CACHE_SUFFIX, CACHE_MAGIC, CACHE_VERSION,
+                      ('words', 'alphagrams', 'lengths', 'definition_offsets', 'definitions',
+                       'anagram_group_ids', 'anagram_group_keys', 'parts_of_speech',
+                       'part_of_speech_offsets', 'part_of_speech_postings', 'tokens',
+                       'token_offsets', 'token_postings', 'reference_offsets', 'references'),
+                      fields='Q', description='lexicon cache')
+
+# Each part of speech is one bit of a word's part of speech mask, in this order
+PARTS_OF_SPEECH = ('noun', 'verb', 'adjective', 'adverb', 'interjection', 'preposition',
+                   'conjunction', 'pronoun')
+
+_BRACKETS_REGEX = re.compile(r'\[([^\]]+)\]')
+_PART_SEPARATOR_REGEX = re.compile(r'[,\s]+')
+_TOKEN_REGEX = re.compile(r'[A-Za-z]+')
+_PART_OF_SPEECH_NAMES = {
+    'n': 'noun', 'noun': 'noun', 'nouns': 'noun',
+    'v': 'verb', 'verb': 'verb', 'verbs': 'verb',
+    'adj': 'adjective', 'adjective': 'adjective', 'adjectives': 'adjective',
+    'adv': 'adverb', 'adverb': 'adverb', 'adverbs': 'adverb',
+    'interj': 'interjection', 'interjection': 'interjection',
+    'prep': 'preposition', 'preposition': 'preposition',
+    'conj': 'conjunction', 'conjunction': 'conjunction',
+    'pron': 'pronoun', 'pronoun': 'pronoun',
+}
+
+
+def extract_parts_of_speech(definition):
+    """
+    Extracts parts of speech from a definition string.
+    Looks for patterns like [n], [v], [adj], [interj], etc.
+
+    Args:
+        definition (str): The definition string.
+
+    Returns:
+        set: A set of parts of speech found in the definition.
+    """
+    parts_of_speech = set()
+    for bracket_content in _BRACKETS_REGEX.findall(definition):
+        # Split by commas and spaces to handle multiple parts of speech
+        for part in _PART_SEPARATOR_REGEX.split(bracket_content.lower()):
+            name = _PART_OF_SPEECH_NAMES.get(part.strip())
+            if name:
+                parts_of_speech.add(name)
+    return parts_of_speech
+
+
+def part_of_speech_mask(parts_of_speech):
+    """Returns the bit mask for a collection of part of speech names."""
+    mask = 0
+    for name in parts_of_speech:
+        if name not in PARTS_OF_SPEECH:
+            raise ValueError(f"Unknown part of speech: {name}")
+        mask |= 1 << PARTS_OF_SPEECH.index(name)
+    return mask
+
+
+def mask_to_parts_of_speech(mask):
+    """Returns the set of part of speech names in a bit mask."""
+    return {name for i, name in enumerate(PARTS_OF_SPEECH) if mask & (1 << i)}
+
+
+def parse_tsv_line(line):
+    """Parses a 'WORD<tab>definition' line. The definition may be missing."""
+    parts = line.split('\t', 1)
+    word = parts[0].strip().upper()
+    definition = parts[1].strip() if len(parts) > 1 else ''
+    return word, definition
+
+
+def parse_hooks_line(line):
+    """
+    Parses a '<front hooks><tab>WORD<tab><back hooks><tab>definition' line as
+    exported by Zyzzyva. The word may carry inner hook dots and the front hooks
+    column is empty (and stripped away with the line) when there are none.
+    """
+    parts = line.split('\t')
+    if len(parts) < 3:
+        raise ValueError(f"Invalid line format: {line}")
+    word = parts[-3].strip().upper().strip(INNER_HOOK)
+    return word, parts[-1].strip()
+
+
+FILE_FORMATS = {
+    'tsv': parse_tsv_line,
+    'hooks': parse_hooks_line,
+}
+
+
+def read_lexicon_file(file_path, file_format='tsv'):
+    """
+    Reads a lexicon text file without going through the cache.
+
+    Args:
+        file_path (str): Path to the lexicon file.
+        file_format (str): One of the keys of FILE_FORMATS.
+
+    Returns:
+        dict: A dictionary mapping uppercase words to their (possibly empty) definitions.
+
+    Raises:
+        ValueError: If a line does not begin with an alphabetic word.
+    """
+    parse_line = FILE_FORMATS[file_format]
+    entries = {}
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            word, definition = parse_line(line)
+            if not word.isalpha():
+                raise ValueError(f"Invalid line format: {line}")
+            entries[word] = definition
+    return entries
+
+
+class Lexicon(Mapping):
+    """
+    A read-only, alphabetically sorted mapping of words to definitions backed by
+    a compiled cache buffer (usually a memory-mapped cache file).
+
+    Besides the mapping interface it exposes the precomputed 'alphagrams',
+    'lengths' and 'part_of_speech_masks' tables, which are parallel to 'words',
+    the anagram groups as 'alphagram_index' and, through words_with_part_of_speech,
+    an inverted index from each part of speech to its words.
+
+    Definitions are also indexed by the words they contain. Every token is
+    stored uppercased, and each occurrence is flagged as a cross-reference when
+    it was written in uppercase, the way definitions refer to other entries
+    (e.g. 'ABSEILING' is defined as 'ABSEIL'). Postings and references are
+    stored as 'position << 1 | is cross-reference'.
+    """
+
+    def __init__(self, buffer):
+        header, sections = _LAYOUT.read(buffer)
+        count, = header.fields
+
+        self._buffer = buffer
+        # Identifies the contents of the source file, e.g. for caching results derived from it
+        self.source_digest = header.source_digest
+        self.words = _decode_lines(sections['words'], count)
+        self.alphagrams = _decode_lines(sections['alphagrams'], count)
+        self.lengths = sections['lengths']
+        self._definition_offsets = sections['definition_offsets'].cast('I')
+        self._definitions = sections['definitions']
+        self.alphagram_index = AlphagramIndex(self.words,
+                                              sections['anagram_group_ids'].cast('I'),
+                                              sections['anagram_group_keys'].cast('Q'))
+        self.part_of_speech_masks = sections['parts_of_speech']
+        self._part_of_speech_offsets = sections['part_of_speech_offsets'].cast('I')
+        self._part_of_speech_postings = sections['part_of_speech_postings'].cast('I')
+        self._tokens = _decode_lines(sections['tokens'], len(sections['tokens']))
+        self._token_offsets = sections['token_offsets'].cast('I')
+        self._token_postings = sections['token_postings'].cast('I')
+        self._reference_offsets = sections['reference_offsets'].cast('I')
+        self._references = sections['references'].cast('I')
+        self._token_ids = None
+        self._word_indexes = None
+        self._hooks = None
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __contains__(self, word):
+        return word in self.word_indexes
+
+    def __getitem__(self, word):
+        return self.definition_at(self.word_indexes[word])
+
+    def items(self):
+        return _LexiconItems(self)
+
+    def values(self):
+        return _LexiconValues(self)
+
+    @property
+    def word_indexes(self):
+        """A dictionary mapping each word to its position in 'words'."""
+        if self._word_indexes is None:
+            self._word_indexes = {word: i for i, word in enumerate(self.words)}
+        return self._word_indexes
+
+    def definition_at(self, index):
+        """Returns the definition of the word at the given position."""
+        return str(self.raw_definition_at(index), 'utf-8')
+
+    def raw_definition_at(self, index):
+        """Returns the UTF-8 encoded definition of the word at the given position without decoding it."""
+        return self._definitions[self._definition_offsets[index]:self._definition_offsets[index + 1]]
+
+    def parts_of_speech(self, word):
+        """Returns the set of parts of speech in the word's definition."""
+        return mask_to_parts_of_speech(self.part_of_speech_masks[self.word_indexes[word]])
+
+    def words_with_part_of_speech(self, part_of_speech, only=False):
+        """
+        Looks up the inverted part of speech index.
+
+        Args:
+            part_of_speech (str): One of PARTS_OF_SPEECH.
+            only (bool): Whether to exclude words that also have other parts of speech.
+
+        Returns:
+            set: The positions in 'words' of the matching words.
+        """
+        i = PARTS_OF_SPEECH.index(part_of_speech)
+        start, end = self._part_of_speech_offsets[i], self._part_of_speech_offsets[i + 1]
+        postings = self._part_of_speech_postings[start:end]
+        if only:
+            masks = self.part_of_speech_masks
+            return {word_index for word_index in postings if masks[word_index] == 1 << i}
+        return set(postings)
+
+    def words_mentioning(self, token):
+        """Returns the positions of the words whose definitions contain the token, ignoring case."""
+        return [posting >> 1 for posting in self._postings(token)]
+
+    def words_referencing(self, word):
+        """Returns the positions of the words whose definitions refer to the word in uppercase."""
+        return [posting >> 1 for posting in self._postings(word) if posting & 1]
+
+    def references(self, word):
+        """Returns the uppercase tokens in the word's definition, in order of first appearance."""
+        i = self.word_indexes[word]
+        start, end = self._reference_offsets[i], self._reference_offsets[i + 1]
+        tokens = self._tokens
+        return [tokens[reference >> 1] for reference in self._references[start:end] if reference & 1]
+
+    def _postings(self, token):
+        if self._token_ids is None:
+            self._token_ids = {token: i for i, token in enumerate(self._tokens)}
+        i = self._token_ids.get(token.upper())
+        if i is None:
+            return ()
+        return self._token_postings[self._token_offsets[i]:self._token_offsets[i + 1]]
+
+    def front_hooks(self, word):
+        """Returns the letters that can be added to the front of the word, in order."""
+        return ''.join(sorted(self._get_hooks()[0].get(word, '')))
+
+    def back_hooks(self, word):
+        """Returns the letters that can be added to the back of the word, in order."""
+        return ''.join(sorted(self._get_hooks()[1].get(word, '')))
+
+    def with_inner_hooks(self, word):
+        """
+        Returns the word with a dot on either side that can lose its outer letter
+        and still be a word, the way Zyzzyva marks inner hooks.
+        """
+        front = INNER_HOOK if len(word) > 1 and word[1:] in self else ''
+        back = INNER_HOOK if len(word) > 1 and word[:-1] in self else ''
+        return f"{front}{word}{back}"
+
+    def _get_hooks(self):
+        if self._hooks is None:
+            front_hooks, back_hooks = {}, {}
+            word_indexes = self.word_indexes
+            for word in self.words:
+                if len(word) < 2:
+                    continue
+                if word[1:] in word_indexes:
+                    front_hooks[word[1:]] = front_hooks.get(word[1:], '') + word[0]
+                if word[:-1] in word_indexes:
+                    back_hooks[word[:-1]] = back_hooks.get(word[:-1], '') + word[-1]
+            self._hooks = (front_hooks, back_hooks)
+        return self._hooks
+
+
+class _LexiconItems(ItemsView):
+    def __iter__(self):
+        lexicon = self._mapping
+        return zip(lexicon.words, map(lexicon.definition_at, range(len(lexicon))))
+
+
+class _LexiconValues(ValuesView):
+    def __iter__(self):
+        lexicon = self._mapping
+        return map(lexicon.definition_at, range(len(lexicon)))
+
+
+def load_lexicon(file_path, file_format='tsv'):
+    """
+    Loads a lexicon file, compiling it into '<file>.lexcache' if the cache is
+    missing or stale. The cache is considered fresh if the source file's size and
+    modification time are unchanged, or failing that, if its SHA-1 hash is.
+
+    Args:
+        file_path (str): Path to the lexicon file.
+        file_format (str): One of the keys of FILE_FORMATS.
+
+    Returns:
+        Lexicon: The loaded lexicon.
+
+    Raises:
+        FileNotFoundError: If the lexicon file does not exist.
+        ValueError: If the lexicon file is malformed.
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unknown lexicon file format: {file_format}")
+    format_index = list(FILE_FORMATS).index(file_format)
+
+    def compile_source(stat, digest):
+        entries = read_lexicon_file(file_path, file_format)
+        return compile_lexicon(entries, format_index, stat.st_size, stat.st_mtime_ns, digest)
+    return Lexicon(_LAYOUT.load(file_path, compile_source, format_index))
+
+
+def compile_lexicon(entries, format_index=0, source_size=0, source_mtime_ns=0, source_digest=b''):
+    """
+    Compiles a dictionary of words to definitions into the binary cache layout:
+    a header, a section table and the sections themselves, each 8-byte aligned.
+
+    Returns:
+        bytes: The compiled lexicon.
+    """
+    words = sorted(entries)
+    offsets = array.array('I', [0])
+    encoded_definitions = []
+    total = 0
+    for word in words:
+        encoded = entries[word].encode('utf-8')
+        encoded_definitions.append(encoded)
+        total += len(encoded)
+        offsets.append(total)
+
+    group_ids, group_keys = compute_group_arrays(words)
+
+    masks = bytearray()
+    postings = [array.array('I') for _ in PARTS_OF_SPEECH]
+    for word_index, word in enumerate(words):
+        mask = part_of_speech_mask(extract_parts_of_speech(entries[word]))
+        masks.append(mask)
+        for i, posting in enumerate(postings):
+            if mask & (1 << i):
+                posting.append(word_index)
+    posting_offsets = array.array('I', [0])
+    for posting in postings:
+        posting_offsets.append(posting_offsets[-1] + len(posting))
+
+    token_ids = {}
+    token_postings = []
+    reference_offsets = array.array('I', [0])
+    references = array.array('I')
+    for word_index, word in enumerate(words):
+        # Each distinct token once per definition, flagged if any occurrence is uppercase
+        flags = {}
+        for token in _TOKEN_REGEX.findall(entries[word]):
+            upper = token.upper()
+            flags[upper] = flags.get(upper, 0) | (token == upper)
+        for token, flag in flags.items():
+            token_id = token_ids.get(token)
+            if token_id is None:
+                token_id = token_ids[token] = len(token_ids)
+                token_postings.append(array.array('I'))
+            token_postings[token_id].append(word_index << 1 | flag)
+            references.append(token_id << 1 | flag)
+        reference_offsets.append(len(references))
+    token_offsets = array.array('I', [0])
+    for posting in token_postings:
+        token_offsets.append(token_offsets[-1] + len(posting))
+
+    sections = {
+        'words': '\n'.join(words).encode('utf-8'),
+        'alphagrams': '\n'.join(''.join(sorted(word)) for word in words).encode('utf-8'),
+        'lengths': bytes(len(word) for word in words),
+        'definition_offsets': offsets.tobytes(),
+        'definitions': b''.join(encoded_definitions),
+        'anagram_group_ids': group_ids.tobytes(),
+        'anagram_group_keys': group_keys.tobytes(),
+        'parts_of_speech': bytes(masks),
+        'part_of_speech_offsets': posting_offsets.tobytes(),
+        'part_of_speech_postings': b''.join(posting.tobytes() for posting in postings),
+        'tokens': '\n'.join(token_ids).encode('utf-8'),
+        'token_offsets': token_offsets.tobytes(),
+        'token_postings': b''.join(posting.tobytes() for posting in token_postings),
+        'reference_offsets': reference_offsets.tobytes(),
+        'references': references.tobytes(),
+    }
+
+    return _LAYOUT.compile(sections, (len(words),), format_index, source_size, source_mtime_ns, source_digest)
+
+
+def _decode_lines(view, count):
+    if count == 0:
+        return []
+    return str(view, 'utf-8').split('\n')
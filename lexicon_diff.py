@@ -0,0 +1,99 @@
+"""
+Compares versions of a lexicon.
+
+Lexicon word lists are sorted, so two versions are compared with a single
+linear merge. Diffs are cached on disk per pair of versions, keyed by the
+hashes of the two source files.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+DIFF_CACHE_DIR = '.lexdiff_cache'
+
+LexiconDiff = namedtuple('LexiconDiff', ['added', 'removed', 'changed'])
+
+
+def diff_lexicons(old, new):
+    """
+    Compares two versions of a lexicon.
+
+    Args:
+        old (Lexicon): The older version.
+        new (Lexicon): The newer version.
+
+    Returns:
+        LexiconDiff: Sorted lists of the words added, the words removed and the words
+        whose definitions changed. Words without a definition in either version never
+        count as changed.
+    """
+    old_words, new_words = old.words, new.words
+    added, removed, changed = [], [], []
+    i = j = 0
+    while i < len(old_words) and j < len(new_words):
+        old_word, new_word = old_words[i], new_words[j]
+        if old_word == new_word:
+            old_definition = old.raw_definition_at(i)
+            new_definition = new.raw_definition_at(j)
+            if old_definition and new_definition and old_definition != new_definition:
+                changed.append(old_word)
+            i += 1
+            j += 1
+        elif old_word < new_word:
+            removed.append(old_word)
+            i += 1
+        else:
+            added.append(new_word)
+            j += 1
+    removed.extend(old_words[i:])
+    added.extend(new_words[j:])
+    return LexiconDiff(added, removed, changed)
+
+
+def cached_diff_lexicons(old, new, cache_dir=DIFF_CACHE_DIR):
+    """Same as diff_lexicons, but reuses the result of an earlier run on the same two files."""
+    key = hashlib.sha1(old.source_digest + new.source_digest).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as file:
+            return LexiconDiff(**json.load(file))
+    except (OSError, ValueError, TypeError):
+        pass
+
+    diff = diff_lexicons(old, new)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(diff._asdict(), file)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not cache lexicon diff in {cache_dir}: {e}")
+    return diff
+
+
+def diff_versions(lexicons, cache_dir=DIFF_CACHE_DIR):
+    """Returns the diffs between each consecutive pair of lexicon versions, oldest first."""
+    return [cached_diff_lexicons(old, new, cache_dir) for old, new in zip(lexicons, lexicons[1:])]
+
+
+def find_references(lexicon, target_words):
+    """
+    Finds the definitions that mention any of the target words, matching whole
+    words case-insensitively, by looking each target up in the lexicon's
+    definition token index.
+
+    Args:
+        lexicon (Lexicon): The lexicon whose definitions are searched.
+        target_words (set): Uppercase words to look for.
+
+    Returns:
+        dict: A dictionary mapping each word whose definition mentions target words to the set of them.
+    """
+    references = {}
+    words = lexicon.words
+    for target in target_words:
+        for word_index in lexicon.words_mentioning(target):
+            references.setdefault(words[word_index], set()).add(target)
+    return references
@@ -1,237 +1,160 @@
+import argparse
+import heapq
+import random
 import sys
-from collections import defaultdict
-from math import comb
 
-TILE_COUNTS = {
-    'A': 9, 'B': 2, 'C': 2, 'D': 4, 'E': 12, 'F': 2, 'G': 3, 'H': 2, 'I': 9,
-    'J': 1, 'K': 1, 'L': 4, 'M': 2, 'N': 6, 'O': 8, 'P': 2, 'Q': 1, 'R': 6,
-    'S': 4, 'T': 6, 'U': 4, 'V': 2, 'W': 2, 'X': 1, 'Y': 2, 'Z': 1
-}
+from alphagram import alphagram_key
+from lexicon import load_lexicon
+from probability import DEFAULT_DISTRIBUTION
+from tricky_rules import DEFAULT_RULES, TrickyRuleSet, load_rules
 
 def get_all_words_with_definitions(filename):
     """
-    Reads a file with tab-separated word and definition pairs and returns a dictionary
+    Reads a file with tab-separated word and definition pairs and returns a mapping
     of words (uppercase) to their definitions.
 
     Args:
         filename (str): The path to the input file.
 
     Returns:
-        dict: A dictionary mapping uppercase words to their definitions.
+        Lexicon: A mapping of uppercase words to their definitions.
     """
-    word_definitions = {}
     try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            for line in file:
-                line = line.strip()
-                if line and '\t' in line:
-                    parts = line.split('\t', 1)  # Split on first tab only
-                    if len(parts) == 2:
-                        word = parts[0].strip().upper()
-                        definition = parts[1].strip()
-                        if word and definition:
-                            word_definitions[word] = definition
+        lexicon = load_lexicon(filename)
     except FileNotFoundError:
         print(f"Error: The file '{filename}' was not found.")
         sys.exit(1)
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         sys.exit(1)
-    return word_definitions
+    return lexicon
 
-def extract_parts_of_speech(definition):
+def get_defined_anagram_groups(word_definitions):
     """
-    Extracts parts of speech from a definition string.
-    Looks for patterns like [n], [v], [adj], [interj], etc.
-
-    Args:
-        definition (str): The definition string.
-
-    Returns:
-        set: A set of parts of speech found in the definition.
-    """
-    parts_of_speech = set()
-    
-    # Find all bracketed content
-    import re
-    brackets = re.findall(r'\[([^\]]+)\]', definition)
-    
-    for bracket_content in brackets:
-        # Split by commas and spaces to handle multiple parts of speech
-        parts = re.split(r'[,\s]+', bracket_content.lower())
-        for part in parts:
-            part = part.strip()
-            # Check for common part of speech abbreviations
-            if part in ['n', 'noun', 'nouns']:
-                parts_of_speech.add('noun')
-            elif part in ['v', 'verb', 'verbs']:
-                parts_of_speech.add('verb')
-            elif part in ['adj', 'adjective', 'adjectives']:
-                parts_of_speech.add('adjective')
-            elif part in ['adv', 'adverb', 'adverbs']:
-                parts_of_speech.add('adverb')
-            elif part in ['interj', 'interjection']:
-                parts_of_speech.add('interjection')
-            elif part in ['prep', 'preposition']:
-                parts_of_speech.add('preposition')
-            elif part in ['conj', 'conjunction']:
-                parts_of_speech.add('conjunction')
-            elif part in ['pron', 'pronoun']:
-                parts_of_speech.add('pronoun')
-    
-    return parts_of_speech
-
-def alphabetize(word):
-    """Returns a string with the letters of the word sorted alphabetically."""
-    return ''.join(sorted(word))
-
-def get_anagram_groups(words):
-    """
-    Groups words by their anagrams (words with same letters).
-
-    Args:
-        words (iterable): Collection of words to group.
-
-    Returns:
-        dict: Dictionary mapping sorted letter signature to list of words.
+    Returns a dictionary mapping alphagram keys to the words with a definition
+    that use those letters. Words without one would have blank answers in the
+    quiz, so they are left out.
     """
-    anagram_groups = defaultdict(list)
-    for word in words:
-        # Sort the letters to create an anagram signature
-        signature = alphabetize(word)
-        anagram_groups[signature].append(word)
+    index = word_definitions.alphagram_index
+    words = word_definitions.words
+    anagram_groups = {}
+    for key, members in zip(index.keys, index.group_members):
+        defined = [words[i] for i in members if word_definitions.raw_definition_at(i)]
+        if defined:
+            anagram_groups[key] = defined
     return anagram_groups
 
-def is_word_tricky(word, word_definitions, anagram_groups):
-    """
-    Checks if a word meets the specified criteria.
-
-    Args:
-        word (str): The word to validate (this word will already be uppercase).
-        word_definitions (dict): Dictionary of words to their definitions.
-        anagram_groups (dict): Dictionary of anagram groups.
-
-    Returns:
-        bool: True if the word is valid, False otherwise.
-    """
-    if len(word) != 7 and len(word) != 8:
-        return False
-
-    num_anagrams = len(anagram_groups[alphabetize(word)])
-
-    # Check if word has 3 or fewer anagrams
-    if num_anagrams > 3:
-        return False
-
-    definition = word_definitions.get(word, "")
-    parts_of_speech = extract_parts_of_speech(definition)
-
-    # New criterion: ends with 'ED' and only has adjective part of speech
-    if word.endswith("ED") and 'adjective' in parts_of_speech:
-        return True
-
-    if word.endswith("ING"):
-        plural_form = word + "S"
-        if plural_form in word_definitions:
-            return True
-
-    suffixes = ["ANT", "ENT", "ITY", "LY", "ABLE", "NESS", "LESS", "LIKE", "EAU", "IEU", "ATE", "OID", "INESS", "IVE", "IAN", "FUL", "FORM", "OSE", "OUS", "ISH", "UM"]
-    for suffix in suffixes:
-        if word.endswith(suffix):
-            return True
-    
-    if word.endswith("ER") and num_anagrams == 1 and word + "S" in word_definitions:
-        return True
-
-    if word.startswith("UN") and word.endswith("ED"):
-        return True
-
-    prefixes = ["OVER", "OUT", "NON", "EM", "IM", "EN"]
-    for prefix in prefixes:
-        if word.startswith(prefix):
-            return True
-
-    if sum(1 for char in word if char in "AEIOU") == 5:
-        return True
-
-    return False
+def process_tricky_words(word_definitions, rule_set, anagram_groups, alphagram_word_dict):
+    index = word_definitions.alphagram_index
+    for word_index in rule_set.find_tricky_words(word_definitions):
+        if not word_definitions.raw_definition_at(word_index):
+            continue
+        key = index.group_key(index.group_ids[word_index])
+        alphagram_word_dict[key] = anagram_groups[key][0]
 
-def process_tricky_words(word_definitions, anagram_groups, alphagram_word_dict):
-    for word in word_definitions.keys():
-        if is_word_tricky(word, word_definitions, anagram_groups):
-            alphagram = alphabetize(word)
-            alphagram_word_dict[alphagram] = anagram_groups[alphagram][0]
+def print_rule_stats(word_definitions, rule_set):
+    print(f"{'Rule':<30} {'Words':>8} {'Seconds':>8}")
+    for name, hits, seconds in rule_set.rule_stats(word_definitions):
+        print(f"{name:<30} {hits:>8} {seconds:>8.3f}")
+    print()
 
 def calculate_ways_to_draw(rack):
     """
-    Calculates the number of ways to draw a set of rack from a Scrabble bag.
+    Calculates the number of ways to draw a set of rack from a Scrabble bag,
+    counting draws that use the blanks.
     """
-    rack_counts = defaultdict(int)
-    for char in rack:
-        rack_counts[char] += 1
-
-    total_ways = 1
-
-    for char, count in rack_counts.items():
-        if TILE_COUNTS[char] < count:
-            return 1
-        else:
-            total_ways *= comb(TILE_COUNTS[char], count)
-
-    return total_ways
+    return DEFAULT_DISTRIBUTION.ways_to_draw(rack)
 
 def process_missed_bingos(missed_bingos_filepath, alphagram_word_dict):
     """
     Reads 'missed_bingos.txt' into a dictionary.
-    Key: alphabetized letters, Value: one valid anagram.
+    Key: alphagram key, Value: one valid anagram.
     """
     with open(missed_bingos_filepath, 'r') as f:
         for line in f:
             word = line.strip().upper()
             if word:
-                alphagram_word_dict[alphabetize(word)] = word
+                alphagram_word_dict[alphagram_key(word)] = word
+
+def iter_most_probable(words_with_probs, seed=None):
+    """
+    Yields words from most to least probable, popping them off a heap so only
+    as many words as are consumed get ordered.
+
+    Args:
+        words_with_probs (list): (word, ways to draw) pairs.
+        seed (int): If given, ties are broken by a random order from this seed.
+            Otherwise tied words keep their order in the list.
 
-def process_probable_bingos(anagram_groups, alphagram_word_dict, N):
+    Yields:
+        str: The next most probable word.
+    """
+    if seed is None:
+        tie_breakers = range(len(words_with_probs))
+    else:
+        rng = random.Random(seed)
+        tie_breakers = [rng.random() for _ in words_with_probs]
+    heap = [(-ways, tie_breaker, word) for (word, ways), tie_breaker in zip(words_with_probs, tie_breakers)]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+def process_probable_bingos(anagram_groups, alphagram_word_dict, N, seed=None):
     num_existing_alphagrams = len(alphagram_word_dict)
     if num_existing_alphagrams >= N:
         return
-    sevens_with_probs = []
-    eights_with_probs = []
-    for alphagram, words in anagram_groups.items():
+    sevens = []
+    eights = []
+    for words in anagram_groups.values():
         if len(words) > 3:
             continue
-        if len(alphagram) == 7:
-            sevens_with_probs.append((words[0], calculate_ways_to_draw(alphagram)))
-        elif len(alphagram) == 8:
-            eights_with_probs.append((words[0], calculate_ways_to_draw(alphagram)))
-    sevens_with_probs.sort(key=lambda item: item[1], reverse=True)
-    eights_with_probs.sort(key=lambda item: item[1], reverse=True)
+        if len(words[0]) == 7:
+            sevens.append(words[0])
+        elif len(words[0]) == 8:
+            eights.append(words[0])
+    sevens_by_prob = iter_most_probable(list(zip(sevens, DEFAULT_DISTRIBUTION.ways_to_draw_all(sevens))), seed)
+    eights_by_prob = iter_most_probable(list(zip(eights, DEFAULT_DISTRIBUTION.ways_to_draw_all(eights))), seed)
     last_seven_added = ""
     last_eight_added = ""
+    # Alternate between the most probable remaining seven and eight
     while len(alphagram_word_dict) < N:
-        if len(sevens_with_probs) > 0:
-            seven = sevens_with_probs[0][0]
-            alphagram_word_dict[alphabetize(seven)] = seven
+        seven = next(sevens_by_prob, None)
+        if seven is not None:
+            alphagram_word_dict[alphagram_key(seven)] = seven
             last_seven_added = seven
-            sevens_with_probs.pop(0)
-        if len(alphagram_word_dict) < N and len(eights_with_probs) > 0:
-            eight = eights_with_probs[0][0]
-            alphagram_word_dict[alphabetize(eight)] = eight
-            last_eight_added = eight
-            eights_with_probs.pop(0)
+        eight = None
+        if len(alphagram_word_dict) < N:
+            eight = next(eights_by_prob, None)
+            if eight is not None:
+                alphagram_word_dict[alphagram_key(eight)] = eight
+                last_eight_added = eight
+        if seven is None and eight is None:
+            print(f"Ran out of sevens and eights after {len(alphagram_word_dict)} alphagrams.")
+            break
     print(f"Least probable seven is {last_seven_added}\nLeast probable eight is {last_eight_added}\n")
 
+def non_negative_int(value):
+    N = int(value)
+    if N < 0:
+        raise argparse.ArgumentTypeError("N must be a non-negative integer.")
+    return N
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python script.py <N>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Create a list of N tricky, missed and probable bingos.")
+    parser.add_argument('N', type=non_negative_int, help='Number of bingos to generate')
+    parser.add_argument('seed', type=int, nargs='?', default=None, help='Seed for breaking probability ties between probable bingos')
+    parser.add_argument('--rules', help='JSON file of additional tricky word rules')
+    parser.add_argument('--rule-stats', action='store_true', help='Print how many words each tricky word rule matches and how long it takes')
+    args = parser.parse_args()
+    N = args.N
+    seed = args.seed
 
     try:
-        N = int(sys.argv[1])
-        if N < 0:
-            raise ValueError("N must be a non-negative integer.")
-    except ValueError as e:
-        print(f"Error: Invalid argument for N. {e}")
+        rules = DEFAULT_RULES + load_rules(args.rules) if args.rules else DEFAULT_RULES
+        # Compiling checks each rule's criteria, e.g. its parts of speech
+        rule_set = TrickyRuleSet(rules)
+    except (OSError, ValueError) as e:
+        print(f"Error: Invalid rules file. {e}")
         sys.exit(1)
 
     # Hardcoded file paths (assuming they are in the same directory as the script)
@@ -245,12 +168,15 @@ def main():
         print(f"No words found in '{csw24_with_defs_file}' to process.")
         sys.exit(0)
 
-    # Create anagram groups for anagram counting
-    anagram_groups = get_anagram_groups(word_definitions.keys())
+    # Anagram groups are precomputed in the lexicon cache
+    anagram_groups = get_defined_anagram_groups(word_definitions)
+
+    if args.rule_stats:
+        print_rule_stats(word_definitions, rule_set)
 
     final_dict = {}
 
-    process_tricky_words(word_definitions, anagram_groups, final_dict)
+    process_tricky_words(word_definitions, rule_set, anagram_groups, final_dict)
     num_tricky_words = len(final_dict)
     print(f"Generated {num_tricky_words} tricky words.")
 
@@ -262,7 +188,7 @@ def main():
     num_extra = N - len(final_dict)
     if num_extra > 0:
         print(f"Generating {N - len(final_dict)} additional unique probable bingos...")
-        process_probable_bingos(anagram_groups, final_dict, N)
+        process_probable_bingos(anagram_groups, final_dict, N, seed)
 
     output_file = f"bingo_words_{N}.txt"
     with open(output_file, 'w') as f:
@@ -1,46 +1,96 @@
-import requests
+import argparse
+import json
+import os
 import sys
 
-# Get maximum available game ID
-max_game_id_url = 'http://cross-tables.com/rest/info.php'
-max_game_id_headers = {'User-Agent': 'My User Agent'}
-max_game_id_response = requests.get(max_game_id_url, headers=max_game_id_headers)
-
-if max_game_id_response.ok:
-    max_game_id = int(max_game_id_response.json()['maxgameid'])
-else:
-    print(f"Request for max game ID failed with status code {max_game_id_response.status_code}")
-    sys.exit()
-
-# Analyze all games in the API, 500 at a time
-url = 'http://cross-tables.com/rest/games.php'
-min_game_id = 1
-max_game_id_chunk = min(500, max_game_id)
-
-max_diff = 0
-max_game = None
-
-while min_game_id <= max_game_id:
-    params = {'minid': min_game_id, 'maxid': max_game_id_chunk}
-    headers = {'User-Agent': 'My User Agent'}
-    print("request: %s - %s" % (params['minid'], params['maxid']))
-    response = requests.get(url, params=params, headers=headers)
-
-    if response.ok:
-        games = response.json()['games']
-        
-        for game in games:
-            winner_rating = int(game['winneroldrating'])
-            loser_rating = int(game['loseroldrating'])
-            diff = abs(winner_rating - loser_rating)
-            if diff > max_diff:
-                max_diff = diff
-                max_game = game
-                
-        min_game_id += 500
-        max_game_id_chunk = min(max_game_id_chunk + 500, max_game_id)
+from game_stats import (default_reducers, reducers_from_state, reducers_state, required_columns, api_batches,
+                        run_reducers, store_batches)
+from game_store import STORE_DIR
+from xt_client import XtClient, add_client_arguments, client_from_args
+
+# Statistics of earlier runs, so each run only looks at the games added since
+STATE_FILE = 'max_rating_diff.json'
+CHUNK_SIZE = 500
+
+
+def load_state(state_file=None):
+    """
+    Returns the last game ID scanned by earlier runs and their reducers, or
+    0 and fresh reducers.
+    """
+    if state_file and os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        return state['last_gameid'], reducers_from_state(state['stats'])
+    return 0, default_reducers()
+
+
+def save_state(state_file, last_gameid, reducers):
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as file:
+        json.dump({'last_gameid': last_gameid, 'stats': reducers_state(reducers)}, file)
+    os.replace(temp_file, state_file)
+
+
+def scan_api(last_gameid, reducers, client=None):
+    """
+    Feeds the games in the API newer than last_gameid to the reducers,
+    CHUNK_SIZE at a time, and yields the last game ID scanned after each chunk.
+    """
+    client = client or XtClient()
+    max_game_id = client.max_game_id()
+
+    columns = required_columns(reducers)
+    for min_id in range(last_gameid + 1, max_game_id + 1, CHUNK_SIZE):
+        max_id = min(min_id + CHUNK_SIZE - 1, max_game_id)
+        run_reducers(api_batches(columns, min_id, max_id, client), reducers)
+        # Even if the chunk had no games, every ID up to max_id has been seen
+        yield max_id
+
+
+def scan_store(last_gameid, reducers, store_dir):
+    """Feeds the games in the local game store newer than last_gameid to the reducers."""
+    batches = store_batches(required_columns(reducers), store_dir, min_game_id=last_gameid + 1)
+    yield max(last_gameid, run_reducers(batches, reducers))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the game with the largest rating difference, along with score difference, upset and "
+                    "lexicon statistics, looking only at games added since the last run.")
+    parser.add_argument('--store', nargs='?', const=STORE_DIR, default=None,
+                        help="Read games from the local game store (see game_store.py) instead of the API")
+    parser.add_argument('--state-file', default=STATE_FILE, help="File keeping the statistics of earlier runs")
+    parser.add_argument('--full', action='store_true', help="Ignore earlier runs and scan every game")
+    add_client_arguments(parser, rate=0)
+    args = parser.parse_args()
+
+    start, reducers = load_state(None if args.full else args.state_file)
+    last_gameid = start
+    client = None
+    try:
+        if args.store:
+            progress = scan_store(start, reducers, args.store)
+        else:
+            client = client_from_args(args, 1)
+            progress = scan_api(start, reducers, client)
+        for last_gameid in progress:
+            pass
+    except RuntimeError as e:
+        sys.exit(f"{e} Rerun to continue from game {last_gameid + 1}.")
+    finally:
+        # Keep whatever was scanned, even if a request failed
+        save_state(args.state_file, last_gameid, reducers)
+        if client is not None and args.metrics:
+            print(client.metrics.summary())
+
+    if last_gameid > start:
+        print(f"Scanned games {start + 1} to {last_gameid}")
     else:
-        print(f"Request for games failed with status code {response.status_code}")
-        sys.exit()
+        print("No new games since the last run")
+    for reducer in reducers:
+        print(reducer.report())
+
 
-print(f"Game with max difference: {max_game['gameid']}")
+if __name__ == '__main__':
+    main()
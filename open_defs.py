@@ -1,52 +1,21 @@
-import re
 import csv
 
-def read_word_definitions(file_path):
-    """
-    Reads a file containing words and their definitions in a specific format.
-    
-    Args:
-        file_path (str): Path to the input file.
-    
-    Returns:
-        dict: A dictionary mapping words (uppercase) to their definitions, or 1 if no definition exists.
-    
-    Raises:
-        ValueError: If a line does not begin with a contiguous string of A-Z letters.
-    """
-    word_definitions = {}
-    with open(file_path, 'r') as file:
-        for line in file:
-            line = line.strip()
-            if not line:
-                continue
-            
-            parts = line.split("\t", 1)
-            word = parts[0].strip().upper()
-            
-            if not word.isalpha():
-                raise ValueError(f"Invalid line format: {line}")
-            
-            definition = parts[1].strip() if len(parts) > 1 else 1
-            word_definitions[word] = definition
-    
-    return word_definitions
-
+from lexicon import PARTS_OF_SPEECH, load_lexicon
+from lexicon_diff import diff_versions, find_references
 
 def load_and_print_file_info(file_path):
     """
-    Loads a file using read_word_definitions and prints its information.
+    Loads a lexicon file and prints its information.
     
     Args:
         file_path (str): Path to the file.
-        description (str): Description of the file being loaded.
     
     Returns:
-        dict: A dictionary of words and their definitions from the file.
+        Lexicon: The words and their definitions from the file.
     """
-    word_dict = read_word_definitions(file_path)
-    print(f"Total words loaded from {file_path}: {len(word_dict)}")
-    return word_dict
+    lexicon = load_lexicon(file_path)
+    print(f"Total words loaded from {file_path}: {len(lexicon)}")
+    return lexicon
 
 
 def get_words_with_expurgated_in_definition(csw21_defs, expurgated_words):
@@ -56,39 +25,53 @@ def get_words_with_expurgated_in_definition(csw21_defs, expurgated_words):
     found in their definitions.
 
     Args:
-        csw21_defs (dict): A dictionary of words and their definitions from csw21_defs.
-        expurgated_words (dict): A dictionary of words from csw19 or csw21 that are not in csw24.
+        csw21_defs (Lexicon): The CSW21 words and their definitions.
+        expurgated_words (set): Words from csw19 or csw21 that are not in csw24.
 
     Returns:
         dict: A dictionary mapping words from csw21_defs to expurgated words found in their definitions.
     """
-    expurgated_in_definitions = {}
-
-    # Iterate through each word in csw21_defs
-    for word, definition in csw21_defs.items():
-        # Split the definition by whitespace and clean up the words
-        words_in_definition = re.findall(r'[A-Za-z]+', definition)  # Find words with letters only
-        cleaned_words = [w.upper() for w in words_in_definition]  # Remove non-letters and capitalize
+    return find_references(csw21_defs, expurgated_words)
 
-        # Check if any cleaned word is in the expurgated_words dictionary
-        expurgations = {word for word in cleaned_words if word in expurgated_words}
-        
-        if expurgations:
-            expurgated_in_definitions[word] = expurgations
+def get_new_root_words_to_new_inflections(new_words, csw24_defs):
+    """
+    Maps each word that the definitions of new words refer to (in uppercase,
+    like 'ABSEIL' in the definition of 'ABSEILING') to the new words referring to it.
 
-    return expurgated_in_definitions
+    Args:
+        new_words (iterable): Words added in CSW24.
+        csw24_defs (Lexicon): The CSW24 words and their definitions.
 
-def get_new_root_words_to_new_inflections(new_words, csw24_defs):
+    Returns:
+        dict: A dictionary mapping root words to sets of new words.
+    """
     root_words_to_new_words = {}
     for word in new_words:
-        def_root_words = re.findall(r'[A-Z]+', csw24_defs[word])
-        for root_word in def_root_words:
+        for root_word in csw24_defs.references(word):
             if root_word in csw24_defs:
                 if root_word not in root_words_to_new_words:
                     root_words_to_new_words[root_word] = set()
                 root_words_to_new_words[root_word].add(word)
     return root_words_to_new_words
 
+def count_parts_of_speech(lexicon, words):
+    """
+    Counts how many of the given words have each part of speech, using the
+    lexicon's part of speech index.
+
+    Args:
+        lexicon (Lexicon): The lexicon the words are from.
+        words (iterable): The words to count.
+
+    Returns:
+        dict: A dictionary mapping each part of speech to a word count.
+    """
+    word_indexes = {lexicon.word_indexes[word] for word in words}
+    return {
+        part_of_speech: len(word_indexes & lexicon.words_with_part_of_speech(part_of_speech))
+        for part_of_speech in PARTS_OF_SPEECH
+    }
+
 def export_words_to_csv(words_to_update, output_file='words_to_update.csv'):
     """
     Exports the list of words and their definitions to a CSV file.
@@ -98,8 +81,8 @@ def export_words_to_csv(words_to_update, output_file='words_to_update.csv'):
         output_file (str): The name of the output CSV file.
     """
     # Writing to CSV with tab delimiter and no quotes around fields
-    with open('words_to_update.csv', mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file, delimiter='\t', quotechar='', quoting=csv.QUOTE_NONE)
+    with open(output_file, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter='\t', quotechar=None, quoting=csv.QUOTE_NONE)
         writer.writerow(['Word', 'Definition', 'Source', 'New Inflection', 'Expurgations'])  # Header row
         for word, definition, source, new_inflection, expurgations in words_to_update:
             expurgations_str = ', '.join(expurgations)
@@ -132,18 +115,14 @@ if __name__ == "__main__":
     csw21_defs = load_and_print_file_info(csw21_path)
     csw24_defs = load_and_print_file_info(csw24_path)
 
-    csw24_new_words_list = [word for word in csw24_defs if word not in csw21_defs]
+    # One linear merge per pair of consecutive versions, cached across runs
+    csw19_to_csw21_diff, csw21_to_csw24_diff = diff_versions([csw19_words, csw21_defs, csw24_defs])
+
+    csw24_new_words_list = csw21_to_csw24_diff.added
     csw24_root_words_to_new_inflections_dict = get_new_root_words_to_new_inflections(csw24_new_words_list, csw24_defs)
-    
-    
-    csw19_expurgated_words = {word 
-                    for word in set(csw19_words) 
-                    if word not in csw21_defs}
-    
 
-    csw21_expurgated_words = {word 
-                    for word in set(csw21_defs) 
-                    if word not in csw24_defs}
+    csw19_expurgated_words = set(csw19_to_csw21_diff.removed)
+    csw21_expurgated_words = set(csw21_to_csw24_diff.removed)
 
 
     expurgated_words_set = csw19_expurgated_words | csw21_expurgated_words
@@ -155,7 +134,10 @@ if __name__ == "__main__":
     print(f"CSW21 -> CSW24 expurgated words: {len(csw21_expurgated_words)}")
     print(f"Total expurgated words: {len(expurgated_words_set)}")
     print(f"New words in CSW24: {len(csw24_new_words_list)}")
+    for part_of_speech, count in count_parts_of_speech(csw24_defs, csw24_new_words_list).items():
+        print(f"  New CSW24 words with part of speech {part_of_speech}: {count}")
     print(f"Root words to new words in CSW24: {len(csw24_root_words_to_new_inflections_dict)}")
+    print(f"CSW21 -> CSW24 changed definitions: {len(csw21_to_csw24_diff.changed)}")
     print(f"Total expurgated words: {len(expurgated_words_set)}")
     print(f"Words with expurgated words in definitions: {len(csw21_words_to_expurgated_words_in_defs)}")
 
@@ -164,10 +146,9 @@ if __name__ == "__main__":
 
     # Add words from new_words with source 'CSW24' and empty expurgations
     for word in csw24_new_words_list:
-        definition = csw24_defs.get(word)
-        if not definition:
-            raise ValueError(f"Definition missing for new CSW24 word '{word}' in CSW24!")
-        
+        # Every added word is in CSW24. Words without a definition are kept, with an empty one
+        definition = csw24_defs[word]
+
         # Add tuple with empty expurgations
         words_to_update.append((word, definition, 'CSW24', set(), set()))
 
@@ -175,19 +156,18 @@ if __name__ == "__main__":
     for word, expurgations in csw21_words_to_expurgated_words_in_defs.items():
         if word not in csw24_defs:
             continue
-        definition = csw21_defs.get(word)
-        if not definition:
+        if word not in csw21_defs:
             raise ValueError(f"Definition missing for CSW21 word '{word}' in CSW21!")
+        definition = csw21_defs[word]
 
         words_to_update.append((word, definition, 'CSW21', set(), expurgations))
 
     csw21_possible_new_inflections_count = 0
     for root_word, new_words in csw24_root_words_to_new_inflections_dict.items():
-        if word not in csw24_defs:
-            raise ValueError(f"Definition missing for new root CSW24 word '{word}' in CSW24!")
-        definition = csw21_defs.get(root_word)
-        if definition:
-            words_to_update.append((root_word, definition, 'CSW21', new_words, set()))
+        if root_word not in csw24_defs:
+            raise ValueError(f"Definition missing for new root CSW24 word '{root_word}' in CSW24!")
+        if root_word in csw21_defs:
+            words_to_update.append((root_word, csw21_defs[root_word], 'CSW21', new_words, set()))
             csw21_possible_new_inflections_count += 1
 
     print(f"CSW21 Possible New Inflections: {csw21_possible_new_inflections_count}")
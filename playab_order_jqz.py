@@ -1,51 +1,32 @@
 import os
 import argparse
 
-def create_output_files(content, base_filename, output_dir):
+from playability import load_playability
+from quiz_order import add_ranking_arguments, order_quiz
+from quiz_segments import QuizFile, sliding_windows
+
+# Sliding windows of up to WINDOW_SPAN questions, ending every WINDOW_STEP questions
+WINDOW_STEP = 100
+WINDOW_SPAN = 2000
+
+def create_output_files(all_file, base_filename, output_dir):
+    # The windows are copied out of the ordered quiz
+    with QuizFile(all_file) as quiz:
+        segments = ((os.path.join(output_dir, f'{base_filename}_{s}_to_{i}.jqz'), s, i)
+                    for s, i in sliding_windows(len(quiz), WINDOW_STEP, WINDOW_SPAN))
+        quiz.write_segments(segments, output=lambda line: None)
+
+def reorder_jqz_file(jqz_filename, playab_filenames, base_filename, output_dir, ranking='playability', weight=0.5,
+                     alphagrams=False):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    for i in range(100, len(content) + 1, 100):
-        s = 0
-        if i > 2000:
-            s = i - 2000
-        output_file = os.path.join(output_dir, f'{base_filename}_{s}_to_{i}.jqz')
-        with open(output_file, 'w') as f:
-            f.write("0\n")
-            f.writelines(content[s:i])
-    output_file = os.path.join(output_dir, f'{base_filename}_all.jqz')
-    with open(output_file, 'w') as f:
-        f.write("0\n")
-        f.writelines(content[:])
-
-def reorder_jqz_file(jqz_filename, playab_filename, base_filename, output_dir):
-    # Read playability values from 'playab' file
-    playab_data = {}
-    with open(playab_filename, 'r') as playab_file:
-        for line in playab_file:
-            playability, word = line.strip().split()
-            playab_data[word] = float(playability)
-    
-    # Read and reorder 'jqz' file based on playability values
-    jqz_lines = []
-    with open(jqz_filename, 'r') as jqz_file:
-        # Process the first line
-        first_line = jqz_file.readline()
-        jqz_lines.append(first_line)
-        
-        # Process the remaining lines
-        for line in jqz_file:
-            parts = line.strip().split(';')
-            if len(parts) != 3:
-                raise ValueError(f"Line does not have 3 parts: {line}")
-            
-            word = parts[0]
-            rank = playab_data.get(word, float('inf'))
-            jqz_lines.append((-rank, line))
-    
-    sorted_jqz_lines = sorted(jqz_lines[1:], key=lambda x: x[0])
-    jqz_line_without_rank = [t[1] for t in sorted_jqz_lines]
-    create_output_files(jqz_line_without_rank, base_filename, output_dir)
+    # Rank by the playability indexes, compiled on first use, with the most
+    # playable questions first and words that are not ranked last
+    indexes = [load_playability(playab_filename) for playab_filename in playab_filenames]
+    all_file = os.path.join(output_dir, f'{base_filename}_all.jqz')
+    order_quiz(jqz_filename, all_file, ranking, indexes, weight, alphagrams=alphagrams)
+    create_output_files(all_file, base_filename, output_dir)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Reorder jqz file based on playability values")
@@ -53,7 +34,9 @@ if __name__ == "__main__":
     parser.add_argument("playab_file", help="Path to the playab file")
     parser.add_argument("base_filename", help="Path to the output reordered jqz file")
     parser.add_argument('output_dir', type=str, help='Output directory path')
+    add_ranking_arguments(parser)
 
     args = parser.parse_args()
-    reorder_jqz_file(args.jqz_file, args.playab_file, args.base_filename, args.output_dir)
+    reorder_jqz_file(args.jqz_file, [args.playab_file] + args.playab, args.base_filename, args.output_dir,
+                     args.by, args.weight, args.alphagrams)
     print("jqz file reordered successfully!")
@@ -0,0 +1,215 @@
+"""
+Loads word playability rankings through a compiled, persistent index.
+
+A playability file lists one 'score word' pair per line, higher scores being
+more playable. The first load parses it and writes '<file>.playcache' next to
+it. The cache holds the words in alphabetical order with their scores and the
+alphagrams with the score of their most playable anagram, each with its
+percentile among all words or alphagrams, and offset tables to binary search
+the words and alphagrams in place. Later loads memory-map that cache
+for as long as the source file is unchanged, the way lexicon.py caches lexicon
+files, so quizzes can be ranked without re-parsing the scores on every run.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+from compiled_cache import CacheLayout
+
+CACHE_SUFFIX = '.playcache'
+CACHE_MAGIC = b'WGMPLY'
+CACHE_VERSION = 2
+
+# The header fields are the word count and the alphagram count
+_LAYOUT = CacheLayout(CACHE_SUFFIX, CACHE_MAGIC, CACHE_VERSION,
+                      ('words', 'word_offsets', 'alphagrams', 'alphagram_offsets', 'word_scores',
+                       'word_percentiles', 'alphagram_scores', 'alphagram_percentiles'),
+                      fields='QQ', description='playability cache')
+
+
+def read_playability_file(file_path):
+    """
+    Reads a playability file of 'score word' lines.
+
+    Returns:
+        dict: Maps each uppercase word to its score. A word listed more than once keeps its last score.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If a line is not a score followed by a word.
+    """
+    scores = {}
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) != 2:
+                raise ValueError(f"Expected a score and a word on line {line_number}: {line.strip()}")
+            try:
+                scores[parts[1].upper()] = float(parts[0])
+            except ValueError:
+                raise ValueError(f"Invalid score on line {line_number}: {line.strip()}")
+    return scores
+
+
+class _SortedLines:
+    """
+    The lines of a compiled section as a read-only sequence of bytes, found
+    through the section's offset table, so it can be searched in place
+    without decoding it.
+
+    Every FENCE_STRIDE-th line is kept in memory, so a search bisects that
+    short list first and then only a block of FENCE_STRIDE lines of the buffer.
+    """
+
+    FENCE_STRIDE = 64
+
+    def __init__(self, buffer, start, offsets):
+        self._buffer = buffer
+        self._start = start
+        self._offsets = offsets
+        self._fences = [self[i] for i in range(0, len(self), self.FENCE_STRIDE)]
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        return self._buffer[self._start + self._offsets[index]:self._start + self._offsets[index + 1]]
+
+    def index(self, line):
+        """Returns the position of a line, or None if it is not in the section."""
+        encoded = line.encode('utf-8')
+        block = bisect_right(self._fences, encoded) - 1
+        if block < 0:
+            return None
+        low = block * self.FENCE_STRIDE
+        position = bisect_left(self, encoded, low, min(low + self.FENCE_STRIDE, len(self)))
+        if position < len(self) and self[position] == encoded:
+            return position
+        return None
+
+
+class PlayabilityIndex:
+    """
+    Playability scores by word and by alphagram, backed by a compiled cache
+    buffer (usually a memory-mapped cache file).
+
+    Words and alphagrams are looked up with a binary search of the sorted
+    sections in the buffer, so loading an index does no per-word work.
+
+    An alphagram scores as its most playable anagram. Percentiles are the
+    fraction of words, or alphagrams, with a lower score, so they compare
+    across ranking files with different scales.
+    """
+
+    def __init__(self, buffer):
+        header, sections = _LAYOUT.read(buffer)
+        spans = _LAYOUT.spans(buffer)
+        self.source_digest = header.source_digest
+        # Lines are sliced from the buffer itself, as bytes, which unlike memoryviews compare in order
+        self.words = _SortedLines(buffer, spans['words'][0], sections['word_offsets'].cast('I'))
+        self.alphagrams = _SortedLines(buffer, spans['alphagrams'][0], sections['alphagram_offsets'].cast('I'))
+        self.word_scores = sections['word_scores'].cast('d')
+        self.word_percentiles = sections['word_percentiles'].cast('d')
+        self.alphagram_scores = sections['alphagram_scores'].cast('d')
+        self.alphagram_percentiles = sections['alphagram_percentiles'].cast('d')
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return self.words.index(word) is not None
+
+    def score(self, word):
+        """Returns the score of an uppercase word, or None if it is not ranked."""
+        index = self.words.index(word)
+        return None if index is None else self.word_scores[index]
+
+    def alphagram_score(self, alphagram):
+        """Returns the score of the most playable anagram of an alphagram, or None if none is ranked."""
+        index = self.alphagrams.index(alphagram)
+        return None if index is None else self.alphagram_scores[index]
+
+    def percentile(self, question, alphagram=False):
+        """
+        Returns the percentile of an uppercase word or, if alphagram is set, of
+        the alphagram with the question's letters, e.g. for a list of alphagrams.
+
+        Returns:
+            float: Between 0 and 1, or None if the word or alphagram is not ranked.
+        """
+        if alphagram:
+            index = self.alphagrams.index(''.join(sorted(question)))
+            return None if index is None else self.alphagram_percentiles[index]
+        index = self.words.index(question)
+        return None if index is None else self.word_percentiles[index]
+
+
+def load_playability(file_path):
+    """
+    Loads a playability file, compiling it into '<file>.playcache' if the cache
+    is missing or stale. The cache is considered fresh if the source file's size
+    and modification time are unchanged, or failing that, if its SHA-1 hash is.
+
+    Args:
+        file_path (str): Path to the playability file.
+
+    Returns:
+        PlayabilityIndex: The loaded index.
+
+    Raises:
+        FileNotFoundError: If the playability file does not exist.
+        ValueError: If the playability file is malformed.
+    """
+    def compile_source(stat, digest):
+        return compile_playability(read_playability_file(file_path), stat.st_size, stat.st_mtime_ns, digest)
+    return PlayabilityIndex(_LAYOUT.load(file_path, compile_source))
+
+
+def compile_playability(scores, source_size=0, source_mtime_ns=0, source_digest=b''):
+    """
+    Compiles a dictionary of words to scores into the binary cache layout: a
+    header, a section table and the sections themselves, each 8-byte aligned.
+
+    Returns:
+        bytes: The compiled index.
+    """
+    words = sorted(scores)
+    word_scores = array('d', (scores[word] for word in words))
+
+    best = {}
+    for word, score in zip(words, word_scores):
+        alphagram = ''.join(sorted(word))
+        if score > best.get(alphagram, float('-inf')):
+            best[alphagram] = score
+    alphagrams = sorted(best)
+    alphagram_scores = array('d', (best[alphagram] for alphagram in alphagrams))
+    # Sorted as UTF-8 bytes, the order binary searches of the sections compare in
+    encoded_words = [word.encode('utf-8') for word in words]
+    encoded_alphagrams = [alphagram.encode('utf-8') for alphagram in alphagrams]
+
+    sections = {
+        'words': b''.join(encoded_words),
+        'word_offsets': _line_offsets(encoded_words).tobytes(),
+        'alphagrams': b''.join(encoded_alphagrams),
+        'alphagram_offsets': _line_offsets(encoded_alphagrams).tobytes(),
+        'word_scores': word_scores.tobytes(),
+        'word_percentiles': _percentiles(word_scores).tobytes(),
+        'alphagram_scores': alphagram_scores.tobytes(),
+        'alphagram_percentiles': _percentiles(alphagram_scores).tobytes(),
+    }
+
+    return _LAYOUT.compile(sections, (len(words), len(alphagrams)), 0, source_size, source_mtime_ns,
+                           source_digest)
+
+
+def _line_offsets(lines):
+    offsets = array('I', [0])
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def _percentiles(scores):
+    ordered = sorted(scores)
+    return array('d', (bisect_left(ordered, score) / len(ordered) for score in scores))
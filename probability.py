@@ -0,0 +1,163 @@
+"""
+Rack probability calculations for a bag of tiles.
+
+The number of ways to draw a rack is the product, over its letters, of the
+number of ways to pick that many of the letter's tiles. In the exact model the
+bag's blanks can stand in for any missing or additional tiles, which is how
+Zyzzyva computes its probability order.
+"""
+from collections import Counter
+from math import comb
+
+from alphagram import alphagram_key
+
+BLANK = '?'
+
+TILE_COUNTS = {
+    'A': 9, 'B': 2, 'C': 2, 'D': 4, 'E': 12, 'F': 2, 'G': 3, 'H': 2, 'I': 9,
+    'J': 1, 'K': 1, 'L': 4, 'M': 2, 'N': 6, 'O': 8, 'P': 2, 'Q': 1, 'R': 6,
+    'S': 4, 'T': 6, 'U': 4, 'V': 2, 'W': 2, 'X': 1, 'Y': 2, 'Z': 1
+}
+BLANK_COUNT = 2
+
+# Longest rack the combination tables are built for
+MAX_RACK_LENGTH = 15
+
+
+class TileDistribution:
+    """
+    The tiles in a bag. For every letter and count on a rack, the number of
+    ways to draw those tiles using 0, 1, 2, ... blanks in their place is
+    precomputed, so ways_to_draw only does table lookups and multiplications.
+    """
+
+    def __init__(self, tile_counts=None, blanks=BLANK_COUNT):
+        self.tile_counts = dict(TILE_COUNTS if tile_counts is None else tile_counts)
+        self.blanks = blanks
+        # At least three terms so the common two-blank case can be unrolled
+        terms = max(blanks + 1, 3)
+        self._letter_ways = {
+            letter: [
+                tuple(comb(tile_count, count - b) if b <= count else 0 for b in range(terms))
+                for count in range(MAX_RACK_LENGTH + 1)
+            ]
+            for letter, tile_count in self.tile_counts.items()
+        }
+        self._blank_combinations = [comb(blanks, n) for n in range(MAX_RACK_LENGTH + 1)]
+
+    def ways_to_draw(self, rack, exact=True):
+        """
+        Calculates the number of ways to draw the rack from the bag.
+
+        Args:
+            rack (str): The rack, with '?' for a blank.
+            exact (bool): Whether the bag's blanks may substitute for the rack's letters.
+                If False, blanks are ignored and an impossible rack has no ways to be drawn.
+
+        Returns:
+            int: The number of ways to draw the rack.
+        """
+        counts = Counter(rack)
+        rack_blanks = counts.pop(BLANK, 0)
+        spare_blanks = self.blanks - rack_blanks if exact else 0
+        if spare_blanks < 0:
+            return 0
+
+        ways = self._substitution_ways(counts, spare_blanks)
+        blank_combinations = self._blank_combinations
+        return sum(blank_combinations[rack_blanks + b] * ways[b] for b in range(spare_blanks + 1))
+
+    def blank_substitution_ways(self, letters, max_blanks=None):
+        """
+        Counts the ways to draw a set of letters with some of them replaced by
+        blanks, ignoring how the blanks themselves are picked.
+
+        Args:
+            letters (str): The letters, without blanks.
+            max_blanks (int): The most blanks to consider, the bag's blanks by default.
+
+        Returns:
+            list: Entry b is the number of ways to draw the letters with exactly b
+            of them replaced by blanks. The number of ways to draw the letters from
+            a bag with n blanks is the sum of comb(n, b) times entry b.
+        """
+        return list(self._substitution_ways(Counter(letters), self.blanks if max_blanks is None else max_blanks))
+
+    def _substitution_ways(self, counts, spare_blanks):
+        # ways[b] is the number of ways to draw the letters so far using b blanks in their place
+        try:
+            letter_ways = [self._letter_ways[letter][count] for letter, count in counts.items()]
+        except KeyError as e:
+            raise ValueError(f"Letter {e} is not in the tile distribution.")
+        if spare_blanks <= 2:
+            w0, w1, w2 = 1, 0, 0
+            for l0, l1, l2, *_ in letter_ways:
+                w0, w1, w2 = w0 * l0, w0 * l1 + w1 * l0, w0 * l2 + w1 * l1 + w2 * l0
+            return (w0, w1, w2)[:spare_blanks + 1]
+        ways = [1] + [0] * spare_blanks
+        for terms in letter_ways:
+            ways = [sum(ways[b - k] * terms[k] for k in range(b + 1)) for b in range(spare_blanks + 1)]
+        return ways
+
+    def ways_to_draw_all(self, racks, exact=True):
+        """Returns the number of ways to draw each rack, computing each distinct set of letters once."""
+        key_ways = {}
+        results = []
+        for rack in racks:
+            key = alphagram_key(rack.replace(BLANK, '')) * (MAX_RACK_LENGTH + 1) + rack.count(BLANK)
+            if key not in key_ways:
+                key_ways[key] = self.ways_to_draw(rack, exact)
+            results.append(key_ways[key])
+        return results
+
+    def probability_orders(self, words, exact=True):
+        """
+        Ranks words by how likely their letters are to be drawn, separately for
+        each word length. Anagrams share a rank and ties between alphagrams are
+        broken alphabetically.
+
+        Args:
+            words (iterable): The uppercase words to rank.
+            exact (bool): Whether to use the blank-aware model.
+
+        Returns:
+            dict: A dictionary mapping each word to its 1-based probability order.
+        """
+        words = list(words)
+        alphagrams = [''.join(sorted(word)) for word in words]
+        alphagram_ways = dict(zip(alphagrams, self.ways_to_draw_all(alphagrams, exact)))
+        ranked = sorted(alphagram_ways, key=lambda alphagram: (len(alphagram), -alphagram_ways[alphagram], alphagram))
+
+        orders = {}
+        current_length, order = None, 0
+        for alphagram in ranked:
+            if len(alphagram) != current_length:
+                current_length, order = len(alphagram), 0
+            order += 1
+            orders[alphagram] = order
+        return {word: orders[alphagram] for word, alphagram in zip(words, alphagrams)}
+
+
+def load_tile_distribution(file_path):
+    """
+    Reads a tile distribution file with one 'LETTER COUNT' pair per line, using
+    '?' for blanks.
+
+    Returns:
+        TileDistribution: The distribution described by the file.
+    """
+    tile_counts = {}
+    blanks = 0
+    with open(file_path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            letter, count = line.split()
+            if letter == BLANK:
+                blanks = int(count)
+            else:
+                tile_counts[letter.upper()] = int(count)
+    return TileDistribution(tile_counts, blanks)
+
+
+DEFAULT_DISTRIBUTION = TileDistribution()
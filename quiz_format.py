@@ -0,0 +1,178 @@
+"""
+Streaming readers and writers for Zyzzyva-style quiz files.
+
+Both formats start with a '0' header line followed by one question per line:
+
+    .jqz  question;answer;score
+    .cqz  score<tab>question<tab>answer
+
+Writers take a path or an open text file and write through it in chunks of
+lines, so a quiz over the whole lexicon is produced in linear time without
+being held in memory. Separators and line breaks inside fields are escaped
+in one place, escape_field, and readers check every line has its three fields.
+"""
+import os
+from collections import namedtuple
+
+HEADER = '0'
+
+QuizRow = namedtuple('QuizRow', ['question', 'answer', 'score'])
+
+# Rows buffered before each write to the underlying file
+CHUNK_ROWS = 4096
+
+
+class QuizFormatError(ValueError):
+    """A quiz file line does not have the expected fields."""
+
+
+class QuizFormat:
+    """
+    A quiz file format.
+
+    Args:
+        extension (str): The file extension, including the dot.
+        separator (str): The field separator.
+        fields (tuple): The order of the QuizRow fields on each line.
+        replacements (dict): How characters that would break a line are written inside a field.
+    """
+
+    def __init__(self, extension, separator, fields, replacements):
+        self.extension = extension
+        self.separator = separator
+        self.fields = fields
+        self.replacements = replacements
+        self._table = str.maketrans(replacements)
+
+    def escape_field(self, value):
+        """Returns a field value with separators and line breaks replaced so the line stays parseable."""
+        return str(value).translate(self._table)
+
+    def format_row(self, question, answer, score=0):
+        """Returns the line, with its newline, for one question."""
+        row = QuizRow(question, answer, score)
+        return self.separator.join(self.escape_field(getattr(row, field)) for field in self.fields) + '\n'
+
+    def parse_line(self, line, line_number=None):
+        """
+        Parses one question line.
+
+        Raises:
+            QuizFormatError: If the line does not have exactly three fields.
+        """
+        parts = line.rstrip('\r\n').split(self.separator)
+        if len(parts) != len(self.fields):
+            where = f" on line {line_number}" if line_number is not None else ''
+            raise QuizFormatError(f"Expected {len(self.fields)} fields separated by {self.separator!r}{where}: {line.strip()}")
+        return QuizRow(**dict(zip(self.fields, parts)))
+
+
+JQZ = QuizFormat('.jqz', ';', ('question', 'answer', 'score'), {';': ':', '\n': '<br>', '\r': ''})
+CQZ = QuizFormat('.cqz', '\t', ('score', 'question', 'answer'), {'\t': ' ', '\n': ' ', '\r': ''})
+
+FORMATS = {quiz_format.extension: quiz_format for quiz_format in (JQZ, CQZ)}
+
+
+def format_for_path(path, default=JQZ):
+    """Returns the quiz format matching a file name's extension, or default if it has another one."""
+    return FORMATS.get(os.path.splitext(str(path))[1].lower(), default)
+
+
+class QuizWriter:
+    """
+    Writes a quiz file a chunk of lines at a time. Use as a context manager,
+    or call close, so the last chunk is written.
+
+    Args:
+        file: A path to create, or an open text file such as sys.stdout, which is left open.
+        quiz_format (QuizFormat): JQZ or CQZ, by default from the path's extension.
+        chunk_rows (int): Lines buffered before each write.
+    """
+
+    def __init__(self, file, quiz_format=None, chunk_rows=CHUNK_ROWS):
+        if isinstance(file, (str, os.PathLike)):
+            self.quiz_format = quiz_format or format_for_path(file)
+            self._file = open(file, 'w', encoding='utf-8', newline='\n')
+            self._owns_file = True
+        else:
+            self.quiz_format = quiz_format or JQZ
+            self._file = file
+            self._owns_file = False
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self._chunk = [HEADER + '\n']
+
+    def write(self, question, answer, score=0):
+        self._chunk.append(self.quiz_format.format_row(question, answer, score))
+        self.rows_written += 1
+        if len(self._chunk) >= self.chunk_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        """Writes (question, answer, score) rows, e.g. from read_quiz."""
+        for question, answer, score in rows:
+            self.write(question, answer, score)
+
+    def write_line(self, line):
+        """Writes an already formatted question line as is, e.g. one copied from another quiz of the same format."""
+        self._chunk.append(line if line.endswith('\n') else line + '\n')
+        self.rows_written += 1
+        if len(self._chunk) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self._chunk:
+            self._file.write(''.join(self._chunk))
+            self._chunk = []
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_quiz_lines(file_path):
+    """
+    Yields (line number, line) for the question lines of a quiz file, skipping
+    the '0' header if present and any blank lines. Lines keep their newline.
+    """
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        for line_number, line in enumerate(file, 1):
+            if line_number == 1 and line.strip() == HEADER:
+                continue
+            if line.strip():
+                yield line_number, line
+
+
+def read_quiz(file_path, quiz_format=None):
+    """
+    Streams the questions of a quiz file.
+
+    Args:
+        file_path (str): The .jqz or .cqz file.
+        quiz_format (QuizFormat): JQZ or CQZ, by default from the file's extension.
+
+    Yields:
+        QuizRow: The question, answer and score of each line, as strings.
+
+    Raises:
+        QuizFormatError: If a line does not have three fields.
+    """
+    quiz_format = quiz_format or format_for_path(file_path)
+    for line_number, line in iter_quiz_lines(file_path):
+        yield quiz_format.parse_line(line, line_number)
+
+
+def read_jqz(file_path):
+    return read_quiz(file_path, JQZ)
+
+
+def read_cqz(file_path):
+    return read_quiz(file_path, CQZ)
@@ -0,0 +1,242 @@
+"""
+Orders a quiz or word list by playability, probability or a blend of the two.
+
+Each question is given a score between 0 and 1: its mean percentile in the
+playability indexes that rank it, its probability percentile among the
+questions of the same length, or a weighted blend of the two. Lines are then
+sorted by decreasing score with an external merge sort. Runs of RUN_ROWS lines
+are sorted in memory and spilled to temporary files, which are merged as the
+output is written, so quizzes with millions of lines are never held in memory.
+Ties keep their order in the input.
+"""
+import argparse
+import heapq
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from playability import load_playability
+from probability import DEFAULT_DISTRIBUTION
+from quiz_format import QuizWriter, format_for_path, iter_quiz_lines
+
+RANKINGS = ('playability', 'probability', 'blend')
+
+# Lines sorted in memory before being spilled to a temporary file
+RUN_ROWS = 100000
+
+# Sort key of questions with no score, which go after all the others
+UNRANKED = float('inf')
+
+
+def question_word(question):
+    """Returns the word a question asks about: the question up to any '<br>', uppercased."""
+    return question.split('<br>', 1)[0].strip().upper()
+
+
+def iter_questions(file_path, quiz_format):
+    """
+    Yields (line number, line, word) for each question of a quiz, or each line
+    of a word list if quiz_format is None.
+    """
+    for line_number, line in iter_quiz_lines(file_path):
+        question = quiz_format.parse_line(line, line_number).question if quiz_format else line
+        yield line_number, line, question_word(question)
+
+
+class ProbabilityRanks:
+    """
+    Probability percentiles of the words of a quiz among the words of the same
+    length, e.g. 0.9 for a word more probable than 90% of them.
+
+    Args:
+        words (iterable): Every word of the quiz.
+        distribution (TileDistribution): The bag to draw from.
+    """
+
+    def __init__(self, words, distribution=DEFAULT_DISTRIBUTION):
+        self.distribution = distribution
+        self._ways = {}
+        by_length = defaultdict(lambda: array('d'))
+        for word in words:
+            by_length[len(word)].append(self.ways(word))
+        self._sorted_ways = {length: sorted(ways) for length, ways in by_length.items()}
+
+    def ways(self, word):
+        """
+        Returns the number of ways to draw the word, cached by alphagram. A
+        word with letters that are not in the bag, like '*', has none.
+        """
+        alphagram = ''.join(sorted(word))
+        ways = self._ways.get(alphagram)
+        if ways is None:
+            try:
+                ways = float(self.distribution.ways_to_draw(alphagram))
+            except ValueError:
+                ways = 0.0
+            self._ways[alphagram] = ways
+        return ways
+
+    def percentile(self, word):
+        ordered = self._sorted_ways[len(word)]
+        return bisect_left(ordered, self.ways(word)) / len(ordered)
+
+
+def playability_percentile(indexes, word, alphagrams=False):
+    """
+    Returns the mean percentile of a word, or of its alphagram if alphagrams is
+    set, in the indexes that rank it, or None if none do.
+    """
+    percentiles = [p for p in (index.percentile(word, alphagrams) for index in indexes) if p is not None]
+    return sum(percentiles) / len(percentiles) if percentiles else None
+
+
+def question_scorer(file_path, quiz_format, ranking, indexes=(), weight=0.5, alphagrams=False):
+    """
+    Returns a function scoring a question's word between 0 and 1, or None if
+    it cannot be ranked.
+
+    Args:
+        file_path (str): The quiz, read once more for the probability rankings.
+        quiz_format (QuizFormat): The quiz's format, or None for a word list.
+        ranking (str): One of RANKINGS.
+        indexes (list): PlayabilityIndex objects for the playability rankings.
+        weight (float): Weight of playability in the blend, probability having the rest.
+        alphagrams (bool): Whether the questions are alphagrams, ranked by their most playable anagram.
+
+    Raises:
+        ValueError: If the ranking is unknown or needs playability indexes that were not given.
+    """
+    if ranking not in RANKINGS:
+        raise ValueError(f"Unknown ranking: {ranking}")
+    if ranking != 'probability' and not indexes:
+        raise ValueError(f"Ranking by {ranking} needs at least one playability file.")
+    if ranking == 'playability':
+        return lambda word: playability_percentile(indexes, word, alphagrams)
+
+    probability = ProbabilityRanks(word for _, _, word in iter_questions(file_path, quiz_format))
+    if ranking == 'probability':
+        return probability.percentile
+
+    def blended(word):
+        # A word missing from every playability file is taken to be the least playable
+        return weight * (playability_percentile(indexes, word, alphagrams) or 0.0) + (1 - weight) * probability.percentile(word)
+    return blended
+
+
+def external_sort(keyed_lines, run_rows=RUN_ROWS):
+    """
+    Yields lines in order of their keys.
+
+    Args:
+        keyed_lines (iterable): (key, line) pairs. Keys are (float, int) pairs
+            whose second element is unique, e.g. the line number.
+        run_rows (int): Lines sorted in memory before being spilled to a temporary file.
+    """
+    runs = []
+    try:
+        run = []
+        for item in keyed_lines:
+            run.append(item)
+            if len(run) >= run_rows:
+                runs.append(_spill_run(sorted(run)))
+                run = []
+        run.sort()
+        if not runs:
+            for _, line in run:
+                yield line
+            return
+        for _, line in heapq.merge(*(_read_run(file) for file in runs), run):
+            yield line
+    finally:
+        for file in runs:
+            file.close()
+
+
+def _spill_run(run):
+    file = tempfile.TemporaryFile('w+', encoding='utf-8', newline='')
+    for (score, line_number), line in run:
+        if not line.endswith('\n'):
+            line += '\n'
+        file.write(f"{score!r}\t{line_number}\t{line}")
+    file.seek(0)
+    return file
+
+
+def _read_run(file):
+    for record in file:
+        score, line_number, line = record.split('\t', 2)
+        yield (float(score), int(line_number)), line
+
+
+def order_quiz(input_path, output_path, ranking='playability', indexes=(), weight=0.5, run_rows=RUN_ROWS,
+               alphagrams=False):
+    """
+    Writes a quiz or word list ordered by decreasing score.
+
+    Args:
+        input_path (str): A .jqz or .cqz quiz, or a word list with one word per line.
+        output_path (str): The ordered file, in the same format.
+        ranking (str): One of RANKINGS.
+        indexes (list): PlayabilityIndex objects for the playability rankings.
+        weight (float): Weight of playability in the blend, probability having the rest.
+        run_rows (int): Lines sorted in memory at a time.
+        alphagrams (bool): Whether the questions are alphagrams, ranked by their most playable anagram.
+
+    Returns:
+        int: The number of questions written.
+
+    Raises:
+        ValueError: If the ranking cannot be used, or a quiz line is malformed.
+    """
+    quiz_format = format_for_path(input_path, default=None)
+    score = question_scorer(input_path, quiz_format, ranking, indexes, weight, alphagrams)
+
+    def keyed_lines():
+        for line_number, line, word in iter_questions(input_path, quiz_format):
+            value = score(word)
+            yield (UNRANKED if value is None else -value, line_number), line
+
+    if quiz_format:
+        with QuizWriter(output_path, quiz_format) as writer:
+            for line in external_sort(keyed_lines(), run_rows):
+                writer.write_line(line)
+            return writer.rows_written
+    count = 0
+    with open(output_path, 'w', encoding='utf-8', newline='\n') as file:
+        for line in external_sort(keyed_lines(), run_rows):
+            file.write(line if line.endswith('\n') else line + '\n')
+            count += 1
+    return count
+
+
+def add_ranking_arguments(parser):
+    """Adds the ranking options shared by the scripts that order quizzes."""
+    parser.add_argument("--by", choices=RANKINGS, default='playability', help="How to rank the questions")
+    parser.add_argument("--playab", action='append', default=[], metavar='FILE',
+                        help="Playability file of 'score word' lines. May be given more than once.")
+    parser.add_argument("--weight", type=float, default=0.5,
+                        help="Weight of playability when blending it with probability, between 0 and 1")
+    parser.add_argument("--alphagrams", action='store_true',
+                        help="The questions are alphagrams, ranked by their most playable anagram")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order a quiz or word list by playability, probability or both.")
+    parser.add_argument("input", help="A .jqz or .cqz quiz, or a word list with one word per line")
+    parser.add_argument("output", help="The ordered file")
+    add_ranking_arguments(parser)
+    parser.add_argument("--run-rows", type=int, default=RUN_ROWS, help="Lines sorted in memory at a time")
+    args = parser.parse_args()
+
+    try:
+        indexes = [load_playability(path) for path in args.playab]
+        count = order_quiz(args.input, args.output, args.by, indexes, args.weight, args.run_rows, args.alphagrams)
+    except (FileNotFoundError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+    print(f"Wrote {count} questions to {args.output}, ordered by {args.by}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Cuts a quiz file into segments of consecutive questions in a single pass.
+
+The quiz is memory-mapped once and the byte offset of every question line is
+recorded. After that, each segment is a byte range of the file. It is copied
+into its own quiz file, after a '0' header, with os.copy_file_range or
+os.sendfile where the platform supports them, so the data never passes
+through Python. Otherwise it is written straight from the map.
+
+Segments are given as (start, stop) question indexes, as produced by
+fixed_windows, cumulative_windows and sliding_windows.
+"""
+import errno
+import mmap
+import os
+from array import array
+
+from quiz_format import HEADER
+
+# Errors meaning a kernel copy does not work for these files, e.g. across file systems
+_UNSUPPORTED_ERRORS = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSOCK, errno.EBADF
+}
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+# Kernel copies still worth trying, in order of preference. One is dropped the
+# first time it fails as unsupported, so the fallback costs a single failed call.
+_kernel_copies = [copy for copy, name in ((_copy_file_range, 'copy_file_range'), (_sendfile, 'sendfile'))
+                  if hasattr(os, name)]
+
+
+def _copy_range(data, src_fd, dst_fd, offset, count):
+    """
+    Appends count bytes from offset in src_fd to dst_fd, in the kernel if
+    possible, otherwise by writing them from data, the mapped source file.
+    """
+    end = offset + count
+    while offset < end:
+        copied = 0
+        for copy in list(_kernel_copies):
+            try:
+                copied = copy(src_fd, dst_fd, offset, end - offset)
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRORS:
+                    raise
+                if copy in _kernel_copies:
+                    _kernel_copies.remove(copy)
+                continue
+            if copied:
+                break
+        if not copied:
+            copied = os.write(dst_fd, data[offset:end])
+        offset += copied
+
+
+def line_offsets(data):
+    """
+    Returns the byte offset of the start of every line of data, followed by
+    its length, so line i spans offsets[i] to offsets[i + 1]. A final line
+    without a newline counts as a line.
+    """
+    offsets = array('q', [0])
+    position = data.find(b'\n')
+    while position != -1:
+        offsets.append(position + 1)
+        position = data.find(b'\n', position + 1)
+    if offsets[-1] != len(data):
+        offsets.append(len(data))
+    return offsets
+
+
+class QuizFile:
+    """
+    A quiz file mapped into memory, indexed by question. Use as a context
+    manager, or call close.
+
+    Args:
+        path (str): The .jqz or .cqz file. A '0' header line, if present, is
+            not counted as a question.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY)
+        try:
+            # A zero-length file cannot be mapped
+            if os.fstat(self._fd).st_size:
+                self._data = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+            else:
+                self._data = b''
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self.offsets = line_offsets(self._data)
+        first_line = self._data[:self.offsets[1]] if len(self.offsets) > 1 else b''
+        # Segments keep the lines as they are, so their header ends the same way
+        self.newline = b'\r\n' if first_line.endswith(b'\r\n') else b'\n'
+        if first_line.strip() == HEADER.encode('utf-8'):
+            del self.offsets[0]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def questions(self, start, stop):
+        """Returns the bytes of questions start to stop, with their newlines."""
+        return self._data[self.offsets[start]:self.offsets[stop]]
+
+    def write_segment(self, path, start, stop):
+        """
+        Writes questions start to stop to a new quiz file, after a '0' header
+        ending like the quiz's first line.
+
+        Returns:
+            int: The number of questions written.
+        """
+        start, stop = max(0, start), min(stop, len(self))
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            os.write(fd, HEADER.encode('utf-8') + self.newline)
+            if stop > start:
+                begin = self.offsets[start]
+                _copy_range(self._data, self._fd, fd, begin, self.offsets[stop] - begin)
+        finally:
+            os.close(fd)
+        return max(stop - start, 0)
+
+    def write_segments(self, segments, output=print):
+        """
+        Writes each (path, start, stop) segment to its own quiz file.
+
+        Args:
+            segments (iterable): The paths and question ranges to write.
+            output (callable): Called with a line for each file written.
+        """
+        for path, start, stop in segments:
+            count = self.write_segment(path, start, stop)
+            output(f"Created: {path} with {count} questions")
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        os.close(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def fixed_windows(total, size):
+    """Yields (start, stop) for consecutive runs of size questions, the last one possibly shorter."""
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+def cumulative_windows(total, step):
+    """Yields (0, stop) for the first step, 2 * step, ... questions, ending with all of them."""
+    for stop in range(step, total + 1, step):
+        yield 0, stop
+    if total % step or not total:
+        yield 0, total
+
+
+def sliding_windows(total, step, span=None):
+    """
+    Yields (start, stop) ending every step questions, each going back at most
+    span questions, or to the first question if span is None. Questions after
+    the last multiple of step are in no window.
+    """
+    for stop in range(step, total + 1, step):
+        yield (max(0, stop - span) if span else 0), stop
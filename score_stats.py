@@ -1,42 +1,54 @@
+import argparse
+
 import pandas as pd
-import numpy as np
 
-# Load the CSV file into a DataFrame
-file_path = 'all_xt_games.csv'
-df = pd.read_csv(file_path)
+from game_score_analysis import moments_to_stats, threshold_moments, update_partials
+from game_store import STORE_DIR
+
+# Moments of earlier runs, so each run only reads the games added since
+STATE_FILE = 'score_stats.json'
+START_DATE = '2015-01-01'
 
-# Convert the 'date' column to datetime format
-df['date'] = pd.to_datetime(df['date'])
+# Thresholds for minimum old rating
+thresholds = range(1200, 2001, 100)
 
-# Filter games on or after 2015-01-01
-df = df[df['date'] >= '2015-01-01']
+def score_diff_moments(df):
+    # Calculate score difference
+    score_diff = abs(df['winnerscore'] - df['loserscore'])
 
-# Calculate score difference
-df['score_diff'] = abs(df['winnerscore'] - df['loserscore'])
+    # Count, sum and sum of squares for every (lexicon, threshold) in one pass
+    return {'lexicon_thresholds': threshold_moments(df, thresholds, score_diff, by='lexicon')}
 
-# Function to calculate stats
-def calculate_stats(group):
-    average = group['score_diff'].mean()
-    std_dev = group['score_diff'].std()
-    count = len(group)
-    return average, std_dev, count
+parser = argparse.ArgumentParser(description="Score difference statistics by lexicon and minimum rating, "
+                                             "reading only the games added since the last run.")
+parser.add_argument("--store", default=STORE_DIR, help="Game store directory (see game_store.py).")
+parser.add_argument("--state-file", default=STATE_FILE, help="File keeping the statistics of earlier runs.")
+parser.add_argument("--full", action='store_true', help="Ignore earlier runs and read every game.")
+args = parser.parse_args()
 
-# Thresholds for minimum old rating
-thresholds = range(1200, 2001, 100)
+# Load the games on or after 2015-01-01 added to the game store since the last run
+moments, new_games = update_partials(score_diff_moments,
+                                     ['date', 'lexicon', 'winnerscore', 'loserscore', 'winneroldrating', 'loseroldrating'],
+                                     {'start_date': START_DATE, 'thresholds': list(thresholds)},
+                                     args.state_file, args.full, args.store, start_date=START_DATE)
+moments = moments['lexicon_thresholds']
+print(f"Read {new_games} new games.")
 
 # Initialize a results list for all combinations
 results = []
 
-# Iterate over lexicon groups
-lexicon_groups = df.groupby('lexicon')
-for lexicon, group in lexicon_groups:
+# Iterate over lexicons
+for lexicon in sorted(moments.index.get_level_values('lexicon').unique()):
     print(f"\nLexicon {lexicon}:")
 
     # Iterate over thresholds
     for threshold in thresholds:
-        filtered = group[(group['winneroldrating'] >= threshold) & (group['loseroldrating'] >= threshold)]
-        if not filtered.empty:
-            avg, std, count = calculate_stats(filtered)
+        stats = {'total_games': 0}
+        if (lexicon, threshold) in moments.index:
+            # Sample standard deviation, like pandas' std
+            stats = moments_to_stats(moments.loc[(lexicon, threshold)], ddof=1)
+        if stats['total_games'] > 0:
+            avg, std, count = stats['average'], stats['std_deviation'], stats['total_games']
             results.append((lexicon, threshold, avg, std, count))
             print(f"  Threshold >= {threshold}: Avg = {avg:.2f}, StdDev = {std:.2f}, Count = {count}")
         else:
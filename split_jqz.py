@@ -1,28 +1,14 @@
 import argparse
 
-def split_file(input_file, n):
-    # Read all lines from the input file
-    with open(input_file, 'r') as file:
-        lines = file.readlines()
-
-    total_lines = len(lines)
-    i = 1
-
-    # Iteratively create new files with increasing line counts
-    while (i * n) + 1 <= total_lines:
-        new_file_name = f"{input_file}_{i}.txt"
-        with open(new_file_name, 'w') as new_file:
-            # Write the first i*N lines to the new file
-            new_file.writelines(lines[:i * n + 1])
-        print(f"Created: {new_file_name} with {i * n + 1} lines")
-        i += 1
+from quiz_segments import QuizFile, cumulative_windows
 
-    # If the last file would contain fewer than N additional lines, write the rest
-    if i * n + 1 > total_lines:
-        new_file_name = f"{input_file}_{i}.txt"
-        with open(new_file_name, 'w') as new_file:
-            new_file.writelines(lines)
-        print(f"Created: {new_file_name} with all {total_lines} lines")
+def split_file(input_file, n):
+    # Map the quiz once and copy each prefix out of it
+    with QuizFile(input_file) as quiz:
+        # Files with the first n, 2n, ... questions, the last one with all of them
+        segments = ((f"{input_file}_{i}.txt", start, stop)
+                    for i, (start, stop) in enumerate(cumulative_windows(len(quiz), n), 1))
+        quiz.write_segments(segments)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Split a file into parts with increasing number of lines.')
@@ -31,4 +17,3 @@ if __name__ == "__main__":
     
     args = parser.parse_args()
     split_file(args.input_file, args.n)
-
@@ -0,0 +1,218 @@
+"""
+A precomputed statistics cube over the game history.
+
+The cube holds the number of games and the sum and sum of squares of the
+score difference (winner's score minus loser's) for every combination of
+year, lexicon, winner's rating band, loser's rating band and score difference
+bucket. It is built from the game store in one pass and saved as a small
+Parquet file, after which questions like "average score difference in
+lexicon 0 since 2015 when both players were rated 1500 or more" are answered
+by filtering and summing the cube instead of scanning every game.
+
+Bands and buckets are identified by their lowest value, e.g. with 100 point
+rating bands the band 1500 holds ratings 1500 to 1599.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from game_store import STORE_DIR, open_store
+
+CUBE_FILE = 'xt_stats_cube.parquet'
+RATING_BAND = 100
+SCORE_BUCKET = 25
+
+DIMENSIONS = ('year', 'lexicon', 'winner_band', 'loser_band', 'diff_bucket')
+MEASURES = ('count', 'sum', 'sum_sq')
+
+_COLUMNS = ['date', 'lexicon', 'winnerscore', 'loserscore', 'winneroldrating', 'loseroldrating']
+
+
+def aggregate_games(df, rating_band=RATING_BAND, score_bucket=SCORE_BUCKET):
+    """
+    Aggregates a DataFrame of games into cube cells. Games with a missing
+    column are left out.
+
+    Returns:
+        DataFrame: One row per non-empty cell, with DIMENSIONS and MEASURES columns.
+    """
+    df = df.dropna(subset=_COLUMNS)
+    diff = df['winnerscore'].to_numpy(np.int64) - df['loserscore'].to_numpy(np.int64)
+    cells = pd.DataFrame({
+        'year': df['date'].dt.year.to_numpy(np.int16),
+        'lexicon': df['lexicon'].to_numpy(np.int8),
+        'winner_band': df['winneroldrating'].to_numpy(np.int64) // rating_band * rating_band,
+        'loser_band': df['loseroldrating'].to_numpy(np.int64) // rating_band * rating_band,
+        'diff_bucket': diff // score_bucket * score_bucket,
+        'sum': diff,
+        'sum_sq': diff * diff,
+    })
+    return cells.groupby(list(DIMENSIONS)).agg(count=('sum', 'size'), sum=('sum', 'sum'),
+                                               sum_sq=('sum_sq', 'sum')).reset_index()
+
+
+def build_cube(store_dir=STORE_DIR, rating_band=RATING_BAND, score_bucket=SCORE_BUCKET):
+    """
+    Builds the cube from the game store, one record batch at a time. The
+    per-batch cells are mergeable and summed at the end.
+
+    Returns:
+        DataFrame: The cube.
+    """
+    partials = []
+    for record_batch in open_store(store_dir).to_batches(columns=_COLUMNS):
+        df = record_batch.to_pandas(date_as_object=False)
+        partials.append(aggregate_games(df, rating_band, score_bucket))
+    if not partials:
+        return pd.DataFrame(columns=list(DIMENSIONS + MEASURES))
+    cube = pd.concat(partials, ignore_index=True)
+    return cube.groupby(list(DIMENSIONS), as_index=False)[list(MEASURES)].sum()
+
+
+def save_cube(cube, cube_file=CUBE_FILE, rating_band=RATING_BAND, score_bucket=SCORE_BUCKET):
+    """Writes the cube with its band and bucket widths stored in the file's metadata."""
+    table = pa.Table.from_pandas(cube, preserve_index=False)
+    metadata = {b'rating_band': str(rating_band).encode(), b'score_bucket': str(score_bucket).encode()}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    pq.write_table(table, cube_file)
+
+
+def load_cube(cube_file=CUBE_FILE):
+    """
+    Reads a saved cube.
+
+    Returns:
+        tuple: The cube DataFrame, its rating band width and its score bucket width.
+    """
+    table = pq.read_table(cube_file)
+    metadata = table.schema.metadata
+    return table.to_pandas(), int(metadata[b'rating_band']), int(metadata[b'score_bucket'])
+
+
+def parse_range(text):
+    """
+    Parses 'LOW:HIGH', 'LOW:', ':HIGH' or a single value into inclusive
+    (low, high) bounds, None meaning unbounded.
+    """
+    if ':' not in text:
+        return int(text), int(text)
+    low, high = text.split(':', 1)
+    return (int(low) if low else None), (int(high) if high else None)
+
+
+def slice_cube(cube, **ranges):
+    """
+    Keeps the cells whose dimensions fall in the given ranges.
+
+    Args:
+        cube (DataFrame): The cube.
+        **ranges: (low, high) bounds, see parse_range, keyed by dimension name.
+            Bounds on rating and score dimensions apply to the lowest value of
+            each band or bucket.
+
+    Returns:
+        DataFrame: The matching cells.
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    for dimension, (low, high) in ranges.items():
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown cube dimension: {dimension}")
+        if low is not None:
+            mask &= cube[dimension].to_numpy() >= low
+        if high is not None:
+            mask &= cube[dimension].to_numpy() <= high
+    return cube[mask]
+
+
+def roll_up(cube, by=(), ddof=0):
+    """
+    Sums the cells over every dimension not in 'by'.
+
+    Returns:
+        DataFrame: One row per combination of the 'by' dimensions with the
+        number of games and the average and standard deviation of the score difference.
+    """
+    by = list(by)
+    if by:
+        totals = cube.groupby(by)[list(MEASURES)].sum()
+    else:
+        totals = cube[list(MEASURES)].sum().to_frame('All').T
+    count = totals['count'].astype(np.float64)
+    average = totals['sum'] / count
+    variance = (totals['sum_sq'] - totals['sum'] * average) / (count - ddof)
+    result = pd.DataFrame({
+        'games': totals['count'].astype(np.int64),
+        'average': average,
+        'std_deviation': np.sqrt(variance.clip(lower=0)).where(count > ddof),
+    })
+    return result[result['games'] > 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query a statistics cube over the game store.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Build the cube from the game store")
+    build_parser.add_argument('--store', default=STORE_DIR, help="Game store directory")
+    build_parser.add_argument('--cube', default=CUBE_FILE, help="Cube file to write")
+    build_parser.add_argument('--rating-band', type=int, default=RATING_BAND, help="Width of the rating bands")
+    build_parser.add_argument('--score-bucket', type=int, default=SCORE_BUCKET,
+                              help="Width of the score difference buckets")
+
+    query_parser = subparsers.add_parser(
+        'query', help="Summarize the score difference over a slice of the cube",
+        description="Ranges are 'LOW:HIGH', 'LOW:', ':HIGH' or a single value, all inclusive.")
+    query_parser.add_argument('--cube', default=CUBE_FILE, help="Cube file to read")
+    query_parser.add_argument('--by', nargs='*', default=[], choices=DIMENSIONS,
+                              help="Dimensions to break the results down by")
+    query_parser.add_argument('--year', type=parse_range, help="Range of years")
+    query_parser.add_argument('--lexicon', type=parse_range, help="Range of lexicons")
+    query_parser.add_argument('--min-rating', type=int,
+                              help="Only games where both players were rated at least this")
+    query_parser.add_argument('--winner-rating', type=parse_range, help="Range of winner rating bands")
+    query_parser.add_argument('--loser-rating', type=parse_range, help="Range of loser rating bands")
+    query_parser.add_argument('--score-diff', type=parse_range, help="Range of score difference buckets")
+    query_parser.add_argument('--ddof', type=int, default=0,
+                              help="Delta degrees of freedom of the standard deviation (0 like np.std, 1 like pandas)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'build':
+        cube = build_cube(args.store, args.rating_band, args.score_bucket)
+        save_cube(cube, args.cube, args.rating_band, args.score_bucket)
+        print(f"Wrote {len(cube)} cells covering {int(cube['count'].sum())} games to {args.cube} "
+              f"in {time.perf_counter() - start:.1f}s")
+        return
+
+    try:
+        cube, rating_band, _ = load_cube(args.cube)
+    except FileNotFoundError:
+        sys.exit(f"Cube {args.cube} not found. Run 'python stats_cube.py build' first.")
+    ranges = {
+        'year': args.year,
+        'lexicon': args.lexicon,
+        'winner_band': args.winner_rating,
+        'loser_band': args.loser_rating,
+        'diff_bucket': args.score_diff,
+    }
+    ranges = {dimension: bounds for dimension, bounds in ranges.items() if bounds is not None}
+    if args.min_rating is not None:
+        if args.min_rating % rating_band:
+            sys.exit(f"--min-rating must be a multiple of the cube's rating band ({rating_band}).")
+        for dimension in ('winner_band', 'loser_band'):
+            low, high = ranges.get(dimension, (None, None))
+            ranges[dimension] = (args.min_rating if low is None else max(low, args.min_rating), high)
+
+    result = roll_up(slice_cube(cube, **ranges), args.by, args.ddof)
+    with pd.option_context('display.max_rows', None, 'display.float_format', '{:.2f}'.format):
+        print(result.to_string())
+    print(f"\nAnswered in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
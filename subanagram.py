@@ -1,42 +1,101 @@
-import sys
-from itertools import permutations, combinations
+import argparse
+from collections import Counter
+
+BLANK = '?'
+# Key under which a trie node stores the words spelled by its path
+WORDS = ''
 
 
 def load_words(filename):
     with open(filename) as f:
-        return set(word.strip().lower() for word in f)
+        return set(word.strip().lower() for word in f if word.strip())
+
+
+class AlphagramTrie:
+    """
+    A trie over alphagrams: every word is stored at the node reached by its
+    letters in sorted order, so each distinct set of letters is a single path.
+    A rack is searched by walking the trie once, spending a tile for each edge.
+    """
+
+    def __init__(self, words):
+        self.root = {}
+        for word in words:
+            node = self.root
+            for letter in sorted(word):
+                node = node.setdefault(letter, {})
+            node.setdefault(WORDS, []).append(word)
+
+    def search(self, rack, min_length=1, max_length=None):
+        """
+        Finds every word that can be made from the rack.
 
+        Args:
+            rack (str): The available tiles, with '?' for a blank.
+            min_length (int): Minimum word length to return.
+            max_length (int): Maximum word length to return, defaults to the rack size.
 
-def subanagrams(word, word_list):
-    subanagrams = set()
-    for i in range(1, len(word) + 1):
-        for subset in combinations(word, i):
-            for perm in permutations(subset):
-                subanagram = ''.join(perm)
-                if subanagram in word_list:
-                    subanagrams.add(subanagram)
-    for perm in permutations(word):
-        anagram = ''.join(perm)
-        if anagram in word_list:
-            subanagrams.add(anagram)
-    return subanagrams
+        Returns:
+            list: The matching words.
+        """
+        counts = Counter(rack.lower())
+        blanks = counts.pop(BLANK, 0)
+        if max_length is None:
+            max_length = len(rack)
+        results = []
+        self._search(self.root, counts, blanks, 0, min_length, max_length, results)
+        return results
+
+    def _search(self, node, counts, blanks, depth, min_length, max_length, results):
+        if depth >= min_length and WORDS in node:
+            results.extend(node[WORDS])
+        if depth == max_length:
+            return
+        for letter, child in node.items():
+            if letter == WORDS:
+                continue
+            # Spending the real tile always leaves at least as many options as spending a blank
+            if counts[letter] > 0:
+                counts[letter] -= 1
+                self._search(child, counts, blanks, depth + 1, min_length, max_length, results)
+                counts[letter] += 1
+            elif blanks > 0:
+                self._search(child, counts, blanks - 1, depth + 1, min_length, max_length, results)
+
+
+def subanagrams(word, trie, min_length=1, max_length=None):
+    return set(trie.search(word, min_length, max_length))
 
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python subanagrams.py word_list_file word1 [word2 ...]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Find all subanagrams and anagrams of one or more racks. Use '?' for a blank.")
+    parser.add_argument('word_list_file', help='Path to the word list file')
+    parser.add_argument('words', nargs='*', help='Racks to search')
+    parser.add_argument('--racks', help='File with one rack per line to search in batch mode')
+    parser.add_argument('--min', type=int, default=1, help='Minimum word length to include')
+    parser.add_argument('--max', type=int, default=None, help='Maximum word length to include')
+    args = parser.parse_args()
+
+    if not args.words and not args.racks:
+        parser.error("provide at least one rack or --racks")
 
-    word_list_file = sys.argv[1]
-    words = sys.argv[2:]
+    trie = AlphagramTrie(load_words(args.word_list_file))
 
-    word_list = load_words(word_list_file)
+    if args.racks:
+        # Batch mode prints the results for each rack on its own line
+        with open(args.racks) as f:
+            for line in f:
+                rack = line.strip()
+                if rack:
+                    results = sorted(subanagrams(rack, trie, args.min, args.max))
+                    print(f"{rack}: {', '.join(results)}")
 
-    subanagrams_set = set()
-    for word in words:
-        subanagrams_set.update(subanagrams(word, word_list))
-    subanagrams_list = sorted(list(subanagrams_set))
-    print(f"Subanagrams and anagrams: {', '.join(subanagrams_list)}")
+    if args.words:
+        subanagrams_set = set()
+        for word in args.words:
+            subanagrams_set.update(subanagrams(word, trie, args.min, args.max))
+        subanagrams_list = sorted(subanagrams_set)
+        print(f"Subanagrams and anagrams: {', '.join(subanagrams_list)}")
 
 
 if __name__ == '__main__':
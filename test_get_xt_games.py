@@ -0,0 +1,53 @@
+import csv
+import json
+import os
+
+from get_xt_games import CHECKPOINT_SUFFIX, collect_games
+from xt_client import XtClient
+
+
+def serve_games(stub_server, game_ids):
+    def handler(path, params, headers):
+        if path != '/games.php':
+            return 404, {}, b''
+        min_id, max_id = int(params['minid']), int(params['maxid'])
+        games = [{'gameid': str(i), 'winnerscore': '400', 'loserscore': '350'}
+                 for i in sorted(game_ids, reverse=True) if min_id <= i <= max_id]
+        return 200, {'Content-Type': 'application/json'}, json.dumps({'games': games}).encode('utf-8')
+    stub_server.handler = handler
+
+
+def fetched_windows(stub_server):
+    return sorted((int(params['minid']), int(params['maxid'])) for _, params, _ in stub_server.requests)
+
+
+def test_every_window_is_fetched_once(tmp_path, stub_server):
+    # Some windows have no games, which must not end the harvest
+    game_ids = [i for i in range(5, 201) if i % 50 > 10]
+    serve_games(stub_server, game_ids)
+    output_file = str(tmp_path / 'games.csv')
+
+    total = collect_games(200, 10 ** 6, output_file, XtClient(stub_server.url), workers=3, window_size=10,
+                          min_id=5)
+
+    assert fetched_windows(stub_server) == [(5, 10)] + [(i, i + 9) for i in range(11, 201, 10)]
+    with open(output_file, newline='', encoding='utf-8') as file:
+        assert [int(row['gameid']) for row in csv.DictReader(file)] == sorted(game_ids, reverse=True)
+    assert total == len(game_ids)
+    with open(output_file + CHECKPOINT_SUFFIX, encoding='utf-8') as file:
+        assert json.load(file)['next_max_id'] == 4
+
+
+def test_resumes_after_the_last_checkpointed_window(tmp_path, stub_server):
+    serve_games(stub_server, range(1, 101))
+    output_file = str(tmp_path / 'games.csv')
+    collect_games(100, 30, output_file, XtClient(stub_server.url), workers=2, window_size=10)
+    assert os.path.exists(output_file + CHECKPOINT_SUFFIX)
+
+    stub_server.requests.clear()
+    total = collect_games(100, 10 ** 6, output_file, XtClient(stub_server.url), workers=2, window_size=10)
+
+    assert total == 100
+    assert min(fetched_windows(stub_server)) == (1, 10)
+    with open(output_file, newline='', encoding='utf-8') as file:
+        assert [int(row['gameid']) for row in csv.DictReader(file)] == list(range(100, 0, -1))
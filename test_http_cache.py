@@ -0,0 +1,57 @@
+from get_xt_tourney_annos import download_file
+from http_cache import HttpCache
+from xt_client import XtClient
+
+
+def serve_versions(stub_server, resource):
+    """Serves resource['body'] with ETag resource['etag'], answering 304 to a matching If-None-Match."""
+    def handler(path, params, headers):
+        if headers.get('If-None-Match') == resource['etag']:
+            return 304, {'ETag': resource['etag']}, b''
+        return 200, {'ETag': resource['etag']}, resource['body']
+    stub_server.handler = handler
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_304_reuses_the_cached_body_and_200_replaces_it(tmp_path, stub_server):
+    resource = {'etag': '"v1"', 'body': b'id,date\n1,2024-01-01\n'}
+    serve_versions(stub_server, resource)
+    cache = HttpCache(str(tmp_path / 'cache'))
+    client = XtClient(stub_server.url)
+    url = client.url('allanno.php')
+
+    first = cache.fetch(client, url)
+    assert (first.status_code, first.from_cache) == (200, False)
+    assert 'If-None-Match' not in stub_server.requests[-1][2]
+
+    second = cache.fetch(client, url)
+    assert (second.status_code, second.from_cache) == (304, True)
+    assert stub_server.requests[-1][2]['If-None-Match'] == '"v1"'
+    assert read(second.path) == b'id,date\n1,2024-01-01\n'
+
+    resource.update(etag='"v2"', body=b'id,date\n2,2024-02-01\n')
+    third = cache.fetch(client, url)
+    assert (third.status_code, third.from_cache) == (200, False)
+    assert read(third.path) == b'id,date\n2,2024-02-01\n'
+    assert cache.fetch(client, url).from_cache
+
+
+def test_download_file_revalidates_with_the_known_etag(tmp_path, stub_server):
+    resource = {'etag': '"a"', 'body': b'#player1 A\n'}
+    serve_versions(stub_server, resource)
+    client = XtClient(stub_server.url)
+    url = f"{stub_server.url}/annotated/1.gcg"
+    file_path = str(tmp_path / 'tourney' / 'r1_opponent.gcg')
+
+    assert download_file(client, url, file_path) == (True, '"a"')
+    assert download_file(client, url, file_path, '"a"') == (False, '"a"')
+    assert stub_server.requests[-1][2]['If-None-Match'] == '"a"'
+    assert read(file_path) == b'#player1 A\n'
+
+    resource.update(etag='"b"', body=b'#player1 B\n')
+    assert download_file(client, url, file_path, '"a"') == (True, '"b"')
+    assert read(file_path) == b'#player1 B\n'
@@ -0,0 +1,77 @@
+import os
+
+import playability
+from playability import CACHE_SUFFIX, load_playability
+from quiz_order import order_quiz
+
+PLAYABILITY = """\
+90 RETAINS
+70 QI
+60 ZA
+50 STAINER
+"""
+
+# NASTIER and AEINRST are not ranked, but their letters are: NASTIER is an
+# anagram of RETAINS and AEINRST, in alphabetical order, is their alphagram
+QUIZ = """\
+0
+NASTIER;def;0
+QI;def;0
+AEINRST;def;0
+ZA;def;0
+XU;def;0
+RETAINS;def;0
+"""
+
+
+def write_files(tmp_path, quiz):
+    playability_path = tmp_path / 'playab.txt'
+    playability_path.write_text(PLAYABILITY)
+    quiz_path = tmp_path / 'quiz.jqz'
+    quiz_path.write_text(quiz)
+    return str(playability_path), str(quiz_path)
+
+
+def ordered_words(path):
+    with open(path) as file:
+        return [line.split(';')[0] for line in file.read().splitlines()[1:]]
+
+
+def test_unranked_words_sort_last(tmp_path):
+    playability_path, quiz_path = write_files(tmp_path, QUIZ)
+    output_path = str(tmp_path / 'ordered.jqz')
+    count = order_quiz(quiz_path, output_path, 'playability', [load_playability(playability_path)], run_rows=2)
+
+    assert count == 6
+    assert ordered_words(output_path) == ['RETAINS', 'QI', 'ZA', 'NASTIER', 'AEINRST', 'XU']
+
+
+def test_alphagrams_rank_by_most_playable_anagram(tmp_path):
+    playability_path, quiz_path = write_files(tmp_path, "0\nAIQ;def;0\nAZ;def;0\nEINRST;def;0\nIQ;def;0\n")
+    output_path = str(tmp_path / 'ordered.jqz')
+    order_quiz(quiz_path, output_path, 'playability', [load_playability(playability_path)], alphagrams=True)
+
+    assert ordered_words(output_path) == ['IQ', 'AZ', 'AIQ', 'EINRST']
+
+
+def test_compiled_index_is_reused(tmp_path):
+    playability_path, _ = write_files(tmp_path, QUIZ)
+    compiled = load_playability(playability_path)
+    cached = load_playability(playability_path)
+
+    assert len(cached) == len(compiled) == 4
+    assert 'QI' in cached and 'IQ' not in cached
+    assert cached.score('STAINER') == 50
+    assert cached.alphagram_score('AEINRST') == 90
+    assert cached.percentile('XU') is None
+
+
+def test_touched_file_refreshes_the_cache_header(tmp_path):
+    playability_path, _ = write_files(tmp_path, QUIZ)
+    load_playability(playability_path)
+    os.utime(playability_path, ns=(0, 10 ** 18))
+
+    assert load_playability(playability_path).score('QI') == 70
+    with open(playability_path + CACHE_SUFFIX, 'rb') as file:
+        header = playability._LAYOUT.unpack_header(file.read())
+    assert header.source_mtime_ns == 10 ** 18
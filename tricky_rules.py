@@ -0,0 +1,149 @@
+"""
+Declarative rules for picking out "tricky" bingos.
+
+A rule is a dictionary with a 'name' and any of the following criteria, all of
+which must hold for the rule to match a word:
+
+    prefixes (list): The word starts with one of these.
+    suffixes (list): The word ends with one of these.
+    vowels (int): The word has exactly this many vowels.
+    parts_of_speech (list): The definition has one of these parts of speech.
+    back_hook (str): The word followed by this string is also a word.
+    max_anagrams (int): The word has at most this many anagrams, itself included.
+
+The spelling criteria of every rule are compiled into a single regular
+expression, so most words are classified by one regex match. Rules with
+criteria that need the lexicon are checked separately.
+"""
+import json
+import re
+import time
+from collections import namedtuple
+
+from lexicon import part_of_speech_mask
+
+VOWELS = 'AEIOU'
+
+DEFAULT_LENGTHS = (7, 8)
+DEFAULT_MAX_ANAGRAMS = 3
+
+DEFAULT_RULES = [
+    {'name': 'adjective ending in ED', 'suffixes': ['ED'], 'parts_of_speech': ['adjective']},
+    {'name': 'ING with S hook', 'suffixes': ['ING'], 'back_hook': 'S'},
+    {'name': 'tricky suffix', 'suffixes': [
+        'ANT', 'ENT', 'ITY', 'LY', 'ABLE', 'NESS', 'LESS', 'LIKE', 'EAU', 'IEU', 'ATE',
+        'OID', 'INESS', 'IVE', 'IAN', 'FUL', 'FORM', 'OSE', 'OUS', 'ISH', 'UM']},
+    {'name': 'unique ER with S hook', 'suffixes': ['ER'], 'max_anagrams': 1, 'back_hook': 'S'},
+    {'name': 'UN...ED', 'prefixes': ['UN'], 'suffixes': ['ED']},
+    {'name': 'tricky prefix', 'prefixes': ['OVER', 'OUT', 'NON', 'EM', 'IM', 'EN']},
+    {'name': 'five vowels', 'vowels': 5},
+]
+
+RULE_FIELDS = {'name', 'prefixes', 'suffixes', 'vowels', 'parts_of_speech', 'back_hook', 'max_anagrams'}
+LEXICON_FIELDS = {'parts_of_speech', 'back_hook', 'max_anagrams'}
+
+CompiledRule = namedtuple('CompiledRule', ['rule', 'pattern', 'part_of_speech_mask'])
+
+
+def load_rules(file_path):
+    """
+    Reads a JSON file containing a list of rules.
+
+    Raises:
+        ValueError: If a rule has no name or an unknown field.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        rules = json.load(file)
+    for rule in rules:
+        if 'name' not in rule:
+            raise ValueError(f"Rule has no name: {rule}")
+        unknown_fields = set(rule) - RULE_FIELDS
+        if unknown_fields:
+            raise ValueError(f"Rule '{rule['name']}' has unknown fields: {', '.join(sorted(unknown_fields))}")
+    return rules
+
+
+def rule_pattern(rule):
+    """Returns a regular expression, made of lookaheads, for the spelling criteria of a rule."""
+    pattern = ''
+    if rule.get('prefixes'):
+        pattern += f"(?={'|'.join(map(re.escape, rule['prefixes']))})"
+    if rule.get('suffixes'):
+        pattern += f"(?=.*(?:{'|'.join(map(re.escape, rule['suffixes']))})$)"
+    if rule.get('vowels') is not None:
+        pattern += f"(?=(?:[^{VOWELS}]*[{VOWELS}]){{{rule['vowels']}}}[^{VOWELS}]*$)"
+    return pattern
+
+
+class TrickyRuleSet:
+    """
+    Compiled rules that classify the words of a lexicon in one pass.
+
+    Args:
+        rules (list): Rule dictionaries, see the module docstring.
+        lengths (tuple): Only words of these lengths can be tricky.
+        max_anagrams (int): Words with more anagrams than this are never tricky.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, lengths=DEFAULT_LENGTHS, max_anagrams=DEFAULT_MAX_ANAGRAMS):
+        self.rules = rules
+        self.lengths = set(lengths)
+        self.max_anagrams = max_anagrams
+        self._compiled_rules = [
+            CompiledRule(rule, re.compile(rule_pattern(rule)), part_of_speech_mask(rule.get('parts_of_speech', ())))
+            for rule in rules
+        ]
+
+        spelling_patterns = [
+            f"(?:{rule_pattern(rule)})" for rule in rules if not LEXICON_FIELDS & rule.keys()
+        ]
+        self._spelling_regex = re.compile('|'.join(spelling_patterns)) if spelling_patterns else None
+        self._lexicon_rules = [
+            compiled for compiled in self._compiled_rules if LEXICON_FIELDS & compiled.rule.keys()
+        ]
+
+    def candidates(self, lexicon):
+        """Yields the positions of words with the right length and few enough anagrams."""
+        index = lexicon.alphagram_index
+        for word_index, length in enumerate(lexicon.lengths):
+            if length in self.lengths and index.num_anagrams(word_index) <= self.max_anagrams:
+                yield word_index
+
+    def matches_rule(self, compiled, lexicon, word_index):
+        """Checks whether a single compiled rule matches the word at word_index."""
+        rule = compiled.rule
+        word = lexicon.words[word_index]
+        if not compiled.pattern.match(word):
+            return False
+        if 'max_anagrams' in rule and lexicon.alphagram_index.num_anagrams(word_index) > rule['max_anagrams']:
+            return False
+        if 'back_hook' in rule and word + rule['back_hook'] not in lexicon:
+            return False
+        if 'parts_of_speech' in rule and not lexicon.part_of_speech_masks[word_index] & compiled.part_of_speech_mask:
+            return False
+        return True
+
+    def is_tricky(self, lexicon, word_index):
+        """Checks whether any rule matches the word at word_index."""
+        if self._spelling_regex and self._spelling_regex.match(lexicon.words[word_index]):
+            return True
+        return any(self.matches_rule(compiled, lexicon, word_index) for compiled in self._lexicon_rules)
+
+    def find_tricky_words(self, lexicon):
+        """Returns the positions of all tricky words in the lexicon."""
+        return [word_index for word_index in self.candidates(lexicon) if self.is_tricky(lexicon, word_index)]
+
+    def rule_stats(self, lexicon):
+        """
+        Runs every rule on its own over the candidate words.
+
+        Returns:
+            list: (rule name, number of words matched, seconds taken) tuples, in rule order.
+        """
+        candidates = list(self.candidates(lexicon))
+        stats = []
+        for compiled in self._compiled_rules:
+            start = time.perf_counter()
+            hits = sum(1 for word_index in candidates if self.matches_rule(compiled, lexicon, word_index))
+            stats.append((compiled.rule['name'], hits, time.perf_counter() - start))
+        return stats
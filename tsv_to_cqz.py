@@ -3,14 +3,15 @@ import requests
 import re
 import shutil
 
+from quiz_format import CQZ, QuizWriter
+
 def process_tsv(file_name):
     try:
         # Open the input TSV file for reading
         with open(file_name, 'r') as tsv_file:
             # Create the output .cqz file
             output_file_name = file_name.replace('.tsv', '.cqz')
-            with open(output_file_name, 'w') as cqz_file:
-                cqz_file.write(f"0\n")
+            with QuizWriter(output_file_name, CQZ) as cqz_writer:
                 for line in tsv_file:
                     # Check if the line has exactly one tab character
                     if line.count('\t') != 1:
@@ -19,7 +20,7 @@ def process_tsv(file_name):
                     col1, col2 = line.strip().split('\t')
 
                     # Write to the .cqz file
-                    cqz_file.write(f"0\t{col1}\t{col2}\n")
+                    cqz_writer.write(col1, col2)
         return output_file_name
             
     except FileNotFoundError:
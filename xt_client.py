@@ -0,0 +1,359 @@
+"""
+A client for the cross-tables.com REST API.
+
+Every script talking to cross-tables goes through XtClient, which keeps one
+pooled requests session, spaces requests out with a token bucket, retries
+failed requests with exponential backoff and jitter, and records per-endpoint
+request timings and bytes transferred, so the throughput of a harvest can be
+measured and tuned from the command line. AsyncXtClient offers the same
+methods as coroutines, running the requests in worker threads.
+"""
+import asyncio
+import csv
+import io
+import json
+import random
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlparse
+
+import requests
+
+BASE_URL = "https://cross-tables.com/rest"
+
+# Define headers to be used for all API calls
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; Script/1.0; +http://example.com/bot)",
+    "Accept": "application/json"
+}
+
+# Upper bounds, in milliseconds, of the request timing histogram buckets
+TIMING_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+# Responses worth retrying: rate limited or a server error
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class XtApiError(RuntimeError):
+    """A request to cross-tables failed after every retry, or returned an unusable response."""
+
+
+class TokenBucket:
+    """
+    Limits calls to wait(), across all threads, to 'rate' per second on
+    average, allowing bursts of up to 'burst' calls.
+
+    Args:
+        rate (float): Tokens added per second, 0 for no limit.
+        burst (int): The most tokens the bucket holds.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._last_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_time) * self.rate)
+            self._last_time = now
+            # Take the token now, even if it is still owed, so waiting threads queue up in order
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RequestMetrics:
+    """Thread-safe request counts, timing histograms and byte counters, per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.start_time = time.monotonic()
+
+    def _endpoint(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = {
+                'requests': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'seconds': 0.0,
+                'histogram': [0] * len(TIMING_BUCKETS_MS),
+            }
+        return stats
+
+    def record(self, endpoint, seconds, num_bytes, ok=True):
+        """Records one completed request."""
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats['requests'] += 1
+            stats['errors'] += not ok
+            stats['bytes'] += num_bytes
+            stats['seconds'] += seconds
+            stats['histogram'][bisect_left(TIMING_BUCKETS_MS, seconds * 1000)] += 1
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._endpoint(endpoint)['retries'] += 1
+
+    def snapshot(self):
+        """Returns a copy of the statistics, keyed by endpoint."""
+        with self._lock:
+            return {endpoint: {**stats, 'histogram': list(stats['histogram'])}
+                    for endpoint, stats in self._endpoints.items()}
+
+    def summary(self):
+        """Returns a printable report of the requests made so far."""
+        elapsed = time.monotonic() - self.start_time
+        lines = [f"Requests over {elapsed:.1f}s:"]
+        for endpoint, stats in sorted(self.snapshot().items()):
+            requests_made = stats['requests']
+            if not requests_made:
+                continue
+            mean_ms = stats['seconds'] / requests_made * 1000
+            lines.append(
+                f"  {endpoint}: {requests_made} requests ({requests_made / elapsed:.2f}/s), "
+                f"{stats['errors']} errors, {stats['retries']} retries, "
+                f"{stats['bytes'] / 1e6:.2f} MB ({stats['bytes'] / 1e6 / elapsed:.2f} MB/s), mean {mean_ms:.0f} ms")
+            buckets = []
+            low = 0
+            for high, count in zip(TIMING_BUCKETS_MS, stats['histogram']):
+                if count:
+                    label = f"{low}-{high} ms" if high != float('inf') else f">{low} ms"
+                    buckets.append(f"{label}: {count}")
+                low = high
+            lines.append("    " + ", ".join(buckets))
+        return '\n'.join(lines)
+
+
+class XtClient:
+    """
+    A cross-tables REST API client, safe to share between threads.
+
+    Args:
+        base_url (str): The REST API root.
+        pool_size (int): Connections kept open, at least the number of threads using the client.
+        rate (float): The maximum average number of requests per second, 0 for no limit.
+        burst (int): The number of requests that may be made at once before the rate applies.
+        timeout (float): Seconds to wait for the server before a request fails.
+        max_retries (int): The number of attempts at each request.
+        retry_delay (float): Seconds before the first retry, doubling after each retry.
+        session (requests.Session): Session to make the requests with, created if not given.
+    """
+
+    def __init__(self, base_url=BASE_URL, pool_size=10, rate=0, burst=1, timeout=30, max_retries=5,
+                 retry_delay=1, session=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.rate_limiter = TokenBucket(rate, burst)
+        self.metrics = RequestMetrics()
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def url(self, endpoint):
+        return f"{self.base_url}/{endpoint}"
+
+    def request(self, method, url, params=None, headers=None, timeout=None, stream=False):
+        """
+        Makes a request, retrying connection errors, timeouts, rate limiting
+        and server errors with exponential backoff and jitter. Other error
+        statuses are returned for the caller to handle.
+
+        Bytes are counted from the downloaded body, or from Content-Length for
+        streamed responses, whose time is measured up to the response headers.
+
+        Returns:
+            requests.Response: The response.
+
+        Raises:
+            XtApiError: If every attempt failed.
+        """
+        # API requests are counted per endpoint, anything else, like annotated game files, per host
+        endpoint = url[len(self.base_url) + 1:].split('?', 1)[0] if url.startswith(self.base_url + '/') else ''
+        if not endpoint or '/' in endpoint:
+            endpoint = urlparse(url).netloc or url
+        for attempt in range(1, self.max_retries + 1):
+            self.rate_limiter.wait()
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, params=params, headers=headers,
+                                                timeout=timeout or self.timeout, stream=stream)
+                if stream:
+                    num_bytes = int(response.headers.get('Content-Length') or 0)
+                else:
+                    num_bytes = len(response.content)
+            except requests.RequestException as e:
+                self.metrics.record(endpoint, time.perf_counter() - start, 0, ok=False)
+                error = e
+            else:
+                ok = response.status_code not in RETRY_STATUSES
+                self.metrics.record(endpoint, time.perf_counter() - start, num_bytes, ok)
+                if ok:
+                    return response
+                response.close()
+                error = f"HTTP {response.status_code}"
+            if attempt < self.max_retries:
+                self.metrics.record_retry(endpoint)
+                # Full jitter keeps threads that failed together from retrying together
+                time.sleep(random.uniform(0.5, 1) * self.retry_delay * 2 ** (attempt - 1))
+        raise XtApiError(f"Request to {url} failed after {self.max_retries} attempts: {error}.")
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False):
+        """Makes a GET request, see request. Compatible with requests.Session.get for HttpCache."""
+        return self.request('GET', url, params, headers, timeout, stream)
+
+    def head(self, url, timeout=None):
+        return self.request('HEAD', url, timeout=timeout)
+
+    def get_json(self, endpoint, params=None, cache=None):
+        """
+        Fetches an endpoint and decodes its JSON body. An empty body decodes to None.
+
+        Args:
+            endpoint (str): The endpoint, e.g. 'info.php'.
+            params (dict): Query parameters.
+            cache (HttpCache): Cache to revalidate and read the response from, if any.
+
+        Raises:
+            XtApiError: If the request failed or the body is not JSON.
+        """
+        if cache is not None:
+            with open(self._cached_path(cache, endpoint, params), 'rb') as file:
+                content = file.read()
+        else:
+            content = self._checked(self.get(self.url(endpoint), params), endpoint).content
+        if not content.strip():
+            return None
+        try:
+            return json.loads(content)
+        except ValueError:
+            raise XtApiError(f"Could not decode JSON response from {endpoint}.")
+
+    @staticmethod
+    def _checked(response, endpoint):
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            raise XtApiError(f"Request to {endpoint} failed: {e}")
+        return response
+
+    def _cached_path(self, cache, endpoint, params=None):
+        try:
+            return cache.fetch(self, self.url(endpoint), params, self.timeout).path
+        except requests.HTTPError as e:
+            raise XtApiError(f"Request to {endpoint} failed: {e}")
+
+    def info(self):
+        """Returns the info.php response, which includes 'maxgameid'."""
+        return self.get_json("info.php")
+
+    def max_game_id(self):
+        """Returns the highest existing game ID."""
+        try:
+            return int(self.info()["maxgameid"])
+        except (TypeError, KeyError, ValueError):
+            raise XtApiError("info.php did not return the highest game ID.")
+
+    def games(self, min_id, max_id):
+        """Returns the games with IDs from min_id to max_id, as dictionaries of strings."""
+        data = self.get_json("games.php", {"minid": min_id, "maxid": max_id})
+        if data is None:
+            return []  # No games in this range
+        try:
+            return data["games"]
+        except (TypeError, KeyError):
+            raise XtApiError(f"games.php returned no games list for {min_id} to {max_id}.")
+
+    def player(self, player_id, results=True, cache=None):
+        """Returns a player's profile, with their tournament results if 'results'. See get_json for cache."""
+        data = self.get_json("player.php", {"player": player_id, "results": int(results)}, cache)
+        try:
+            return data["player"]
+        except (TypeError, KeyError):
+            raise XtApiError(f"player.php returned no player for ID {player_id}.")
+
+    def allanno(self, cache=None):
+        """
+        Streams the index of annotated games from allanno.php, one CSV row at
+        a time, with keys stripped of whitespace. With an HttpCache, the index
+        is revalidated and read from the cache file instead.
+        """
+        if cache is not None:
+            stream = open(self._cached_path(cache, "allanno.php"), "rb")
+        else:
+            response = self._checked(self.get(self.url("allanno.php"), stream=True), "allanno.php")
+            response.raw.decode_content = True
+            # Keep the stream readable at EOF, as TextIOWrapper expects
+            response.raw.auto_close = False
+            stream = response.raw
+        with io.TextIOWrapper(stream, encoding='utf-8', newline='') as body:
+            for row in csv.DictReader(body):
+                yield {k.strip(): v for k, v in row.items() if k is not None}
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncXtClient:
+    """
+    The XtClient API as coroutines, for use from asyncio code. Each request
+    runs in a worker thread through a shared XtClient, so the rate limit,
+    retries and metrics apply across sync and async callers alike.
+
+    Args:
+        client (XtClient): The client to wrap, created from kwargs if not given.
+    """
+
+    def __init__(self, client=None, **kwargs):
+        self.client = client or XtClient(**kwargs)
+
+    @property
+    def metrics(self):
+        return self.client.metrics
+
+    async def info(self):
+        return await asyncio.to_thread(self.client.info)
+
+    async def max_game_id(self):
+        return await asyncio.to_thread(self.client.max_game_id)
+
+    async def games(self, min_id, max_id):
+        return await asyncio.to_thread(self.client.games, min_id, max_id)
+
+    async def player(self, player_id, results=True, cache=None):
+        return await asyncio.to_thread(self.client.player, player_id, results, cache)
+
+    async def allanno(self, cache=None):
+        """Returns the whole annotated games index as a list."""
+        return await asyncio.to_thread(lambda: list(self.client.allanno(cache)))
+
+    async def games_in_windows(self, windows):
+        """Fetches several (min_id, max_id) windows concurrently, returning their games in the same order."""
+        return await asyncio.gather(*(self.games(min_id, max_id) for min_id, max_id in windows))
+
+
+def add_client_arguments(parser, rate=2.0):
+    """Adds the options controlling an XtClient to an argparse parser."""
+    parser.add_argument("--base-url", default=BASE_URL, help="Root URL of the cross-tables REST API")
+    parser.add_argument("--rate", type=float, default=rate, help="Maximum requests per second, 0 for no limit")
+    parser.add_argument("--burst", type=int, default=1, help="Requests allowed at once before the rate applies")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for each response")
+    parser.add_argument("--retries", type=int, default=5, help="Attempts at each request")
+    parser.add_argument("--metrics", action="store_true", help="Print request timings and bytes transferred")
+
+
+def client_from_args(args, pool_size=10):
+    """Creates an XtClient from the options added by add_client_arguments."""
+    return XtClient(args.base_url, pool_size, args.rate, args.burst, args.timeout, args.retries)